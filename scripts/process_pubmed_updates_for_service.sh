@@ -102,20 +102,11 @@ if [[ $? != 0 ]]; then
 fi
 
 
-# Perform classification
-python3 ~/NarrativeAnnotation/lib/KGExtractionToolbox/src/kgextractiontoolbox/entitylinking/classification.py  -i $UPDATES_PUBTATOR -c PubMed -r ~/NarrativeAnnotation/resources/classification/pharmaceutical_classification_rules.txt --cls Pharmaceutical -w 15 --skip-load
-if [[ $? != 0 ]]; then
-    echo "Previous script returned exit code != 0 -> Stopping pipeline."
-    exit -1
-fi
-
-python3 ~/NarrativeAnnotation/lib/KGExtractionToolbox/src/kgextractiontoolbox/entitylinking/classification.py  -i $UPDATES_PUBTATOR -c PubMed -r ~/NarrativeAnnotation/resources/classification/plant_specific_rules.txt --cls PlantSpecific -w 15 --skip-load
-if [[ $? != 0 ]]; then
-    echo "Previous script returned exit code != 0 -> Stopping pipeline."
-    exit -1
-fi
-
-python3 ~/NarrativeAnnotation/src/narrant/classification/apply_svm.py -i $UPDATES_PUBTATOR -c PubMed /data/FID_Pharmazie_Services/narrative_data_update/pharmaceutical_technology_articles_svm.pkl --cls PharmaceuticalTechnology --workers 10
+# Perform classification (Pharmaceutical, PlantSpecific and PharmaceuticalTechnology in a single pass)
+python3 ~/NarrativeAnnotation/src/narrant/classification/apply_classifiers.py -i $UPDATES_PUBTATOR -c PubMed --skip-load -w 15 \
+    -r Pharmaceutical ~/NarrativeAnnotation/resources/classification/pharmaceutical_classification_rules.txt \
+    -r PlantSpecific ~/NarrativeAnnotation/resources/classification/plant_specific_rules.txt \
+    --svm PharmaceuticalTechnology /data/FID_Pharmazie_Services/narrative_data_update/pharmaceutical_technology_articles_svm.pkl
 if [[ $? != 0 ]]; then
     echo "Previous script returned exit code != 0 -> Stopping pipeline."
     exit -1
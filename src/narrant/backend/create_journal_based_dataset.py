@@ -3,9 +3,7 @@ import random
 import pandas as pd
 import argparse
 import os
-from kgextractiontoolbox.backend.models import DocumentMetadata
-from kgextractiontoolbox.backend.database import Session
-from kgextractiontoolbox.backend.retrieve import iterate_over_all_documents_in_collection
+from narrant.backend.sampling import journal_sampler, iterate_texts
 
 COLLECTION = 'PubMed'
 
@@ -25,28 +23,14 @@ def export_document_ids_from_journal_list(journal_list_file: str, document_colle
             for line in f:
                 journal_names.add(line.strip().lower())
 
-    logging.info(f'Querying document id journal mappings from DocumentMetadata table ')
-    session = Session.get()
-    journal_q = session.query(DocumentMetadata.document_id, DocumentMetadata.journals)
-    journal_q = journal_q.filter(DocumentMetadata.document_collection == document_collection)
-    journal_q = journal_q.distinct()
+    logging.info(f'Sampling relevant / not relevant document ids inside the database...')
+    relevant_sampler = journal_sampler(document_collection, journal_names, relevant=True, seed=random_seed)
+    not_relevant_sampler = journal_sampler(document_collection, journal_names, relevant=False, seed=random_seed)
 
-    relevant_document_ids = set()
-    all_document_ids = set()
-    for entry in journal_q:
-        all_document_ids.add(entry[0])
-        journal = entry[1].split(',')[0].strip().lower()
-        if journal in journal_names:
-            relevant_document_ids.add(entry[0])
-
-    logging.info(f'Retrieved {len(relevant_document_ids)} relevant document ids...')
-
-    not_relevant_document_ids = all_document_ids - relevant_document_ids
-
-    random.seed(random_seed)
-
-    relevant_document_ids_sample = random.sample(relevant_document_ids, min(len(relevant_document_ids), sample_size))
-    not_relevant_document_ids_sample = random.sample(not_relevant_document_ids, min(len(not_relevant_document_ids), sample_size))
+    relevant_document_ids_sample = relevant_sampler.sample(sample_size)
+    logging.info(f'Sampled {len(relevant_document_ids_sample)} relevant document ids...')
+    not_relevant_document_ids_sample = not_relevant_sampler.sample(sample_size)
+    logging.info(f'Sampled {len(not_relevant_document_ids_sample)} not relevant document ids...')
 
     logging.info('Finished sampling document ids...')
 
@@ -55,14 +39,12 @@ def export_document_ids_from_journal_list(journal_list_file: str, document_colle
 
 def build_dataset(relevant_document_ids, not_relevant_document_ids, document_collection, random_seed: int):
     logging.info('Retrieving texts from database....')
-    session = Session.get()
-    doc_ids = relevant_document_ids + not_relevant_document_ids
+    relevant_document_ids_set = set(relevant_document_ids)
     x_data, y_data, pmids_data = [], [], []
-    for doc in iterate_over_all_documents_in_collection(session=session, collection=document_collection, document_ids=doc_ids):
-        text = doc.get_text_content(sections=False)
+    for doc_id, text in iterate_texts(document_collection, relevant_document_ids + not_relevant_document_ids):
         x_data.append(text)
-        pmids_data.append(doc.id)
-        if doc.id in relevant_document_ids:
+        pmids_data.append(doc_id)
+        if doc_id in relevant_document_ids_set:
             y_data.append(1)
         else:
             y_data.append(0)
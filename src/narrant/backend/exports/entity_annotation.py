@@ -0,0 +1,68 @@
+from narrant.entity.entityresolver import EntityResolver
+from narrant.entity.resolvertable import LRUCache
+from narrant.entitylinking.enttypes import get_entity_source
+
+
+class EntityAnnotator:
+    """
+    Resolves the name, source and URI of entities for the exports
+    Distinct entities are resolved in batches via EntityResolver.get_names_for_ids and memoized,
+    so that popular entities are only resolved once per process (until the resolver data is stored again,
+    which is checked at most once per EntityResolver.VERSION_CHECK_INTERVAL)
+    """
+    CACHE_SIZE = 500000
+
+    __instance = None
+
+    def __new__(cls):
+        if cls.__instance is None:
+            cls.__instance = super().__new__(cls)
+            cls.__instance._annotations = LRUCache(EntityAnnotator.CACHE_SIZE)
+            cls.__instance._resolver_versions = None
+        return cls.__instance
+
+    @staticmethod
+    def _get_source_and_uri(entity_id, entity_type) -> (str, str):
+        source, uri_source = get_entity_source(entity_id, entity_type)
+        uri = None
+        if uri_source:
+            uri = f'{uri_source}{entity_id.replace("MESH:", "")}'
+        return source, uri
+
+    def annotate(self, entities) -> dict:
+        """
+        Resolves a batch of entities
+        :param entities: an iterable of (entity id, entity type) pairs
+        :return: a dictionary (entity id, entity type) -> (name, source, URI)
+                 entities without name or source are not contained
+        """
+        resolver = EntityResolver()
+        resolver.check_resolver_versions()
+        if resolver.resolver_versions != self._resolver_versions:
+            self._annotations.clear()
+            self._resolver_versions = resolver.resolver_versions
+        result = {}
+        missing = set()
+        for key in set(entities):
+            if key in self._annotations:
+                annotation = self._annotations.get(key)
+                # entities that cannot be resolved are cached as None
+                if annotation is not None:
+                    result[key] = annotation
+            else:
+                missing.add(key)
+        if not missing:
+            return result
+
+        names = resolver.get_names_for_ids(missing, check_versions=False)
+        for key in missing:
+            annotation = None
+            if key in names:
+                try:
+                    source, uri = EntityAnnotator._get_source_and_uri(*key)
+                    annotation = (names[key], source, uri)
+                    result[key] = annotation
+                except KeyError:
+                    pass
+            self._annotations.put(key, annotation)
+        return result
@@ -4,9 +4,8 @@ import logging
 
 from kgextractiontoolbox.document.document import TaggedDocument
 from kgextractiontoolbox.document.export import export
-from narrant.entity.entityresolver import EntityResolver
+from narrant.backend.exports.entity_annotation import EntityAnnotator
 from narrant.entitylinking import enttypes
-from narrant.entitylinking.enttypes import get_entity_source
 
 
 def write_doc_with_entity_source(doc: TaggedDocument, export_format: str, f, first_doc: bool, export_content=True,
@@ -28,17 +27,17 @@ def write_doc_with_entity_source(doc: TaggedDocument, export_format: str, f, fir
             f.write(",\n")
 
         doc_dict = doc.to_dict(export_content=export_content, export_tags=export_tags)
+        # resolve the distinct entities of the document at once (names are memoized across documents)
+        annotations = EntityAnnotator().annotate((t["id"], t["type"]) for t in doc_dict["tags"])
         for t in doc_dict["tags"]:
             e_id, e_type = t["id"], t["type"]
-            entity_resolver = EntityResolver()
-            name = entity_resolver.get_name_for_var_ent_id(entity_id=e_id, entity_type=e_type)
-            source, URI_source = get_entity_source(e_id, e_type)
+            if (e_id, e_type) not in annotations:
+                raise KeyError(f'Cannot resolve name or source for entity: {e_id} {e_type}')
+            name, source, uri = annotations[(e_id, e_type)]
             t["name"] = name
             t["source"] = source
-            if URI_source:
-                if 'MESH:' in e_id:
-                    e_id = e_id.replace('MESH:', '')
-                t["URI"] = f'{URI_source}{e_id}'
+            if uri:
+                t["URI"] = uri
         json.dump(doc_dict, f, indent=1)
 
 
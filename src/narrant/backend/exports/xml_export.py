@@ -10,9 +10,9 @@ from xml.etree.ElementTree import Element, SubElement
 from kgextractiontoolbox.backend.database import Session
 from kgextractiontoolbox.backend.models import Tag, DocumentTranslation
 from kgextractiontoolbox.progress import print_progress_with_eta
-from narrant.entity.entityresolver import EntityResolver
+from narrant.backend.exports.entity_annotation import EntityAnnotator
 from narrant.entitylinking import enttypes
-from narrant.entitylinking.enttypes import TAG_TYPE_MAPPING, get_entity_source
+from narrant.entitylinking.enttypes import TAG_TYPE_MAPPING
 
 CONTENT_BUFFER_SIZE = 10000
 TAG_BUFFER_SIZE = 100000
@@ -70,7 +70,6 @@ def export_xml(output_dir, tag_types, document_ids=None, collection=None, logger
     if tag_types and enttypes.ALL != tag_types:
         query = query.filter(Tag.ent_type.in_(tag_types))
 
-    entity_resolver = EntityResolver()
     tags_for_doc = defaultdict(set)
     translation_errors = 0
     missing_ent_ids = set()
@@ -82,24 +81,32 @@ def export_xml(output_dir, tag_types, document_ids=None, collection=None, logger
         tags_for_doc[doc_id].add((ent_id, ent_type))
 
     logging.info('Beginning export...')
+    entity_annotator = EntityAnnotator()
     docs_exported = 0
+    doc_items = list(tags_for_doc.items())
     # export the tags for each document
-    for doc_id, tags in tags_for_doc.items():
-        docs_exported += 1
-        print_progress_with_eta("exporting tags...", docs_exported, document_count, start_time, print_every_k=500)
-        if not tags:
-            continue
-        if translate_document_ids:
-            doc_id = doc_id_2_source_id[doc_id]
-        else:
-            doc_id = str(doc_id)
-        filename = os.path.join(output_dir, "{}.xml".format(doc_id))
-        with open(filename, 'w', encoding='utf-8') as f:
-            top = Element('document')
-            for e_id, e_type in tags:
-                try:
-                    entity_name = entity_resolver.get_name_for_var_ent_id(e_id, e_type)
-                    entity_source, _ = get_entity_source(e_id, e_type)
+    for batch_start in range(0, len(doc_items), CONTENT_BUFFER_SIZE):
+        batch = doc_items[batch_start:batch_start + CONTENT_BUFFER_SIZE]
+        # resolve all distinct entities of the batch at once
+        annotations = entity_annotator.annotate(e for _, tags in batch for e in tags)
+        for doc_id, tags in batch:
+            docs_exported += 1
+            print_progress_with_eta("exporting tags...", docs_exported, document_count, start_time,
+                                    print_every_k=500)
+            if not tags:
+                continue
+            if translate_document_ids:
+                doc_id = doc_id_2_source_id[doc_id]
+            else:
+                doc_id = str(doc_id)
+            filename = os.path.join(output_dir, "{}.xml".format(doc_id))
+            with open(filename, 'w', encoding='utf-8') as f:
+                top = Element('document')
+                for e_id, e_type in tags:
+                    if (e_id, e_type) not in annotations:
+                        missing_ent_ids.add((e_id, e_type))
+                        continue
+                    entity_name, entity_source, _ = annotations[(e_id, e_type)]
                     if entity_source:
                         if '//' in entity_name:
                             for e_n in entity_name.split('//'):
@@ -111,12 +118,9 @@ def export_xml(output_dir, tag_types, document_ids=None, collection=None, logger
                     else:
                         tag = SubElement(top, "tag")
                         tag.text = entity_name
-                except KeyError:
-                    missing_ent_ids.add((e_id, e_type))
-                    continue
-            # write the document
-            xml_data = minidom.parseString(ET.tostring(top, encoding='utf-8')).toprettyxml(indent="   ")
-            f.write(xml_data)
+                # write the document
+                xml_data = minidom.parseString(ET.tostring(top, encoding='utf-8')).toprettyxml(indent="   ")
+                f.write(xml_data)
 
     if logger:
         logger.warning('the following entity ids are missing: {}'.format(missing_ent_ids))
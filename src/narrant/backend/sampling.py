@@ -0,0 +1,189 @@
+"""
+Samples document ids inside the database, so that building a training set does not need to load
+all document ids of a collection into memory.
+"""
+import logging
+import random
+from typing import Callable, Iterable, List, Set, Tuple
+
+from sqlalchemy import func, literal, tablesample
+
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import Document, DocumentMetadata
+from kgextractiontoolbox.backend.retrieve import iterate_over_all_documents_in_collection
+
+SQLITE_LOWER_FUNCTION = "narrant_unicode_lower"
+
+
+class DocumentSampler:
+    """
+    Draws uniform random samples of ids from a (filtered) table
+    - Postgres: TABLESAMPLE BERNOULLI with a sampling rate slightly above the required ratio
+    - SQLite: ORDER BY random() LIMIT k (SQLite keeps only k rows in its sorter)
+    - SQLite with a seed: SQLite's random() cannot be seeded, so the ids are streamed in id order into a
+      reservoir of k ids (seeded Python random)
+    Except for the seeded SQLite sampling, only the sampled ids are transferred to Python
+    """
+    OVERSAMPLING_FACTOR = 1.2
+    STREAM_BATCH_SIZE = 10000
+
+    def __init__(self, model, id_column: str, conditions: Callable = None, seed: int = None):
+        """
+        :param model: the table to sample from (e.g. Document or DocumentMetadata)
+        :param id_column: name of the id column that should be sampled
+        :param conditions: a callable that gets the table columns and returns a list of filter expressions
+        :param seed: a random seed (used for TABLESAMPLE REPEATABLE, the SQLite reservoir sampling and the final
+        Python sampling)
+        """
+        self.model = model
+        self.id_column = id_column
+        self.conditions = conditions if conditions else (lambda t: [])
+        self.seed = seed
+        self.__random = random.Random(seed)
+
+    def count(self) -> int:
+        """
+        Counts the number of rows that satisfy the conditions
+        :return: the population size
+        """
+        session = Session.get()
+        q = session.query(func.count(getattr(self.model, self.id_column))).filter(*self.conditions(self.model))
+        return q.scalar()
+
+    def sample(self, sample_size: int, exclude_ids: Set[int] = None) -> List[int]:
+        """
+        Draws a uniform random sample of ids
+        :param sample_size: the number of ids to sample
+        :param exclude_ids: ids that must not be part of the sample
+        :return: a list of at most sample_size ids
+        """
+        exclude_ids = exclude_ids if exclude_ids else set()
+        if sample_size <= 0:
+            return []
+        if Session.is_postgres:
+            sampled_ids = self._sample_postgres(sample_size, exclude_ids)
+        elif self.seed is not None:
+            sampled_ids = self._sample_reservoir(sample_size, exclude_ids)
+        else:
+            sampled_ids = self._sample_random_order(sample_size, exclude_ids)
+        if len(sampled_ids) > sample_size:
+            sampled_ids = self.__random.sample(sorted(sampled_ids), k=sample_size)
+        return list(sampled_ids)
+
+    def _sample_random_order(self, sample_size: int, exclude_ids: Set[int]) -> Set[int]:
+        session = Session.get()
+        id_attr = getattr(self.model, self.id_column)
+        # excluded ids could be drawn, so the limit includes them
+        q = session.query(id_attr).filter(*self.conditions(self.model))
+        q = q.order_by(func.random()).limit(sample_size + len(exclude_ids))
+        return {r[0] for r in q} - exclude_ids
+
+    def _sample_reservoir(self, sample_size: int, exclude_ids: Set[int]) -> Set[int]:
+        session = Session.get()
+        id_attr = getattr(self.model, self.id_column)
+        q = session.query(id_attr).filter(*self.conditions(self.model)).order_by(id_attr)
+        reservoir = []
+        population = 0
+        for r in q.yield_per(DocumentSampler.STREAM_BATCH_SIZE):
+            if r[0] in exclude_ids:
+                continue
+            population += 1
+            if len(reservoir) < sample_size:
+                reservoir.append(r[0])
+            else:
+                idx = self.__random.randrange(population)
+                if idx < sample_size:
+                    reservoir[idx] = r[0]
+        return set(reservoir)
+
+    def _sample_postgres(self, sample_size: int, exclude_ids: Set[int]) -> Set[int]:
+        population = self.count()
+        if population == 0:
+            return set()
+        session = Session.get()
+        percentage = DocumentSampler.OVERSAMPLING_FACTOR * 100.0 * (sample_size + len(exclude_ids)) / population
+        seed = self.seed if self.seed is not None else self.__random.randint(0, 2 ** 31 - 1)
+        while True:
+            percentage = min(percentage, 100.0)
+            logging.debug(f'Sampling {percentage:.4f}% of {population} rows (TABLESAMPLE)')
+            sampled = tablesample(self.model.__table__, func.bernoulli(percentage), name="sampled", seed=literal(seed))
+            q = session.query(getattr(sampled.c, self.id_column)).filter(*self.conditions(sampled.c))
+            sampled_ids = {r[0] for r in q} - exclude_ids
+            if len(sampled_ids) >= sample_size or percentage >= 100.0:
+                return sampled_ids
+            # the sample was too small by chance - retry with a larger rate
+            percentage = percentage * 2
+            seed += 1
+
+
+def collection_sampler(document_collection: str, seed: int = None) -> DocumentSampler:
+    """
+    A sampler for the document ids of a collection
+    :param document_collection: the document collection
+    :param seed: a random seed
+    :return: a DocumentSampler
+    """
+    return DocumentSampler(Document, "id", lambda t: [t.collection == document_collection], seed=seed)
+
+
+def _unicode_lower(value):
+    return value.lower() if value is not None else None
+
+
+def _register_sqlite_lower(session):
+    """
+    Registers a Unicode-aware lower function at the SQLite connection of the session
+    SQLite's lower() only converts ASCII characters (e.g. the Ö in Österreichische stays upper-cased)
+    :param session: the database session
+    :return: None
+    """
+    dbapi_connection = session.connection().connection.dbapi_connection
+    dbapi_connection.create_function(SQLITE_LOWER_FUNCTION, 1, _unicode_lower, deterministic=True)
+
+
+def journal_name_expression(journals):
+    """
+    SQL expression to extract the journal name of a DocumentMetadata journals entry
+    Journals are formatted in this way: Current pharmaceutical design, Vol. 21 No. 11 (2015)
+    The name is lower-cased in the same way on Postgres and SQLite (Unicode-aware)
+    :param journals: the journals column
+    :return: lower-cased journal name (text before the first comma)
+    """
+    if Session.is_postgres:
+        return func.lower(func.trim(func.split_part(journals, ',', 1)))
+    _register_sqlite_lower(Session.get())
+    name = func.substr(journals, 1, func.instr(journals.concat(','), ',') - 1)
+    return getattr(func, SQLITE_LOWER_FUNCTION)(func.trim(name))
+
+
+def journal_sampler(document_collection: str, journal_names: Set[str], relevant: bool = True,
+                    seed: int = None) -> DocumentSampler:
+    """
+    A sampler for document ids whose journal is (not) part of a journal list
+    :param document_collection: the document collection
+    :param journal_names: a set of lower-cased journal names
+    :param relevant: True: sample documents of the journals, False: sample all other documents
+    :param seed: a random seed
+    :return: a DocumentSampler
+    """
+    journal_names = sorted(journal_names)
+
+    def conditions(t):
+        journal_name = journal_name_expression(t.journals)
+        return [t.document_collection == document_collection,
+                journal_name.in_(journal_names) if relevant else journal_name.notin_(journal_names)]
+
+    return DocumentSampler(DocumentMetadata, "document_id", conditions, seed=seed)
+
+
+def iterate_texts(document_collection: str, document_ids: Iterable[int]) -> Iterable[Tuple[int, str]]:
+    """
+    Streams the title+abstract for the sampled document ids
+    :param document_collection: the document collection
+    :param document_ids: the sampled document ids
+    :return: an iterator over (document id, text)
+    """
+    session = Session.get()
+    for doc in iterate_over_all_documents_in_collection(session=session, collection=document_collection,
+                                                        document_ids=set(document_ids)):
+        yield doc.id, doc.get_text_content(sections=False)
@@ -1,14 +1,243 @@
+import hashlib
 import json
 import logging
+import multiprocessing
+import queue
+import sys
 from argparse import ArgumentParser
+from datetime import datetime
 
-from narrant.config import BACKEND_CONFIG
-from narrant.entity.entityresolver import MeshResolver, GeneResolver, SpeciesResolver
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import EntityResolverData
+from narrant.config import BACKEND_CONFIG, GENE_FILE, MESH_DESCRIPTORS_FILE, MESH_SUPPLEMENTARY_FILE, TAXONOMY_FILE
+from narrant.entity.entityresolver import MeshResolver, GeneResolver, SpeciesResolver, get_gene_ids, \
+    get_species_ids
 from narrant.entity.genemapper import GeneMapper
+from narrant.entity.meshclosure import create_and_store_closure_table
 from narrant.entity.meshontology import MeSHOntology
+from narrant.entity.ncbireader import build_gene_indexes
+from narrant.mesh.diff import MeSHReleaseDiff
+from narrant.util.filecache import file_fingerprint
 
+FINGERPRINTS_NAME = "IndexBuildFingerprints"
 
-def build_entity_indexes(complete: bool, skip_mesh: bool, force: bool = False):
+
+class IndexBuildError(Exception):
+    pass
+
+
+def ids_fingerprint(ids) -> str:
+    """
+    Fingerprint of a set of ids (e.g. the gene ids in the Tag table)
+    :param ids: a set of ids or None (no filter)
+    :return: a fingerprint string
+    """
+    if ids is None:
+        return "all"
+    id_str = ','.join(str(i) for i in sorted(ids))
+    return f'{len(ids)}:{hashlib.md5(id_str.encode("utf-8")).hexdigest()}'
+
+
+def build_mesh_ontology():
+    entity_ontology = MeSHOntology()
+    entity_ontology.create_and_store_index()
+    logging.info('Computing MeSH ancestor closure table...')
+    create_and_store_closure_table(entity_ontology)
+
+
+def build_mesh_resolver(workers):
+    mesh = MeshResolver()
+    mesh.build_index(workers=workers)
+
+
+def update_mesh_resolver(mesh_diff_file):
+    mesh = MeshResolver()
+    mesh.update_index(MeSHReleaseDiff.load(mesh_diff_file))
+
+
+def build_gene_and_mapper_indexes(gene_ids, workers):
+    # single pass over the gene file for both indexes
+    gene_mapper = GeneMapper()
+    gene = GeneResolver()
+    build_gene_indexes(GENE_FILE, gene_resolver=gene, gene_mapper=gene_mapper, gene_ids=gene_ids, workers=workers)
+    gene_mapper.store_index()
+    gene.store_index()
+
+
+def build_species_index(species_ids, workers):
+    species = SpeciesResolver()
+    species.build_index(query_db_species_ids=species_ids is not None, species_ids=species_ids, workers=workers)
+
+
+class IndexBuildTask:
+    """
+    An index builder together with the fingerprints of its inputs
+    """
+
+    def __init__(self, name: str, function, inputs: dict, args: tuple = ()):
+        """
+        :param name: name of the index
+        :param function: a module-level function that builds and stores the index
+        :param inputs: a dictionary input name -> fingerprint
+        :param args: arguments of the function
+        """
+        self.name = name
+        self.function = function
+        self.inputs = inputs
+        self.args = args
+
+
+def _run_task(task: IndexBuildTask, result_queue):
+    start_time = datetime.now()
+    error = None
+    try:
+        task.function(*task.args)
+    except Exception as e:
+        logging.exception(f'Building {task.name} failed')
+        error = str(e)
+        # the following builders must not run in the aborted transaction
+        Session.get().rollback()
+    result_queue.put((task.name, (datetime.now() - start_time).total_seconds(), error))
+
+
+def _run_task_process(task: IndexBuildTask, result_queue):
+    # the forked process must not reuse the pooled connections of its parent
+    Session.get().bind.dispose(close=False)
+    _run_task(task, result_queue)
+
+
+class IndexBuildPlanner:
+    """
+    Runs the index builders whose input fingerprints changed since their last successful build
+    Independent builders run concurrently in separate processes
+    The fingerprints are stored in the entity_resolver_data table
+    """
+
+    def __init__(self, tasks: [IndexBuildTask], parallel: int = 1, rebuild: bool = False):
+        """
+        :param tasks: the index build tasks
+        :param parallel: number of builders that run concurrently (1 = run in this process)
+        :param rebuild: ignore the stored fingerprints
+        """
+        self.tasks = tasks
+        self.parallel = parallel
+        self.rebuild = rebuild
+        self.timings = {}
+
+    @staticmethod
+    def load_fingerprints() -> dict:
+        try:
+            return dict(EntityResolverData.load_data_from_json(Session.get(), FINGERPRINTS_NAME))
+        except Exception:
+            # no fingerprints stored yet
+            return {}
+
+    @staticmethod
+    def store_fingerprints(fingerprints: dict):
+        EntityResolverData.overwrite_resolver_data(Session.get(), name=FINGERPRINTS_NAME,
+                                                   json_data=json.dumps(fingerprints))
+
+    def plan(self) -> [IndexBuildTask]:
+        """
+        Computes the tasks that must be run
+        :return: a list of tasks whose inputs changed
+        """
+        fingerprints = self.load_fingerprints()
+        to_build = []
+        for task in self.tasks:
+            if not self.rebuild and fingerprints.get(task.name) == task.inputs:
+                logging.info(f'{task.name}: inputs unchanged - skipping')
+                self.timings[task.name] = ("skipped", 0.0)
+            else:
+                logging.info(f'{task.name}: inputs changed - building')
+                to_build.append(task)
+        return to_build
+
+    def run(self):
+        """
+        Runs all tasks whose inputs changed and stores the new fingerprints of successful builds
+        Prints a timing breakdown at the end
+        :return: a dictionary index name -> (status, seconds)
+        :raises IndexBuildError: if at least one builder failed (the timings are kept in self.timings)
+        """
+        start_time = datetime.now()
+        to_build = self.plan()
+        tasks_by_name = {t.name: t for t in to_build}
+        parallel = self.parallel
+        if parallel > 1 and Session.is_sqlite:
+            logging.warning('SQLite does not support concurrent writers - building indexes sequentially')
+            parallel = 1
+
+        result_queue = multiprocessing.Queue()
+        results = []
+        if parallel <= 1:
+            for task in to_build:
+                _run_task(task, result_queue)
+                results.append(result_queue.get())
+        else:
+            # worker processes open their own connections
+            Session.get().remove()
+            pending = list(to_build)
+            running = {}
+            while pending or running:
+                while pending and len(running) < parallel:
+                    task = pending.pop(0)
+                    logging.info(f'Starting process for {task.name}...')
+                    process = multiprocessing.Process(target=_run_task_process, args=(task, result_queue))
+                    process.start()
+                    running[task.name] = (process, datetime.now())
+                try:
+                    result = result_queue.get(timeout=1)
+                    results.append(result)
+                    running.pop(result[0])[0].join()
+                except queue.Empty:
+                    # processes that died without reporting a result (e.g. killed by the OOM killer)
+                    for name, (process, process_start) in list(running.items()):
+                        if process.exitcode is not None and result_queue.empty():
+                            logging.error(f'Process for {name} died with exit code {process.exitcode}')
+                            seconds = (datetime.now() - process_start).total_seconds()
+                            results.append((name, seconds, f'exit code {process.exitcode}'))
+                            running.pop(name)
+
+        fingerprints = self.load_fingerprints()
+        for name, seconds, error in results:
+            if error:
+                self.timings[name] = ("failed", seconds)
+                fingerprints.pop(name, None)
+            else:
+                self.timings[name] = ("built", seconds)
+                fingerprints[name] = tasks_by_name[name].inputs
+        self.store_fingerprints(fingerprints)
+
+        logging.info('=' * 60)
+        logging.info('Index build timings:')
+        for task in self.tasks:
+            status, seconds = self.timings[task.name]
+            logging.info(f'{task.name:<30} {status:<8} {seconds:>10.1f}s')
+        logging.info(f'{"Total":<30} {"":<8} {(datetime.now() - start_time).total_seconds():>10.1f}s')
+        logging.info('=' * 60)
+        failed = [name for name, (status, _) in self.timings.items() if status == "failed"]
+        if failed:
+            raise IndexBuildError(f'Building {", ".join(failed)} failed')
+        return self.timings
+
+
+def build_entity_indexes(complete: bool, skip_mesh: bool, force: bool = False, workers: int = 1,
+                         parallel: int = 1, rebuild: bool = False, mesh_diff_file: str = None):
+    """
+    Builds all entity indexes
+    Indexes whose input fingerprints did not change since their last build are skipped
+    :param complete: build complete gene and species indexes (not filtered by the Tag table)
+    :param skip_mesh: skip the MeSH indexes
+    :param force: do not ask for the database connection
+    :param workers: number of worker processes to parse the MeSH, gene and taxonomy files
+    :param parallel: number of index builders that run concurrently
+    :param rebuild: rebuild all indexes regardless of their fingerprints
+    :param mesh_diff_file: a MeSH release diff (JSON) - if given, the MeSH resolver is updated with the affected
+    records of the diff instead of being rebuilt from the MeSH files
+    :return: None
+    :raises IndexBuildError: if at least one index could not be built
+    """
     logging.info('=' * 60)
     logging.info('=' * 60)
     logging.info('Building entity translation indexes...')
@@ -38,34 +267,34 @@ def build_entity_indexes(complete: bool, skip_mesh: bool, force: bool = False):
         logging.info('=' * 60)
         logging.info('=' * 60)
 
+        logging.info('Computing input fingerprints...')
+        tasks = []
         if not skip_mesh:
-            logging.info('Computing entity ontology index...')
-            entity_ontology = MeSHOntology()
-            entity_ontology.create_and_store_index()
-
-            logging.info('Computing MeSH Resolver index...')
-            mesh = MeshResolver()
-            mesh.build_index()
+            tasks.append(IndexBuildTask("MeSHOntology", build_mesh_ontology,
+                                        dict(mesh=file_fingerprint(MESH_DESCRIPTORS_FILE))))
+            mesh_inputs = dict(mesh=file_fingerprint(MESH_DESCRIPTORS_FILE),
+                               mesh_supplementary=file_fingerprint(MESH_SUPPLEMENTARY_FILE))
+            if mesh_diff_file:
+                tasks.append(IndexBuildTask("MeshResolver", update_mesh_resolver, mesh_inputs,
+                                            args=(mesh_diff_file,)))
+            else:
+                tasks.append(IndexBuildTask("MeshResolver", build_mesh_resolver, mesh_inputs, args=(workers,)))
         else:
             logging.info('Skipping MeSH Index creation...')
 
-        logging.info('Computing Gene Mapping index...')
-        gene_mapper = GeneMapper()
-        gene_mapper.build_gene_mapper_index()
-
-        logging.info('Computing Gene Resolver index...')
-        gene = GeneResolver()
-        if complete:
-            gene.build_index(query_db_gene_ids=False)
-        else:
-            gene.build_index()
+        session = Session.get()
+        gene_ids = None if complete else get_gene_ids(session)
+        species_ids = None if complete else get_species_ids(session)
+        tasks.append(IndexBuildTask("GeneMapper+GeneResolver", build_gene_and_mapper_indexes,
+                                    dict(genes=file_fingerprint(GENE_FILE), tag_gene_ids=ids_fingerprint(gene_ids)),
+                                    args=(gene_ids, workers)))
+        tasks.append(IndexBuildTask("SpeciesResolver", build_species_index,
+                                    dict(taxonomy=file_fingerprint(TAXONOMY_FILE),
+                                         tag_species_ids=ids_fingerprint(species_ids)),
+                                    args=(species_ids, workers)))
 
-        logging.info('Computing Species Resolver index...')
-        species = SpeciesResolver()
-        if complete:
-            species.build_index(query_db_species_ids=False)
-        else:
-            species.build_index()
+        planner = IndexBuildPlanner(tasks, parallel=parallel, rebuild=rebuild)
+        planner.run()
 
         logging.info('=' * 60)
         logging.info('=' * 60)
@@ -83,13 +312,27 @@ def main():
     parser.add_argument("--force", action='store_true', help="Skip asking for the correct DB connection")
     parser.add_argument("--skip-mesh", action='store_true', help="Skip the recreation of MeSH Indexes")
     parser.add_argument("--complete", action='store_true', help="Builds a complete Gene and Species Index...")
+    parser.add_argument("-w", "--workers", default=1, type=int,
+                        help="Number of worker processes to parse the MeSH, gene and taxonomy files")
+    parser.add_argument("-p", "--parallel", default=1, type=int,
+                        help="Number of index builders that run concurrently in separate processes")
+    parser.add_argument("--rebuild", action='store_true',
+                        help="Rebuild all indexes even if their inputs did not change")
+    parser.add_argument("--mesh-diff",
+                        help="Update the MeSH resolver with a MeSH release diff (JSON, see narrant.mesh.diff) "
+                             "instead of rebuilding it")
     args = parser.parse_args()
 
     logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
                         datefmt='%Y-%m-%d:%H:%M:%S',
                         level=logging.DEBUG)
 
-    build_entity_indexes(args.complete, args.skip_mesh, force=args.force)
+    try:
+        build_entity_indexes(args.complete, args.skip_mesh, force=args.force, workers=args.workers,
+                             parallel=args.parallel, rebuild=args.rebuild, mesh_diff_file=args.mesh_diff)
+    except IndexBuildError as e:
+        logging.error(str(e))
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,32 +1,62 @@
 import logging
 import os
 import shutil
+from argparse import ArgumentParser
 
 from narrant.config import PREPROCESS_CONFIG, TMP_DIR_TAGGER
 from narrant.entitylinking.pharmacy.pharmdicttagger import PharmDictTagger
+from narrant.mesh.diff import MeSHReleaseDiff
+from narrant.vocabularies.generic_vocabulary import GenericVocabulary
 
 
-def build_tagging_indexes():
+def build_tagging_indexes(mesh_diff: MeSHReleaseDiff = None):
+    """
+    Builds the indexes of all pharmaceutical taggers
+    :param mesh_diff: if a MeSH release diff is given, only the indexes whose MeSH vocabulary is affected by the
+    diff are rebuilt (all other indexes are kept)
+    :return: None
+    """
     logging.info('==' * 60)
     logging.info('Building Tagging Indexes')
     logging.info('==' * 60)
     kwargs = dict(logger=logging, config=PREPROCESS_CONFIG, collection="Test")
-    if os.path.exists(TMP_DIR_TAGGER) and os.path.isdir(TMP_DIR_TAGGER):
+    if mesh_diff is None and os.path.exists(TMP_DIR_TAGGER) and os.path.isdir(TMP_DIR_TAGGER):
         shutil.rmtree(TMP_DIR_TAGGER)
         os.makedirs(TMP_DIR_TAGGER)
 
+    taggers = []
     for ent_type, tagger_class in PharmDictTagger.tagger_by_type.items():
         logging.info(f'Init tagger for type: {ent_type}')
         tagger = tagger_class(**kwargs)
+        if mesh_diff is not None:
+            if not GenericVocabulary.is_affected_by_mesh_diff(tagger.source, mesh_diff):
+                logging.info(f'MeSH vocabulary of {ent_type} is not affected by the MeSH release diff - keeping index')
+                continue
+            logging.info(f'MeSH vocabulary of {ent_type} is affected by the MeSH release diff - rebuilding index')
+            if os.path.isfile(tagger.index_cache):
+                os.remove(tagger.index_cache)
+        taggers.append(tagger)
+
+    # the MeSH subtree vocabularies of all taggers are extracted in a single pass over MeSH
+    GenericVocabulary.preload_mesh_vocabularies([tagger.source for tagger in taggers
+                                                 if isinstance(tagger.source, str) and os.path.isdir(tagger.source)])
+    for tagger in taggers:
         tagger.prepare()
+    GenericVocabulary.clear_preloaded_mesh_vocabularies()
     logging.info('==' * 60)
 
 
 def main():
+    parser = ArgumentParser(description="Builds the tagging indexes")
+    parser.add_argument("--mesh-diff", help="MeSH release diff (JSON, see narrant.mesh.diff): only rebuild the "
+                                            "indexes whose MeSH vocabulary changed")
+    args = parser.parse_args()
+
     logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
                         datefmt='%Y-%m-%d:%H:%M:%S',
                         level=logging.INFO)
-    build_tagging_indexes()
+    mesh_diff = MeSHReleaseDiff.load(args.mesh_diff) if args.mesh_diff else None
+    build_tagging_indexes(mesh_diff)
 
 
 if __name__ == "__main__":
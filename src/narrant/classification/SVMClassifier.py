@@ -1,29 +1,37 @@
 import logging
 import pickle
 import random
-from typing import Set
 
+import scipy.sparse as sp
 from sklearn import svm
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.model_selection import train_test_split, GridSearchCV
 
 from kgextractiontoolbox.backend.database import Session
-from kgextractiontoolbox.backend.models import Document
 from kgextractiontoolbox.backend.retrieve import iterate_over_all_documents_in_collection
 from kgextractiontoolbox.document.document import TaggedDocument
 from kgextractiontoolbox.entitylinking.classifier import BaseClassifier
+from narrant.backend.sampling import collection_sampler
+from narrant.classification.featurestore import DocumentFeatureStore
 
 
 class SVMClassifier(BaseClassifier):
     TRAIN_RATIO = 0.8
     TEST_RATIO = 0.2
 
-    def __init__(self, classification: str, model_path: str):
+    def __init__(self, classification: str, model_path: str, feature_store: DocumentFeatureStore = None):
         super().__init__(classification)
         logging.info(f'Loading SVM (class = {classification}) files from {model_path}')
         self.model: svm.SVC = None
         self.vectorizer = None
+        self.feature_store = None
+        self.__projection = None
         self.__load_model(model_path)
+        if feature_store:
+            if feature_store.is_compatible(self.vectorizer):
+                self.feature_store = feature_store
+            else:
+                logging.warning('Vectorizer of the SVM model is not compatible to the feature store - ignoring store')
 
     def __load_model(self, model_path: str):
         logging.info(f'Loading SVM model from {model_path}')
@@ -39,30 +47,33 @@ class SVMClassifier(BaseClassifier):
         :return: None
         """
         texts = [doc.get_text_content(sections=consider_sections)]
-        text_vec = self.vectorizer.transform(texts)
+        text_vec = None
+        if self.feature_store and not consider_sections:
+            counts = self.feature_store.get_counts(doc.id, text=texts[0])
+            if counts is not None:
+                text_vec = self._counts_to_tfidf(counts)
+        if text_vec is None:
+            text_vec = self.vectorizer.transform(texts)
         labels = self.model.predict(text_vec)
         if labels[0] == 1:
             doc.classification[self.classification] = "SVM"
 
-    @staticmethod
-    def get_negative_document_ids(positive_document_ids: Set[int], document_collection: str):
+    def _counts_to_tfidf(self, counts: sp.csr_matrix) -> sp.csr_matrix:
         """
-        Gets a set of negative document ids (intersection of positive and negative documents will be empty)
-        :param positive_document_ids: the set of positive document ids (to ensure an empty intersection)
-        :param document_collection: the corresponding document collection
-        :return:
+        Projects token count vectors of the feature store into the feature space of the model's vectorizer
+        and applies the vectorizer's tfidf weighting
+        :param counts: a count matrix retrieved from the feature store
+        :return: a tfidf matrix (equal to vectorizer.transform on the texts)
         """
-        session = Session.get()
-        d_query = session.query(Document.id).filter(Document.collection == document_collection)
-        negative_document_ids = set()
-        for r in d_query:
-            negative_document_ids.add(r[0])
-        negative_document_ids = negative_document_ids - positive_document_ids
-        return negative_document_ids
+        # the store vocabulary might grow while the classifier is used
+        if self.__projection is None or self.__projection.shape[0] != counts.shape[1]:
+            self.__projection = self.feature_store.build_projection(self.vectorizer.vocabulary_,
+                                                                    len(self.vectorizer.vocabulary_))
+        return DocumentFeatureStore.transform_counts(counts, self.__projection, self.vectorizer)
 
     @staticmethod
     def train_model(document_id_file: str, document_collection: str, model_path: str,
-                    train_sample_size=100000, no_workers=-1):
+                    train_sample_size=100000, no_workers=-1, feature_store: DocumentFeatureStore = None):
         """
         Trains a SVM based on a set of document ids. Negative examples are randomly sampled from the database
         The SVM model learns to predict the document's class based on the title+abstract
@@ -71,6 +82,7 @@ class SVMClassifier(BaseClassifier):
         :param model_path: path to store the trained SVM model
         :param train_sample_size: how many documents should be sampled for training (Does not have an effect if the number of document ids is less than this parameter)
         :param no_workers: number of parallel works to train the SVM (-1 = no cores)
+        :param feature_store: if given, token counts are read from the store (missing documents are added)
         :return: None
         """
         logging.info('Beginning SVM training...')
@@ -80,37 +92,54 @@ class SVMClassifier(BaseClassifier):
             pos_document_ids = set([int(line.strip()) for line in f])
         logging.info(f'{len(pos_document_ids)} positive document ids loaded')
 
-        logging.info(f'Retrieving negative document ids from database...')
-        neg_document_ids = SVMClassifier.get_negative_document_ids(positive_document_ids=pos_document_ids,
-                                                                   document_collection=document_collection)
-        logging.info(f'{len(neg_document_ids)} negative document ids retrieved')
+        logging.info(f'Counting negative document candidates in database...')
+        neg_sampler = collection_sampler(document_collection)
+        neg_candidate_count = neg_sampler.count() - len(pos_document_ids)
+        logging.info(f'{neg_candidate_count} negative document candidates found')
 
         # Calculate the minimum sample size to be balanced
-        max_sample_size = min([len(pos_document_ids), len(neg_document_ids), train_sample_size])
+        max_sample_size = min([len(pos_document_ids), neg_candidate_count, train_sample_size])
         logging.info(f'Working with sample size {max_sample_size}')
 
-        pos_document_ids = random.sample(pos_document_ids, k=max_sample_size)
-        neg_document_ids = random.sample(neg_document_ids, k=max_sample_size)
+        # negative documents are sampled inside the database
+        neg_document_ids = neg_sampler.sample(max_sample_size, exclude_ids=pos_document_ids)
+        pos_document_ids = random.sample(sorted(pos_document_ids), k=max_sample_size)
         logging.info(f'Computed {len(pos_document_ids)} positive / {len(neg_document_ids)} negative examples')
 
-        logging.info('Retrieving texts from database....')
         session = Session.get()
         doc_ids = pos_document_ids + neg_document_ids
-        x_data, y_data = [], []
-        for doc in iterate_over_all_documents_in_collection(session=session, collection=document_collection,
-                                                            document_ids=doc_ids):
-            text = doc.get_text_content(sections=False)
-            x_data.append(text)
-            if doc.id in pos_document_ids:
-                y_data.append(1)
-            else:
-                y_data.append(0)
-        logging.info(f'Retrieved {len(x_data)} texts (and {len(y_data)} labels)')
-
-        logging.info('Vectorizing texts (tfidf vectorizer)...')
-        vectorizer = TfidfVectorizer()
-        vectorizer.fit(x_data)
-        x_data = vectorizer.transform(x_data)
+        if feature_store:
+            missing_ids = feature_store.missing_document_ids(doc_ids)
+            logging.info(f'Computing token counts for {len(missing_ids)} documents missing in feature store...')
+            if missing_ids:
+                feature_store.update(iterate_over_all_documents_in_collection(session=session,
+                                                                              collection=document_collection,
+                                                                              document_ids=missing_ids),
+                                     total=len(missing_ids))
+            found_ids, counts = feature_store.get_count_matrix(doc_ids)
+            pos_id_set = set(pos_document_ids)
+            y_data = [1 if d_id in pos_id_set else 0 for d_id in found_ids]
+            logging.info(f'Retrieved {counts.shape[0]} vectors (and {len(y_data)} labels) from feature store')
+
+            logging.info('Vectorizing texts (tfidf vectorizer)...')
+            vectorizer, x_data = feature_store.fit_tfidf_vectorizer(counts)
+        else:
+            logging.info('Retrieving texts from database....')
+            x_data, y_data = [], []
+            for doc in iterate_over_all_documents_in_collection(session=session, collection=document_collection,
+                                                                document_ids=doc_ids):
+                text = doc.get_text_content(sections=False)
+                x_data.append(text)
+                if doc.id in pos_document_ids:
+                    y_data.append(1)
+                else:
+                    y_data.append(0)
+            logging.info(f'Retrieved {len(x_data)} texts (and {len(y_data)} labels)')
+
+            logging.info('Vectorizing texts (tfidf vectorizer)...')
+            vectorizer = TfidfVectorizer()
+            vectorizer.fit(x_data)
+            x_data = vectorizer.transform(x_data)
 
         # Split into train and test
         x_train, x_test, y_train, y_test = train_test_split(x_data, y_data, test_size=1 - SVMClassifier.TRAIN_RATIO)
@@ -0,0 +1,152 @@
+import logging
+import multiprocessing
+from argparse import ArgumentParser
+from typing import List
+
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import Document, DocumentClassification
+from kgextractiontoolbox.backend.retrieve import iterate_over_all_documents_in_collection
+from kgextractiontoolbox.document.document import TaggedDocument
+from kgextractiontoolbox.document.extract import read_pubtator_documents
+from kgextractiontoolbox.document.load_document import document_bulk_load
+from kgextractiontoolbox.entitylinking.classifier import BaseClassifier, Classifier
+from narrant.classification.SVMClassifier import SVMClassifier
+from narrant.classification.featurestore import DocumentFeatureStore
+from narrant.config import FEATURE_STORE_DIR
+from narrant.util.multiprocessing.ConsumerWorker import ConsumerWorker
+from narrant.util.multiprocessing.ProducerWorker import ProducerWorker
+from narrant.util.multiprocessing.Worker import Worker
+
+BULK_INSERT_AFTER_K = 1000
+
+
+def apply_classifiers(classifiers: List[BaseClassifier], document_collection: str, input_file: str = None,
+                      workers: int = 1, consider_sections: bool = False):
+    """
+    Applies several classifiers in a single pass over the documents
+    Each document is read once, all classifiers are applied in the same worker and the resulting
+    document classifications are written to the database in one bulk stream
+    :param classifiers: a list of classifiers (e.g. rule-based Classifier or SVMClassifier)
+    :param document_collection: the corresponding document collection
+    :param input_file: a pubtator file (if None, all documents of the collection are classified)
+    :param workers: number of parallel workers
+    :param consider_sections: should the fulltext sections be considered
+    :return: None
+    """
+    session = Session.get()
+    logging.info(f'Getting document ids from database for collection: {document_collection}...')
+    document_ids_in_db = Document.get_document_ids_for_collection(session, document_collection)
+    logging.info(f'{len(document_ids_in_db)} found')
+    session.remove()
+
+    classes = [c.classification for c in classifiers]
+    logging.info(f'Applying {len(classifiers)} classifiers ({classes}) with {workers} workers')
+
+    def generate_tasks():
+        if input_file:
+            for doc in read_pubtator_documents(input_file):
+                t_doc = TaggedDocument(doc, ignore_tags=True)
+                if t_doc and t_doc.id in document_ids_in_db and t_doc.has_content():
+                    yield t_doc
+        else:
+            db_session = Session.get()
+            for t_doc in iterate_over_all_documents_in_collection(db_session, document_collection,
+                                                                  consider_sections=consider_sections):
+                if t_doc.has_content():
+                    yield t_doc
+            db_session.remove()
+
+    def do_task(in_doc: TaggedDocument):
+        classifications = []
+        for classifier in classifiers:
+            try:
+                classifier.classify_document(in_doc, consider_sections=consider_sections)
+            except Exception as e:
+                logging.error(f'Error when classifying {in_doc.id} with {classifier.classification} ({str(e)})')
+        for d_class, explanation in in_doc.classification.items():
+            if d_class in classes:
+                classifications.append(dict(document_id=in_doc.id,
+                                            document_collection=document_collection,
+                                            classification=d_class,
+                                            explanation=explanation))
+        return classifications
+
+    docs_done = multiprocessing.Value('i', 0)
+    insert_values = []
+
+    def consume_task(classifications: List[dict]):
+        docs_done.value += 1
+        insert_values.extend(classifications)
+        if docs_done.value % BULK_INSERT_AFTER_K == 0:
+            logging.info(f'{docs_done.value} documents classified')
+            if insert_values:
+                DocumentClassification.bulk_insert_values_into_table(Session.get(), insert_values)
+                insert_values.clear()
+
+    def shutdown_consumer():
+        if insert_values:
+            DocumentClassification.bulk_insert_values_into_table(Session.get(), insert_values)
+            insert_values.clear()
+        logging.info(f'{docs_done.value} documents classified')
+
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    producer = ProducerWorker(task_queue, generate_tasks, workers, max_tasks=10000)
+    worker_processes = [Worker(task_queue, result_queue, do_task) for _ in range(workers)]
+    consumer = ConsumerWorker(result_queue, consume_task, workers, shutdown=shutdown_consumer)
+
+    producer.start()
+    for w in worker_processes:
+        w.start()
+    consumer.start()
+    consumer.join()
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description="Applies several classifiers (rule-based and SVM) in a single pass")
+    parser.add_argument("-i", "--input", help="composite pubtator file (if not given, the collection is classified)")
+    parser.add_argument("-c", "--collection", required=True, help="The document collection")
+    parser.add_argument("-r", "--rules", nargs=2, action='append', default=[], metavar=("CLASS", "RULE_FILE"),
+                        help="A document class and its rule file (can be given multiple times)")
+    parser.add_argument("--svm", nargs=2, action='append', default=[], metavar=("CLASS", "SVM_MODEL"),
+                        help="A document class and its trained SVM model (can be given multiple times)")
+    parser.add_argument("--feature-store", nargs='?', const=FEATURE_STORE_DIR, default=None,
+                        help=f"SVMs read token counts from the feature store (default directory: {FEATURE_STORE_DIR})")
+    parser.add_argument("-w", "--workers", default=1, type=int, help="Number of parallel workers")
+    parser.add_argument("--sections", action="store_true", default=False,
+                        help="Should the section texts be considered when classifying?")
+    parser.add_argument("--skip-load", action='store_true',
+                        help="Skip bulk load of documents on start (expert setting)")
+    parser.add_argument("--loglevel", default="INFO")
+    args = parser.parse_args(arguments)
+
+    logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        level=args.loglevel.upper())
+
+    if not args.rules and not args.svm:
+        parser.error("at least one classifier (--rules or --svm) must be given")
+
+    classifiers = []
+    for d_class, rule_file in args.rules:
+        logging.info(f'Loading rules (class = {d_class}) from {rule_file}')
+        classifiers.append(Classifier(d_class, rule_file))
+
+    feature_store = None
+    if args.feature_store:
+        feature_store = DocumentFeatureStore(args.collection, store_dir=args.feature_store)
+    for d_class, model_file in args.svm:
+        classifiers.append(SVMClassifier(classification=d_class, model_path=model_file, feature_store=feature_store))
+
+    if args.input and not args.skip_load:
+        document_bulk_load(args.input, args.collection, logger=logging)
+    else:
+        logging.info("Skipping bulk load")
+
+    apply_classifiers(classifiers, args.collection, input_file=args.input, workers=args.workers,
+                      consider_sections=args.sections)
+    logging.info('Finished')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,15 +2,22 @@ from argparse import ArgumentParser
 
 from kgextractiontoolbox.entitylinking.classification import add_classification_args, perform_classification
 from narrant.classification.SVMClassifier import SVMClassifier
+from narrant.classification.featurestore import DocumentFeatureStore
+from narrant.config import FEATURE_STORE_DIR
 
 
 def main(arguments=None):
     parser = ArgumentParser(description="Classification script")
     parser.add_argument("svm_model", help="Path to the trained SVM model")
+    parser.add_argument("--feature-store", nargs='?', const=FEATURE_STORE_DIR, default=None,
+                        help=f"Read token counts from the feature store (default directory: {FEATURE_STORE_DIR})")
     add_classification_args(parser)
     args = parser.parse_args(arguments)
 
-    classifier = SVMClassifier(classification=args.cls, model_path=args.svm_model)
+    feature_store = None
+    if args.feature_store:
+        feature_store = DocumentFeatureStore(args.collection, store_dir=args.feature_store)
+    classifier = SVMClassifier(classification=args.cls, model_path=args.svm_model, feature_store=feature_store)
     perform_classification(classifier=classifier, document_collection=args.collection,
                            input_file=args.input, workdir=args.workdir, workers=args.workers,
                            consider_sections=args.sections, loglevel=args.loglevel, skip_load=args.skip_load,
@@ -0,0 +1,344 @@
+import logging
+import os
+from argparse import ArgumentParser
+from typing import Iterable, List, Set, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.retrieve import iterate_over_all_documents_in_collection
+from kgextractiontoolbox.document.document import TaggedDocument
+from kgextractiontoolbox.progress import Progress
+from narrant.config import FEATURE_STORE_DIR
+from narrant.document.md5_hasher import get_md5_hash_str
+
+
+class FeatureChunk:
+    """
+    A chunk of the feature store: token count vectors (CSR rows) for a document id range
+    """
+
+    def __init__(self, document_ids: np.ndarray, text_hashes: np.ndarray, counts: sp.csr_matrix):
+        self.document_ids = document_ids
+        self.text_hashes = text_hashes
+        self.counts = counts
+        self.doc2row = {int(d_id): idx for idx, d_id in enumerate(document_ids)}
+
+    def get_row(self, document_id: int, text_hash: str = None):
+        """
+        Returns the stored count vector of a document
+        :param document_id: the document id
+        :param text_hash: if given, the row is only returned if the stored text hash is equal
+        :return: a 1 x n CSR matrix or None if the document is not stored (or its text has changed)
+        """
+        if document_id not in self.doc2row:
+            return None
+        row = self.doc2row[document_id]
+        if text_hash and self.text_hashes[row] != text_hash:
+            return None
+        return self.counts[row]
+
+
+class DocumentFeatureStore:
+    """
+    Persistent store of sparse token count vectors for the title+abstract of documents
+    Vectors are kept in chunked CSR files (one file per collection and document id range) and are
+    shared between all classifiers. A token column index is never changed once assigned, so stored
+    vectors stay valid when new tokens are added.
+    """
+    CHUNK_SIZE = 100000
+    VOCABULARY_FILE = "vocabulary.txt"
+    MAX_CACHED_CHUNKS = 16
+    # Tokenization must be equal to the default TfidfVectorizer
+    ANALYZER_PARAMS = dict(analyzer='word', lowercase=True, token_pattern=r"(?u)\b\w\w+\b", ngram_range=(1, 1),
+                           stop_words=None, strip_accents=None, preprocessor=None, tokenizer=None)
+
+    def __init__(self, collection: str, store_dir: str = FEATURE_STORE_DIR):
+        self.collection = collection
+        self.directory = os.path.join(store_dir, collection)
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self.analyzer = CountVectorizer(**DocumentFeatureStore.ANALYZER_PARAMS).build_analyzer()
+        self.tokens = []
+        self.token2column = {}
+        self._chunk_cache = {}
+        self._load_vocabulary()
+
+    @property
+    def no_features(self) -> int:
+        return len(self.tokens)
+
+    def _vocabulary_path(self):
+        return os.path.join(self.directory, DocumentFeatureStore.VOCABULARY_FILE)
+
+    def _load_vocabulary(self):
+        self.tokens = []
+        self.token2column = {}
+        if os.path.isfile(self._vocabulary_path()):
+            with open(self._vocabulary_path(), 'rt') as f:
+                for line in f:
+                    token = line.rstrip('\n')
+                    self.token2column[token] = len(self.tokens)
+                    self.tokens.append(token)
+        logging.debug(f'Feature store vocabulary with {len(self.tokens)} tokens loaded')
+
+    def _append_tokens(self, new_tokens: List[str]):
+        if not new_tokens:
+            return
+        with open(self._vocabulary_path(), 'at') as f:
+            for token in new_tokens:
+                f.write(f'{token}\n')
+
+    def _chunk_path(self, chunk_no: int):
+        start = chunk_no * DocumentFeatureStore.CHUNK_SIZE
+        end = start + DocumentFeatureStore.CHUNK_SIZE - 1
+        return os.path.join(self.directory, f'{start}_{end}.npz')
+
+    @staticmethod
+    def _chunk_no(document_id: int) -> int:
+        return document_id // DocumentFeatureStore.CHUNK_SIZE
+
+    def _load_chunk(self, chunk_no: int) -> FeatureChunk:
+        if chunk_no in self._chunk_cache:
+            return self._chunk_cache[chunk_no]
+        path = self._chunk_path(chunk_no)
+        if not os.path.isfile(path):
+            return None
+        data = np.load(path)
+        if int(data["no_columns"]) > self.no_features:
+            # another process has extended the vocabulary
+            self._load_vocabulary()
+        # the chunk might have been written with a smaller vocabulary
+        counts = sp.csr_matrix((data["data"], data["indices"], data["indptr"]),
+                               shape=(len(data["document_ids"]), self.no_features))
+        chunk = FeatureChunk(data["document_ids"], data["text_hashes"], counts)
+        if len(self._chunk_cache) >= DocumentFeatureStore.MAX_CACHED_CHUNKS:
+            self._chunk_cache.clear()
+        self._chunk_cache[chunk_no] = chunk
+        return chunk
+
+    def _write_chunk(self, chunk_no: int, document_ids: List[int], text_hashes: List[str], rows: List[tuple]):
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        for idx, (indices, _) in enumerate(rows):
+            indptr[idx + 1] = indptr[idx] + len(indices)
+        np.savez(self._chunk_path(chunk_no),
+                 document_ids=np.array(document_ids, dtype=np.int64),
+                 text_hashes=np.array(text_hashes, dtype='U32'),
+                 data=np.concatenate([data for _, data in rows]).astype(np.int32),
+                 indices=np.concatenate([indices for indices, _ in rows]).astype(np.int32),
+                 indptr=indptr,
+                 no_columns=np.array(self.no_features))
+        self._chunk_cache.pop(chunk_no, None)
+
+    def _count_tokens(self, text: str, new_tokens: List[str]) -> tuple:
+        counts = {}
+        for token in self.analyzer(text):
+            if token not in self.token2column:
+                self.token2column[token] = len(self.tokens)
+                self.tokens.append(token)
+                new_tokens.append(token)
+            column = self.token2column[token]
+            counts[column] = counts.get(column, 0) + 1
+        indices = np.array(sorted(counts), dtype=np.int32)
+        return indices, np.array([counts[c] for c in indices], dtype=np.int32)
+
+    def _flush(self, chunk_no: int, computed: dict, new_tokens: List[str]):
+        # the vocabulary must be written first so that every stored column is known
+        self._append_tokens(new_tokens)
+        new_tokens.clear()
+
+        stored = {}
+        chunk = self._load_chunk(chunk_no)
+        if chunk:
+            indptr, indices, data = chunk.counts.indptr, chunk.counts.indices, chunk.counts.data
+            for idx, d_id in enumerate(chunk.document_ids):
+                start, end = indptr[idx], indptr[idx + 1]
+                stored[int(d_id)] = (str(chunk.text_hashes[idx]), (indices[start:end], data[start:end]))
+        stored.update(computed)
+
+        document_ids = sorted(stored)
+        self._write_chunk(chunk_no, document_ids,
+                          [stored[d_id][0] for d_id in document_ids],
+                          [stored[d_id][1] for d_id in document_ids])
+
+    def update(self, documents: Iterable[TaggedDocument], total: int = None) -> int:
+        """
+        Computes the token count vectors for all new or changed documents and stores them
+        Documents whose title+abstract did not change since the last update are skipped
+        Documents should be ordered by their id (each chunk is rewritten once per id range)
+        :param documents: an iterable of documents
+        :param total: number of documents (only used for the progress)
+        :return: the number of computed document vectors
+        """
+        progress = Progress(total=total, print_every=1000, text="Updating feature store...") if total else None
+        if progress:
+            progress.start_time()
+        new_tokens = []
+        computed = {}
+        current_chunk_no = None
+        no_computed = 0
+        for idx, doc in enumerate(documents):
+            if progress:
+                progress.print_progress(idx + 1)
+            chunk_no = DocumentFeatureStore._chunk_no(doc.id)
+            if current_chunk_no is not None and chunk_no != current_chunk_no and computed:
+                self._flush(current_chunk_no, computed, new_tokens)
+                computed = {}
+            current_chunk_no = chunk_no
+
+            text = doc.get_text_content(sections=False)
+            text_hash = get_md5_hash_str(text)
+            chunk = self._load_chunk(chunk_no)
+            if chunk and chunk.get_row(doc.id, text_hash) is not None:
+                continue
+            computed[doc.id] = (text_hash, self._count_tokens(text, new_tokens))
+            no_computed += 1
+
+        if computed:
+            self._flush(current_chunk_no, computed, new_tokens)
+        if progress:
+            progress.done()
+        logging.info(f'{no_computed} document vectors computed (vocabulary size: {self.no_features})')
+        return no_computed
+
+    def get_counts(self, document_id: int, text: str = None):
+        """
+        Returns the stored token count vector for a single document
+        :param document_id: the document id
+        :param text: if given, the vector is only returned if it was computed for the same text
+        :return: a 1 x no_features CSR matrix or None if the document is not available
+        """
+        chunk = self._load_chunk(DocumentFeatureStore._chunk_no(document_id))
+        if not chunk:
+            return None
+        text_hash = get_md5_hash_str(text) if text is not None else None
+        row = chunk.get_row(document_id, text_hash)
+        if row is not None and row.shape[1] < self.no_features:
+            # the chunk was read before the vocabulary has grown
+            row = sp.csr_matrix((row.data, row.indices, row.indptr), shape=(1, self.no_features))
+        return row
+
+    def missing_document_ids(self, document_ids: Iterable[int]) -> Set[int]:
+        """
+        Computes which of the document ids are not available in the store
+        :param document_ids: an iterable of document ids
+        :return: a set of missing document ids
+        """
+        missing = set()
+        for d_id in document_ids:
+            chunk = self._load_chunk(DocumentFeatureStore._chunk_no(d_id))
+            if not chunk or d_id not in chunk.doc2row:
+                missing.add(d_id)
+        return missing
+
+    def get_count_matrix(self, document_ids: Iterable[int]) -> Tuple[List[int], sp.csr_matrix]:
+        """
+        Reads the token count vectors for a list of documents
+        Document ids which are not available in the store are skipped
+        :param document_ids: an iterable of document ids
+        :return: the list of found document ids and a matrix (one row per found document id)
+        """
+        found_ids, rows = [], []
+        for d_id in sorted(document_ids):
+            row = self.get_counts(d_id)
+            if row is not None:
+                found_ids.append(d_id)
+                rows.append(row)
+        if not rows:
+            return found_ids, sp.csr_matrix((0, self.no_features), dtype=np.int32)
+        return found_ids, sp.vstack(rows, format='csr')
+
+    def is_compatible(self, vectorizer: CountVectorizer) -> bool:
+        """
+        Checks whether a vectorizer tokenizes texts in the same way as the store
+        :param vectorizer: a (fitted) CountVectorizer or TfidfVectorizer
+        :return: True if store vectors can be projected into the vectorizer's feature space
+        """
+        params = vectorizer.get_params()
+        return all(params.get(k) == v for k, v in DocumentFeatureStore.ANALYZER_PARAMS.items())
+
+    def build_projection(self, vocabulary: dict, no_features: int) -> sp.csr_matrix:
+        """
+        Builds a matrix that maps store columns to the columns of a vectorizer vocabulary
+        :param vocabulary: a token to column dictionary (e.g. vectorizer.vocabulary_)
+        :param no_features: the number of features of the target space
+        :return: a sparse no_store_features x no_features matrix
+        """
+        rows, columns = [], []
+        for token, column in vocabulary.items():
+            if token in self.token2column:
+                rows.append(self.token2column[token])
+                columns.append(column)
+        return sp.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                             shape=(self.no_features, no_features))
+
+    @staticmethod
+    def transform_counts(counts: sp.csr_matrix, projection: sp.csr_matrix,
+                         vectorizer: TfidfVectorizer) -> sp.csr_matrix:
+        """
+        Projects store vectors into the feature space of a vectorizer and applies the vectorizer's weighting
+        :param counts: a count matrix retrieved from the store
+        :param projection: the projection into the vectorizer's feature space (see build_projection)
+        :param vectorizer: a fitted TfidfVectorizer that is compatible with the store (see is_compatible)
+        :return: a tfidf matrix (equal to vectorizer.transform on the texts)
+        """
+        x = (counts @ projection).astype(np.float64)
+        if vectorizer.binary:
+            x.data[:] = 1
+        if vectorizer.sublinear_tf:
+            np.log(x.data, x.data)
+            x.data += 1
+        if vectorizer.use_idf:
+            x = x @ sp.diags(vectorizer.idf_)
+        if vectorizer.norm:
+            x = normalize(x, norm=vectorizer.norm, copy=False)
+        return sp.csr_matrix(x)
+
+    def fit_tfidf_vectorizer(self, counts: sp.csr_matrix) -> Tuple[TfidfVectorizer, sp.csr_matrix]:
+        """
+        Fits a TfidfVectorizer on store vectors (equal to fitting a TfidfVectorizer on the texts)
+        The vocabulary of the vectorizer consists of all tokens that occur in the vectors
+        :param counts: a count matrix retrieved from the store
+        :return: the fitted vectorizer and the tfidf transformed matrix
+        """
+        used_columns = np.unique(counts.indices)
+        counts = counts[:, used_columns]
+        vectorizer = TfidfVectorizer(vocabulary=[self.tokens[c] for c in used_columns],
+                                     **DocumentFeatureStore.ANALYZER_PARAMS)
+        transformer = TfidfTransformer()
+        x_data = transformer.fit_transform(counts)
+        vectorizer.idf_ = transformer.idf_
+        return vectorizer, x_data
+
+
+def main(arguments=None):
+    parser = ArgumentParser(description="Computes token count vectors of documents for the classification")
+    parser.add_argument("-c", "--collection", required=True, help="The document collection")
+    parser.add_argument("--idfile", help="Only update the documents of this id file (a document id per line)")
+    parser.add_argument("--store", default=FEATURE_STORE_DIR, help=f"Feature store directory "
+                                                                   f"(default: {FEATURE_STORE_DIR})")
+    args = parser.parse_args(arguments)
+
+    logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        level=logging.INFO)
+
+    document_ids = None
+    if args.idfile:
+        logging.info(f'Loading document ids from {args.idfile}...')
+        with open(args.idfile, 'rt') as f:
+            document_ids = set([int(line.strip()) for line in f if line.strip()])
+        logging.info(f'{len(document_ids)} document ids loaded')
+
+    store = DocumentFeatureStore(args.collection, store_dir=args.store)
+    session = Session.get()
+    store.update(iterate_over_all_documents_in_collection(session=session, collection=args.collection,
+                                                          document_ids=document_ids))
+    logging.info('Finished')
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import logging
 from argparse import ArgumentParser
 
 from narrant.classification.SVMClassifier import SVMClassifier
+from narrant.classification.featurestore import DocumentFeatureStore
+from narrant.config import FEATURE_STORE_DIR
 
 
 def main():
@@ -17,10 +19,16 @@ def main():
                         required=True)
     parser.add_argument("-w", "--workers", help="How workers should be used for training (-1 = all cores, default)",
                         type=int, default=-1)
+    parser.add_argument("--feature-store", nargs='?', const=FEATURE_STORE_DIR, default=None,
+                        help=f"Read token counts from the feature store (default directory: {FEATURE_STORE_DIR})")
 
     args = parser.parse_args()
+    feature_store = None
+    if args.feature_store:
+        feature_store = DocumentFeatureStore(args.collection, store_dir=args.feature_store)
     SVMClassifier.train_model(document_id_file=args.id_file, document_collection=args.collection,
-                              model_path=args.model_file, train_sample_size=args.samplesize, no_workers=args.workers)
+                              model_path=args.model_file, train_sample_size=args.samplesize, no_workers=args.workers,
+                              feature_store=feature_store)
 
 
 if __name__ == "__main__":
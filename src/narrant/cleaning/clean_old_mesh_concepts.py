@@ -8,21 +8,75 @@ from kgextractiontoolbox.backend.database import Session
 from kgextractiontoolbox.backend.models import Tag, Predication
 from kgextractiontoolbox.progress import Progress
 from narrant.config import MESH_SUPPLEMENTARY_FILE, MESH_DESCRIPTORS_FILE
-from narrant.mesh.data import MeSHDB
-from narrant.mesh.supplementary import MeSHDBSupplementary
+from narrant.mesh.cache import load_descriptors, load_supplementary_records
+from narrant.mesh.diff import MeSHReleaseDiff
 
 
-def clean_old_mesh_concepts(force_deletion: bool):
+def delete_mesh_concepts(session, old_mesh_terms):
+    """
+    Deletes MeSH concepts in the Tag-table and the Predication-table
+    :param session: a database session
+    :param old_mesh_terms: a set of entity ids (MESH:...)
+    :return: None
+    """
+    # delete old entities in the Tag-table
+    query = session.query(Tag)
+    query = query.filter(Tag.ent_id.in_(old_mesh_terms))
+    logging.info(f"Deleting {query.count()} old mesh terms in Tag-table")
+    query.delete(synchronize_session=False)
+    session.commit()
+
+    # delete old entities in the Relation-table
+    query = session.query(Predication)
+    query = query.filter(or_(Predication.subject_id.in_(old_mesh_terms), Predication.object_id.in_(old_mesh_terms)))
+    logging.info(f"Deleted {query.count()} old mesh terms in Predication-table")
+    query.delete(synchronize_session=False)
+    session.commit()
+
+
+def confirm_and_delete_mesh_concepts(session, old_mesh_terms, force_deletion: bool):
+    """
+    Asks for confirmation (unless the deletion is forced) and deletes the MeSH concepts afterwards
+    :param session: a database session
+    :param old_mesh_terms: a set of entity ids (MESH:...)
+    :param force_deletion: delete without asking
+    :return: True if the concepts were deleted, False if the deletion was canceled
+    """
+    if not force_deletion:
+        response = input("Do you want to delete all old mesh terms? [y/n]")
+        response = response[0]
+        if response.lower() != 'y':
+            logging.info("Canceled deletion. Exiting...")
+            return False
+    else:
+        logging.info("Force deleting all old mesh terms")
+
+    delete_mesh_concepts(session, old_mesh_terms)
+    return True
+
+
+def clean_mesh_concepts_from_diff(mesh_diff: MeSHReleaseDiff, force_deletion: bool):
+    """
+    Deletes only the MeSH concepts that were deleted between two MeSH releases
+    :param mesh_diff: the diff between the MeSH release of the database and the new release
+    :param force_deletion: delete without asking
+    :return: None
+    """
     start = datetime.now()
-    logging.info("Cleaning old mesh concepts [force deletion: {}]".format(force_deletion))
+    old_mesh_terms = {f'MESH:{record_id}' for record_id in mesh_diff.deleted}
+    logging.info(f"Found {len(old_mesh_terms)} deleted mesh terms in MeSH release diff:")
+    print(old_mesh_terms)
+    if not old_mesh_terms:
+        return
 
-    logging.info('Loading MeSH supplementary data...')
-    supp = MeSHDBSupplementary()
-    supp.load_xml(MESH_SUPPLEMENTARY_FILE)
+    if not confirm_and_delete_mesh_concepts(Session.get(), old_mesh_terms, force_deletion):
+        return
+    logging.info(f"Finished after {datetime.now() - start}s")
 
-    logging.info('Loading MeSH data...')
-    desc = MeSHDB()
-    desc.load_xml(MESH_DESCRIPTORS_FILE)
+
+def clean_old_mesh_concepts(force_deletion: bool, workers: int = 1):
+    start = datetime.now()
+    logging.info("Cleaning old mesh concepts [force deletion: {}]".format(force_deletion))
 
     logging.info("Retrieve MeSH terms from tag table...")
     session = Session.get()
@@ -35,8 +89,12 @@ def clean_old_mesh_concepts(force_deletion: bool):
     progress.start_time()
 
     known_mesh_ids = set()
-    known_mesh_ids.update({descriptor.unique_id for descriptor in desc.get_all_descs()})
-    known_mesh_ids.update({record.unique_id for record in supp.get_all_records()})
+    logging.info('Loading MeSH data...')
+    descriptors = load_descriptors(MESH_DESCRIPTORS_FILE, workers=workers)
+    known_mesh_ids.update({descriptor.unique_id for descriptor in descriptors})
+    logging.info('Loading MeSH supplementary data...')
+    records = load_supplementary_records(MESH_SUPPLEMENTARY_FILE, workers=workers)
+    known_mesh_ids.update({record.unique_id for record in records})
     logging.info(f'Found {len(known_mesh_ids)} known MeSH ids')
 
     for idx, t in enumerate(query):
@@ -49,36 +107,23 @@ def clean_old_mesh_concepts(force_deletion: bool):
     logging.info("Found {} old mesh terms:".format(len(old_mesh_terms)))
     print(old_mesh_terms)
 
-    if not force_deletion:
-        response = input("Do you want to delete all old mesh terms? [y/n]")
-        response = response[0]
-        if response.lower() != 'y':
-            logging.info("Canceled deletion. Exiting...")
-            return
-    else:
-        logging.info("Force deleting all old mesh terms")
-
-    # delete old entities in the Tag-table
-    query = session.query(Tag)
-    query = query.filter(Tag.ent_id.in_(old_mesh_terms))
-    logging.info(f"Deleting {query.count()} old mesh terms in Tag-table")
-    query.delete(synchronize_session=False)
-    session.commit()
-
-    # delete old entities in the Relation-table
-    query = session.query(Predication)
-    query = query.filter(or_(Predication.subject_id.in_(old_mesh_terms), Predication.object_id.in_(old_mesh_terms)))
-    logging.info(f"Deleted {query.count()} old mesh terms in Predication-table")
-    query.delete(synchronize_session=False)
-    session.commit()
+    if not confirm_and_delete_mesh_concepts(session, old_mesh_terms, force_deletion):
+        return
     logging.info(f"Finished after {datetime.now() - start}s")
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("-f", "--force", action="store_true", help="Force deletion of old mesh DB entries")
+    parser.add_argument("-w", "--workers", default=1, type=int,
+                        help="Number of worker processes to parse the MeSH files")
+    parser.add_argument("--diff", help="MeSH release diff (JSON, see narrant.mesh.diff): only delete the MeSH "
+                                       "concepts that were deleted in the new release")
     args = parser.parse_args()
-    clean_old_mesh_concepts(args.force)
+    if args.diff:
+        clean_mesh_concepts_from_diff(MeSHReleaseDiff.load(args.diff), args.force)
+    else:
+        clean_old_mesh_concepts(args.force, workers=args.workers)
 
 
 if __name__ == "__main__":
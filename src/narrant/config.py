@@ -31,6 +31,7 @@ if not os.path.isdir(TMP_DIR_TAGGER):
 # MESH
 MESH_DESCRIPTORS_FILE = os.path.join(DATA_DIR, "desc.xml")
 MESH_SUPPLEMENTARY_FILE = os.path.join(DATA_DIR, "supp.xml")
+MESH_CACHE_DIR = os.path.join(TMP_DIR, "mesh_cache")
 
 # DrugBank
 DRUGBANK_XML_DUMP = os.path.join(DATA_DIR, "drugbank2021.xml")
@@ -66,6 +67,12 @@ EXCIPIENT_TAGGER_DATABASE_FILE = os.path.join(RESOURCE_DIR, 'vocabularies/excipi
 EXCIPIENT_CURATED_LIST_FILE = os.path.join(RESOURCE_DIR, "vocabularies/excipient/excipients_curated2021.txt")
 EXCIPIENT_TAGGER_DRUGBANK_EXCIPIENT_FILE = os.path.join(RESOURCE_DIR, 'vocabularies/excipient/chembl_excipients.txt')
 
+# Directory of (interrupted) ChEMBL API harvests
+CHEMBL_HARVEST_DIR = os.path.join(TMP_DIR, "chembl_harvest")
+
+# Cache of intermediate vocabularies (e.g. the ChEMBL drug vocabulary)
+VOCABULARY_CACHE_DIR = os.path.join(TMP_DIR, "vocabulary_cache")
+
 # Disease Tagger
 DISEASE_TAGGER_VOCAB_DIRECTORY = os.path.join(RESOURCE_DIR, 'vocabularies/disease')
 
@@ -115,5 +122,11 @@ PHARM_RELATION_VOCABULARY = os.path.join(RESOURCE_DIR, "pharm_relation_vocab.jso
 # Constraint file
 PHARM_RELATION_CONSTRAINTS = os.path.join(RESOURCE_DIR, "pharm_relation_type_constraints.json")
 
+# Classification Feature Store (token count vectors per document)
+FEATURE_STORE_DIR = os.path.join(DATA_DIR, "feature_store")
+
+# Local binary snapshots of the entity resolver data (see narrant.entity.snapshot)
+RESOLVER_SNAPSHOT_DIR = os.path.join(TMP_DIR, "resolver_snapshots")
+
 # CHEMBL ATC Classification
 CHEMBL_ATC_CLASSIFICATION_FILE = os.path.join(RESOURCE_DIR, "chembl_atc_classification.csv")
@@ -0,0 +1,94 @@
+import logging
+import random
+import time
+from argparse import ArgumentParser
+
+from narrant.entity.meshontology import MeSHOntology
+
+
+def linear_scan_start_with_tree_no(ontology: MeSHOntology, tree_no: str) -> [(str, str)]:
+    """
+    Reference implementation: scans all tree numbers for each query
+    """
+    results = []
+    visited = set()
+    for d_tree_no, (d_id, d_heading) in ontology.treeno2desc.items():
+        if d_id not in visited:
+            if d_tree_no.startswith(tree_no):
+                results.append((d_id, d_heading))
+                visited.add(d_id)
+    return results
+
+
+def build_synthetic_ontology(no_descriptors: int, fan_out: int = 8, seed: int = 42) -> MeSHOntology:
+    """
+    Builds an ontology with a MeSH-like tree structure (without database access)
+    :param no_descriptors: number of descriptors
+    :param fan_out: maximum number of children for each node
+    :param seed: random seed
+    :return: a MeSHOntology instance
+    """
+    rnd = random.Random(seed)
+    ontology = MeSHOntology.__new__(MeSHOntology)
+    ontology._clear_index()
+    tree_numbers = [c + f'{i:02d}' for c in "ABCDEFGZ" for i in range(1, 10)]
+    known = set(tree_numbers)
+    while len(tree_numbers) < no_descriptors:
+        parent = rnd.choice(tree_numbers)
+        for _ in range(rnd.randint(1, fan_out)):
+            child = f'{parent}.{rnd.randint(100, 999)}'
+            if child not in known:
+                tree_numbers.append(child)
+                known.add(child)
+    for idx, tn in enumerate(tree_numbers):
+        descriptor_id = f'D{idx:06d}'
+        ontology._add_descriptor_for_tree_no(descriptor_id, f'Heading {idx}', tn)
+        ontology._add_tree_number_for_descriptor(descriptor_id, tn)
+    return ontology
+
+
+def benchmark(ontology: MeSHOntology, no_queries: int, seed: int = 42):
+    rnd = random.Random(seed)
+    queries = rnd.sample(sorted(ontology.treeno2desc.keys()), k=min(no_queries, len(ontology.treeno2desc)))
+    logging.info(f'Benchmarking {len(queries)} subtree queries on {len(ontology.treeno2desc)} tree numbers...')
+
+    start = time.perf_counter()
+    linear_results = [set(linear_scan_start_with_tree_no(ontology, q)) for q in queries]
+    linear_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # includes the one-time sort of the tree numbers
+    ontology._sorted_tree_numbers = None
+    bisect_results = [set(ontology.find_descriptors_start_with_tree_no(q)) for q in queries]
+    bisect_time = time.perf_counter() - start
+
+    if linear_results != bisect_results:
+        raise ValueError('Results of linear scan and prefix index differ')
+
+    logging.info(f'linear scan : {linear_time:.4f}s ({1000 * linear_time / len(queries):.4f}ms per query)')
+    logging.info(f'prefix index: {bisect_time:.4f}s ({1000 * bisect_time / len(queries):.4f}ms per query)')
+    logging.info(f'speedup     : {linear_time / bisect_time:.1f}x')
+
+
+def main():
+    parser = ArgumentParser(description="Benchmarks the MeSHOntology subtree queries")
+    parser.add_argument("--db", action="store_true", help="Use the ontology stored in the database")
+    parser.add_argument("-n", "--descriptors", type=int, default=60000,
+                        help="Number of tree numbers of the synthetic ontology (default: 60000)")
+    parser.add_argument("-q", "--queries", type=int, default=1000, help="Number of queries (default: 1000)")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        level=logging.INFO)
+
+    if args.db:
+        ontology = MeSHOntology()
+    else:
+        logging.info(f'Building synthetic ontology with {args.descriptors} tree numbers...')
+        ontology = build_synthetic_ontology(args.descriptors)
+    benchmark(ontology, args.queries)
+
+
+if __name__ == "__main__":
+    main()
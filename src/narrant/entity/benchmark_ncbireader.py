@@ -0,0 +1,115 @@
+import gzip
+import logging
+import os
+import random
+import time
+from argparse import ArgumentParser
+from itertools import islice
+
+from narrant.config import GENE_FILE, TMP_DIR
+from narrant.entity.ncbireader import build_gene_indexes, HUMAN_SPECIES_ID
+
+
+class GeneIndexHolder:
+
+    def __init__(self):
+        self.geneid2name = {}
+        self.human_gene_dict = {}
+        self.gene_to_human_id_dict = {}
+
+
+def sequential_build_gene_indexes(gene_file: str) -> GeneIndexHolder:
+    """
+    Reference implementation: reads the file line by line in one process (once for the GeneResolver and
+    twice for the GeneMapper)
+    """
+    holder = GeneIndexHolder()
+    with gzip.open(gene_file, 'rt') as f:
+        for line in islice(f, 1, None):
+            components = line.strip().split('\t')
+            holder.geneid2name[int(components[1])] = (components[2], components[8])
+    with gzip.open(gene_file, 'rt') as f:
+        for line in islice(f, 1, None):
+            components = line.strip().split('\t')
+            if components[0] == HUMAN_SPECIES_ID and components[2] not in holder.human_gene_dict:
+                holder.human_gene_dict[components[2]] = int(components[1])
+    with gzip.open(gene_file, 'rt') as f:
+        for line in islice(f, 1, None):
+            components = line.strip().split('\t')
+            if components[0] != HUMAN_SPECIES_ID and components[2] in holder.human_gene_dict:
+                holder.gene_to_human_id_dict[int(components[1])] = holder.human_gene_dict[components[2]]
+    return holder
+
+
+def write_synthetic_gene_file(gene_file: str, no_genes: int, human_ratio: float = 0.01, mapped_ratio: float = 0.1,
+                              seed: int = 42):
+    """
+    Writes a gene_info-like file: few human genes and many non-human genes of which some share a human symbol
+    :param gene_file: path of the gzip file
+    :param no_genes: number of genes
+    :param human_ratio: ratio of human genes
+    :param mapped_ratio: ratio of non-human genes with a human symbol
+    :param seed: random seed
+    :return: None
+    """
+    rnd = random.Random(seed)
+    no_human = max(1, int(no_genes * human_ratio))
+    with gzip.open(gene_file, 'wt') as f:
+        f.write("#tax_id\tGeneID\tSymbol\tLocusTag\tSynonyms\tdbXrefs\tchromosome\tmap_location\tdescription\n")
+        for gene_id in range(1, no_genes + 1):
+            if gene_id <= no_human:
+                tax_id, symbol = HUMAN_SPECIES_ID, f'HG{gene_id}'
+            else:
+                tax_id = str(rnd.randint(10000, 2000000))
+                if rnd.random() < mapped_ratio:
+                    symbol = f'HG{rnd.randint(1, no_human)}'
+                else:
+                    symbol = f'LOC{gene_id}'
+            f.write(f'{tax_id}\t{gene_id}\t{symbol}\t-\t-\t-\t-\t-\tdescription of gene {gene_id}\n')
+
+
+def benchmark(gene_file: str, workers: [int]):
+    logging.info(f'Benchmarking gene index builds on {gene_file}...')
+    start = time.perf_counter()
+    reference = sequential_build_gene_indexes(gene_file)
+    reference_time = time.perf_counter() - start
+    logging.info(f'sequential reader: {reference_time:.2f}s ({len(reference.geneid2name)} genes, '
+                 f'{len(reference.gene_to_human_id_dict)} mapped)')
+
+    for no_workers in workers:
+        holder = GeneIndexHolder()
+        start = time.perf_counter()
+        build_gene_indexes(gene_file, gene_resolver=holder, gene_mapper=holder, workers=no_workers)
+        chunked_time = time.perf_counter() - start
+        if (holder.geneid2name != reference.geneid2name or holder.human_gene_dict != reference.human_gene_dict
+                or holder.gene_to_human_id_dict != reference.gene_to_human_id_dict):
+            raise ValueError('Results of the sequential and the chunked reader differ')
+        logging.info(f'chunked reader ({no_workers} workers): {chunked_time:.2f}s '
+                     f'(speedup {reference_time / chunked_time:.1f}x)')
+
+
+def main():
+    parser = ArgumentParser(description="Benchmarks the gene_info reader of the gene indexes")
+    parser.add_argument("-i", "--input", help=f"A gene_info.gz file (e.g. {GENE_FILE}) - "
+                                              f"if not given, a synthetic file is generated")
+    parser.add_argument("-n", "--genes", type=int, default=2000000,
+                        help="Number of genes of the synthetic file (default: 2000000)")
+    parser.add_argument("-w", "--workers", type=int, nargs='+', default=[1, 4, 8],
+                        help="Numbers of worker processes (default: 1 4 8)")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        level=logging.INFO)
+
+    gene_file = args.input
+    if not gene_file:
+        os.makedirs(TMP_DIR, exist_ok=True)
+        gene_file = os.path.join(TMP_DIR, "gene_info_benchmark.gz")
+        logging.info(f'Writing synthetic gene file with {args.genes} genes to {gene_file}...')
+        write_synthetic_gene_file(gene_file, args.genes)
+    benchmark(gene_file, args.workers)
+
+
+if __name__ == "__main__":
+    main()
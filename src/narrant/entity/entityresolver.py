@@ -1,23 +1,26 @@
 from __future__ import annotations
 
 import csv
-import gzip
-import json
 import logging
+import time
 from collections import defaultdict
 from datetime import datetime
 from itertools import islice
 
 from kgextractiontoolbox.backend.database import Session
-from kgextractiontoolbox.backend.models import Tag, EntityResolverData
+from kgextractiontoolbox.backend.models import Tag
 from kgextractiontoolbox.entitylinking.tagging.vocabulary import Vocabulary
 from narrant.config import GENE_FILE, MESH_DESCRIPTORS_FILE, TAXONOMY_FILE, \
     MESH_SUPPLEMENTARY_FILE, \
     DOSAGEFORM_TAGGER_VOCAB, VACCINE_TAGGER_VOCAB, \
-    DRUG_TAGGER_VOCAB, ORGANISM_TAGGER_VOCAB, REGISTERED_VOCABULARIES
+    DRUG_TAGGER_VOCAB, ORGANISM_TAGGER_VOCAB, REGISTERED_VOCABULARIES, RESOLVER_SNAPSHOT_DIR
+from narrant.entity.genemaps import load_int_keyed_map, IntKeyedStringMap
+from narrant.entity.ncbireader import build_gene_indexes, read_species_names
+from narrant.entity.resolvertable import LRUCache, has_resolver_entries, lookup_resolver_entries, \
+    update_resolver_entries
+from narrant.entity.snapshot import store_resolver_data, load_resolver_data, get_resolver_data_version
 from narrant.entitylinking.enttypes import GENE, SPECIES, DOSAGE_FORM, LAB_METHOD, VACCINE
-from narrant.mesh.data import MeSHDB
-from narrant.mesh.supplementary import MeSHDBSupplementary
+from narrant.mesh.cache import load_descriptors, load_supplementary_records
 
 
 def get_gene_ids(session):
@@ -57,37 +60,70 @@ class MeshResolver:
         self.desc2heading = {}
         self.supplement_desc2heading = {}
 
-    def build_index(self, mesh_file=MESH_DESCRIPTORS_FILE, mesh_supp_file=MESH_SUPPLEMENTARY_FILE):
+    def build_index(self, mesh_file=MESH_DESCRIPTORS_FILE, mesh_supp_file=MESH_SUPPLEMENTARY_FILE, workers=1):
+        """
+        Builds the descriptor and supplementary heading indexes
+        :param mesh_file: path to the MeSH descriptor file
+        :param mesh_supp_file: path to the MeSH supplementary file
+        :param workers: number of worker processes to parse the MeSH files (if they are not cached yet)
+        :return: None
+        """
         logging.info('Reading mesh file: {}'.format(mesh_file))
-        meshdb = MeSHDB()
-        meshdb.load_xml(mesh_file)
-        for desc in meshdb.get_all_descs():
+        for desc in load_descriptors(mesh_file, workers=workers):
             self.desc2heading[desc.unique_id] = desc.heading
 
         session = Session.get()
-        json_data = json.dumps(self.desc2heading)
-        logging.info(f'Writing MeSH index ({len(json_data)} keys) to DB (entity_resolver_data table)')
-        EntityResolverData.overwrite_resolver_data(session, name=MeshResolver.MESH_NAME, json_data=json_data)
+        store_resolver_data(session, MeshResolver.MESH_NAME, self.desc2heading, keyed=True)
 
         logging.info('Reading mesh supplementary file: {}'.format(mesh_supp_file))
-        mesh_supplementary: MeSHDBSupplementary = MeSHDBSupplementary()
-        mesh_supplementary.load_xml(mesh_supp_file)
-        for record in mesh_supplementary.get_all_records():
+        for record in load_supplementary_records(mesh_supp_file, workers=workers):
             self.supplement_desc2heading[record.unique_id] = record.name
 
-        json_data = json.dumps(self.supplement_desc2heading)
-        logging.info(f'Writing MeSH Supplement index ({len(json_data)} keys) to DB (entity_resolver_data table)')
-        EntityResolverData.overwrite_resolver_data(session, name=MeshResolver.MESH_SUPPLEMENT_NAME, json_data=json_data)
+        store_resolver_data(session, MeshResolver.MESH_SUPPLEMENT_NAME, self.supplement_desc2heading, keyed=True)
 
-    def load_index(self):
-        start_time = datetime.now()
+    def update_index(self, mesh_diff, snapshot_dir=RESOLVER_SNAPSHOT_DIR):
+        """
+        Updates the stored indexes with the added, deleted and renamed records of a MeSH release diff
+        The MeSH files are not read. The JSON blobs are rewritten (with a new version), but only the affected
+        entries of the keyed resolver table are changed
+        :param mesh_diff: a MeSHReleaseDiff
+        :param snapshot_dir: directory of the resolver snapshots used to load the current indexes
+        :return: None
+        """
+        logging.info(f'Updating MeSH resolver indexes ({mesh_diff.summary()})...')
+        self.load_index(snapshot_dir=snapshot_dir)
+        # the loaded indexes may be read-only snapshots
+        self.desc2heading = dict(self.desc2heading)
+        self.supplement_desc2heading = dict(self.supplement_desc2heading)
         session = Session.get()
-        self.desc2heading = EntityResolverData.load_data_from_json(session, MeshResolver.MESH_NAME)
+        # descriptor ids start with a D, supplementary record ids with a C
+        for name, index, is_descriptor in [(MeshResolver.MESH_NAME, self.desc2heading, True),
+                                           (MeshResolver.MESH_SUPPLEMENT_NAME, self.supplement_desc2heading, False)]:
+            deletes = [r_id for r_id in mesh_diff.deleted if r_id.startswith('D') == is_descriptor]
+            upserts = {r_id: r_name for r_id, r_name in mesh_diff.added.items()
+                       if r_id.startswith('D') == is_descriptor}
+            upserts.update({r_id: new_name for r_id, (_, new_name) in mesh_diff.renamed.items()
+                            if r_id.startswith('D') == is_descriptor})
+            if not deletes and not upserts:
+                continue
+            for record_id in deletes:
+                index.pop(record_id, None)
+            index.update(upserts)
+            if has_resolver_entries(session, name):
+                store_resolver_data(session, name, index)
+                update_resolver_entries(session, name, upserts, deletes)
+            else:
+                # the keyed entries are missing (e.g. stored by an older version)
+                store_resolver_data(session, name, index, keyed=True)
+
+    def load_index(self, snapshot_dir=RESOLVER_SNAPSHOT_DIR):
+        start_time = datetime.now()
+        self.desc2heading = load_resolver_data(MeshResolver.MESH_NAME, snapshot_dir=snapshot_dir)
         logging.info('Mesh index ({} keys) load in {}s'.format(len(self.desc2heading), datetime.now() - start_time))
         start_time = datetime.now()
 
-        self.supplement_desc2heading = EntityResolverData.load_data_from_json(session,
-                                                                              MeshResolver.MESH_SUPPLEMENT_NAME)
+        self.supplement_desc2heading = load_resolver_data(MeshResolver.MESH_SUPPLEMENT_NAME,
+                                                          snapshot_dir=snapshot_dir)
         logging.info('Mesh Supplement index ({} keys) load in {}s'.format(len(self.supplement_desc2heading),
                                                                           datetime.now() - start_time))
 
@@ -122,30 +158,20 @@ class GeneResolver:
             term2entity[gene_name.strip().lower()] = gene_focus.strip().lower()
         return term2entity
 
-    def build_index(self, gene_input=GENE_FILE, query_db_gene_ids=True):
-        gene_ids_in_db = set()
+    def build_index(self, gene_input=GENE_FILE, query_db_gene_ids=True, workers=1):
+        gene_ids_in_db = None
         if query_db_gene_ids:
             gene_ids_in_db = get_gene_ids(Session.get())
-        logging.info('Reading gene input file: {}'.format(gene_input))
-        with gzip.open(gene_input, 'rt') as f:
-            for line in islice(f, 1, None):
-                components = line.strip().split('\t')
-                gene_id = int(components[1])
-                if query_db_gene_ids and gene_id not in gene_ids_in_db:
-                    continue
-                gene_symbol = components[2]
-                description = components[8]
-                self.geneid2name[gene_id] = (gene_symbol, description)
+        build_gene_indexes(gene_input, gene_resolver=self, gene_ids=gene_ids_in_db, workers=workers)
+        self.store_index()
 
-        logging.info('Writing index with {} keys to database'.format(len(self.geneid2name)))
+    def store_index(self):
         session = Session.get()
-        json_data = json.dumps(self.geneid2name)
-        EntityResolverData.overwrite_resolver_data(session, name=GeneResolver.NAME, json_data=json_data)
+        store_resolver_data(session, GeneResolver.NAME, self.geneid2name, keyed=True)
 
     def load_index(self):
         start_time = datetime.now()
-        session = Session.get()
-        self.geneid2name = EntityResolverData.load_data_from_json(session, GeneResolver.NAME)
+        self.geneid2name = load_int_keyed_map(IntKeyedStringMap, GeneResolver.NAME)
         logging.info('Gene index ({} keys) load in {}s'.format(len(self.geneid2name), datetime.now() - start_time))
 
     def gene_id_to_name(self, gene_id):
@@ -159,15 +185,25 @@ class GeneResolver:
         try:
             gene_id_int = int(gene_id)
             symbol, description = self.geneid2name[gene_id_int]
-            if symbol and description:
-                return '{}//{}'.format(description, symbol)
-            elif not symbol:
-                return '{}'.format(description)
-            else:
-                return '{}'.format(symbol)
+            return GeneResolver.format_gene_name(symbol, description)
         except ValueError:
             raise KeyError('Gene ids should be ints. {} is not an int'.format(gene_id))
 
+    @staticmethod
+    def format_gene_name(symbol, description):
+        """
+        Formats a gene name as Description//Symbol if both are available, else description / symbol
+        :param symbol: the gene symbol
+        :param description: the gene description
+        :return: the formatted name
+        """
+        if symbol and description:
+            return '{}//{}'.format(description, symbol)
+        elif not symbol:
+            return '{}'.format(description)
+        else:
+            return '{}'.format(symbol)
+
     def gene_locus_to_description(self, locus):
         """
         Get the description for a gene locus
@@ -210,8 +246,6 @@ class SpeciesResolver:
 
     def __init__(self):
         self.speciesid2name = defaultdict(dict)
-        trans_map = {p: '' for p in '[]()'}
-        self.__translator = str.maketrans(trans_map)
 
     def get_reverse_index(self):
         s2n = dict()
@@ -222,38 +256,27 @@ class SpeciesResolver:
                 s2n[n_dict[self.NAME_SCIENTIFIC_SHORTCUT]] = sid
         return s2n
 
-    def build_index(self, species_input=TAXONOMY_FILE, query_db_species_ids=True):
-        species_ids_in_db = set()
-        if query_db_species_ids:
-            species_ids_in_db = get_species_ids(Session.get())
-        logging.info('Reading species input file: {}'.format(species_input))
-        with gzip.open(species_input, 'rt') as f:
-            for line in islice(f, 1, None):
-                if self.NAME_COMMON in line or self.NAME_SCIENTIFIC in line:
-                    components = line.split('\t')
-                    species_id = components[0]
-                    name = components[2]
-                    # Remove brackets
-                    name = name.translate(self.__translator).strip()
-
-                    # skip species that are not in the Tag table
-                    if query_db_species_ids and int(species_id) not in species_ids_in_db:
-                        continue
-
-                    if self.NAME_COMMON in line:
-                        self.speciesid2name[species_id][self.NAME_COMMON_SHORTCUT] = name
-                    else:
-                        self.speciesid2name[species_id][self.NAME_SCIENTIFIC_SHORTCUT] = name
-
-        logging.info('Writing index to database')
+    def build_index(self, species_input=TAXONOMY_FILE, query_db_species_ids=True, workers=1, species_ids=None):
+        """
+        Builds the species index and stores it in the database
+        :param species_input: the NCBI taxonomy names file
+        :param query_db_species_ids: only species that occur in the Tag table are kept
+        :param workers: number of worker processes to parse the taxonomy file
+        :param species_ids: species ids to keep (if already known, the Tag table is not queried)
+        :return: None
+        """
+        if species_ids is None and query_db_species_ids:
+            species_ids = get_species_ids(Session.get())
+        for species_id, name_shortcut, name in read_species_names(species_input, species_ids=species_ids,
+                                                                  workers=workers):
+            self.speciesid2name[species_id][name_shortcut] = name
+
         session = Session.get()
-        json_data = json.dumps(self.speciesid2name)
-        EntityResolverData.overwrite_resolver_data(session, SpeciesResolver.NAME, json_data)
+        store_resolver_data(session, SpeciesResolver.NAME, self.speciesid2name, keyed=True)
 
     def load_index(self):
         start_time = datetime.now()
-        session = Session.get()
-        self.speciesid2name = EntityResolverData.load_data_from_json(session, SpeciesResolver.NAME)
+        self.speciesid2name = load_resolver_data(SpeciesResolver.NAME)
         logging.info('Species index ({} keys) load in {}s'.format(len(self.speciesid2name),
                                                                   datetime.now() - start_time))
 
@@ -263,14 +286,22 @@ class SpeciesResolver:
         :param species_id: NCBI Species ID
         :return: Common Species Name[//Scientific Species Name (if available)]
         """
-        sp2name = self.speciesid2name[species_id]
+        return SpeciesResolver.format_species_name(self.speciesid2name[species_id])
+
+    @staticmethod
+    def format_species_name(sp2name: dict):
+        """
+        Formats a species name as Common Species Name[//Scientific Species Name (if available)]
+        :param sp2name: dictionary with the common and scientific name (see shortcuts)
+        :return: the formatted name
+        """
         name = []
-        if self.NAME_COMMON_SHORTCUT in sp2name:
-            name.append(sp2name[self.NAME_COMMON_SHORTCUT])
-        if self.NAME_SCIENTIFIC_SHORTCUT in sp2name:
+        if SpeciesResolver.NAME_COMMON_SHORTCUT in sp2name:
+            name.append(sp2name[SpeciesResolver.NAME_COMMON_SHORTCUT])
+        if SpeciesResolver.NAME_SCIENTIFIC_SHORTCUT in sp2name:
             if name:
                 name.append('//')
-            name.append(sp2name[self.NAME_SCIENTIFIC_SHORTCUT])
+            name.append(sp2name[SpeciesResolver.NAME_SCIENTIFIC_SHORTCUT])
         return ''.join(name)
 
 
@@ -363,24 +394,84 @@ class VaccineResolver:
 class EntityResolver:
     """
     EntityResolver translates an entity id and an entity type to it's corresponding name
-    Automatically loads and initialise the resolvers for MeSH, DrugbankIDs, Gene, Species and DosageForms
+    The resolvers for MeSH, Gene, Species and the registered vocabularies are loaded on first use
     """
 
+    NAME_CACHE_SIZE = 100000
+    # minimum number of seconds between two queries of the stored resolver versions
+    VERSION_CHECK_INTERVAL = 60
+
     __instance = None
 
     def __new__(cls):
         if cls.__instance is None:
             cls.__instance = super(EntityResolver, cls).__new__(cls)
-            cls.__instance.mesh = MeshResolver()
-            cls.__instance.mesh.load_index()
-            cls.__instance.gene = GeneResolver()
-            cls.__instance.gene.load_index()
-            cls.__instance.species = SpeciesResolver()
-            cls.__instance.species.load_index()
+            cls.__instance._mesh = None
+            cls.__instance._gene = None
+            cls.__instance._species = None
             cls.__instance._entity_id_to_heading = None
-            cls.__instance._load_registered_vocabularies()
+            cls.__instance._name_cache = LRUCache(EntityResolver.NAME_CACHE_SIZE)
+            cls.__instance._keyed_resolvers = {}
+            cls.__instance._resolver_versions = None
+            cls.__instance._last_version_check = None
         return cls.__instance
 
+    def check_resolver_versions(self, force: bool = False) -> bool:
+        """
+        Compares the stored versions of the MeSH, Gene and Species resolver data with the versions of the
+        first check. If a resolver was stored again, the cached names and the loaded resolvers are dropped
+        The versions are queried at most once per VERSION_CHECK_INTERVAL seconds
+        :param force: query the versions even if the last check was within the interval
+        :return: True if the resolver data has changed since the last check
+        """
+        now = time.monotonic()
+        if not force and self._last_version_check is not None \
+                and now - self._last_version_check < EntityResolver.VERSION_CHECK_INTERVAL:
+            return False
+        self._last_version_check = now
+        session = Session.get()
+        versions = {name: get_resolver_data_version(session, name)
+                    for name in (MeshResolver.MESH_NAME, MeshResolver.MESH_SUPPLEMENT_NAME, GeneResolver.NAME,
+                                 SpeciesResolver.NAME)}
+        changed = self._resolver_versions is not None and versions != self._resolver_versions
+        if changed:
+            logging.info('Resolver data has been changed - clearing cached names')
+            self._name_cache.clear()
+            self._keyed_resolvers.clear()
+            self._mesh = None
+            self._gene = None
+            self._species = None
+        self._resolver_versions = versions
+        return changed
+
+    @property
+    def resolver_versions(self) -> dict:
+        """
+        :return: the resolver data versions of the last check (None if the versions were not checked yet)
+        """
+        return self._resolver_versions
+
+    @property
+    def mesh(self) -> MeshResolver:
+        if self._mesh is None:
+            self._mesh = MeshResolver()
+            self._mesh.load_index()
+        return self._mesh
+
+    @property
+    def gene(self) -> GeneResolver:
+        if self._gene is None:
+            self._gene = GeneResolver()
+            self._gene.load_index()
+        return self._gene
+
+    @property
+    def species(self) -> SpeciesResolver:
+        if self._species is None:
+            self._species = SpeciesResolver()
+            self._species.load_index()
+        return self._species
+
     def _load_registered_vocabularies(self, registered_vocabs=REGISTERED_VOCABULARIES):
         self._entity_id_to_heading = dict()
         for vocab_file in registered_vocabs:
@@ -416,6 +507,8 @@ class EntityResolver:
             key = ('CHEMBL', entity_id)
         else:
             key = (entity_type, entity_id)
+        if self._entity_id_to_heading is None:
+            self._load_registered_vocabularies()
         try:
             return self._entity_id_to_heading[key].capitalize()
         except KeyError:
@@ -424,6 +517,123 @@ class EntityResolver:
         # if entity one of [EXCIPIENT, PLANT_FAMILY_GENUS] the name is equal to the entity_id
         return entity_id.capitalize()
 
+    def _lookup_keyed(self, name: str, keys) -> dict:
+        """
+        Looks up keys in the keyed resolver table
+        :param name: name of the resolver data
+        :param keys: the keys to look up
+        :return: a dictionary key -> value or None if the resolver has no keyed entries
+        """
+        session = Session.get()
+        if name not in self._keyed_resolvers:
+            self._keyed_resolvers[name] = has_resolver_entries(session, name)
+            if not self._keyed_resolvers[name]:
+                logging.info(f'No keyed entries for {name} - using the in-memory index')
+        if not self._keyed_resolvers[name]:
+            return None
+        return lookup_resolver_entries(session, name, keys)
+
+    def _resolve_mesh_names(self, entity_ids) -> dict:
+        descriptors = {e_id.replace('MESH:', ''): e_id for e_id in entity_ids}
+        headings = self._lookup_keyed(MeshResolver.MESH_NAME, descriptors.keys())
+        if headings is None:
+            names = {}
+            for e_id in entity_ids:
+                try:
+                    names[e_id] = self.mesh.descriptor_to_heading(e_id)
+                except KeyError:
+                    continue
+            return names
+        missing = [d for d in descriptors if d not in headings]
+        if missing:
+            headings.update(self._lookup_keyed(MeshResolver.MESH_SUPPLEMENT_NAME, missing) or {})
+        return {descriptors[d]: heading for d, heading in headings.items()}
+
+    def _resolve_gene_names(self, entity_ids) -> dict:
+        gene_ids = {}
+        for e_id in entity_ids:
+            try:
+                gene_ids[str(int(e_id))] = e_id
+            except ValueError:
+                continue
+        genes = self._lookup_keyed(GeneResolver.NAME, gene_ids.keys())
+        if genes is None:
+            names = {}
+            for e_id in gene_ids.values():
+                try:
+                    names[e_id] = self.gene.gene_id_to_name(e_id)
+                except KeyError:
+                    continue
+            return names
+        return {gene_ids[g_id]: GeneResolver.format_gene_name(symbol, description)
+                for g_id, (symbol, description) in genes.items()}
+
+    def _resolve_species_names(self, entity_ids) -> dict:
+        species = self._lookup_keyed(SpeciesResolver.NAME, entity_ids)
+        if species is None:
+            names = {}
+            for e_id in entity_ids:
+                try:
+                    names[e_id] = self.species.species_id_to_name(e_id)
+                except KeyError:
+                    continue
+            return names
+        return {s_id: SpeciesResolver.format_species_name(sp2name) for s_id, sp2name in species.items()}
+
+    def get_names_for_ids(self, entities, resolve_gene_by_id=True, check_versions=True) -> dict:
+        """
+        Translates a batch of (entity id, entity type) pairs to their names
+        MeSH, gene and species names are looked up in the keyed resolver table (one query per resolver)
+        and kept in a LRU cache. If no keyed entries are stored, the in-memory resolvers are used.
+        The cache is cleared if the resolver data was stored again (see check_resolver_versions).
+        :param entities: an iterable of (entity id, entity type) pairs
+        :param resolve_gene_by_id: if False, gene ids are resolved as gene locus
+        :param check_versions: check the resolver versions first (the caller may have just checked them)
+        :return: a dictionary (entity id, entity type) -> name (unknown entities are not contained)
+        """
+        if check_versions:
+            self.check_resolver_versions()
+        result = {}
+        to_resolve = {"mesh": set(), "gene": set(), "species": set()}
+        for entity_id, entity_type in set(entities):
+            key = (entity_id, entity_type)
+            if entity_id.startswith('FIDXLM1') and entity_type == LAB_METHOD:
+                result[key] = "Assay"
+            elif entity_id.startswith('MESH:'):
+                to_resolve["mesh"].add(key)
+            elif entity_type == GENE and resolve_gene_by_id:
+                to_resolve["gene"].add(key)
+            elif entity_type == SPECIES:
+                to_resolve["species"].add(key)
+            else:
+                try:
+                    result[key] = self.get_name_for_var_ent_id(entity_id, entity_type,
+                                                               resolve_gene_by_id=resolve_gene_by_id)
+                except KeyError:
+                    continue
+
+        resolve_functions = {"mesh": self._resolve_mesh_names, "gene": self._resolve_gene_names,
+                             "species": self._resolve_species_names}
+        for kind, keys in to_resolve.items():
+            missing = set()
+            for key in keys:
+                if key in self._name_cache:
+                    name = self._name_cache.get(key)
+                    # unknown entities are cached as None
+                    if name is not None:
+                        result[key] = name
+                else:
+                    missing.add(key)
+            if not missing:
+                continue
+            names = resolve_functions[kind]({e_id for e_id, _ in missing})
+            for key in missing:
+                name = names.get(key[0])
+                self._name_cache.put(key, name)
+                if name is not None:
+                    result[key] = name
+        return result
+
 
 def main():
     """
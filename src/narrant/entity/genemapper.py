@@ -1,11 +1,10 @@
-import gzip
-import json
 import logging
-from itertools import islice
 
 from kgextractiontoolbox.backend.database import Session
-from kgextractiontoolbox.backend.models import EntityResolverData
 from narrant.config import GENE_FILE
+from narrant.entity.genemaps import load_int_keyed_map, IntKeyedIntMap
+from narrant.entity.ncbireader import build_gene_indexes
+from narrant.entity.snapshot import store_resolver_data, load_resolver_data
 
 
 class GeneMapper:
@@ -29,43 +28,26 @@ class GeneMapper:
         self.gene_to_human_id_dict = {}
         self.load_index()
 
-    def _build_human_gene_name_dict(self, gene_file=GENE_FILE):
-        """
-        used in build_gene_id_dict() for mapping gene names to human gene ids
-        :param gene_file:
-        """
-        self.human_gene_dict.clear()
-        with gzip.open(gene_file, 'rt') as f:
-            for line in islice(f, 1, None):
-                components = line.strip().split('\t')
-                gene_id = int(components[1])
-                gene_name = components[2]
-                if components[0] == self.HUMAN_SPECIES_ID and gene_name not in self.human_gene_dict:
-                    self.human_gene_dict[gene_name] = gene_id
-
-    def build_gene_mapper_index(self, gene_file=GENE_FILE):
+    def build_gene_mapper_index(self, gene_file=GENE_FILE, workers=1):
         """
         builds dictionary to map all gene ids to human gene ids, if possible
-        :param gene_file:
-        :param index_file:
+        :param gene_file: the NCBI gene_info file
+        :param workers: number of worker processes to parse the gene file
         :return:
         """
         logging.info('Computing index...')
-        self.gene_to_human_id_dict.clear()
-        self._build_human_gene_name_dict()
-        with gzip.open(gene_file, 'rt') as f:
-            for line in islice(f, 1, None):
-                components = line.strip().split('\t')
-                species_id, gene_id, gene_name = components[0:3]
-                gene_id = int(gene_id)
-                if species_id != self.HUMAN_SPECIES_ID and gene_name in self.human_gene_dict:
-                    self.gene_to_human_id_dict[gene_id] = self.human_gene_dict[gene_name]
+        build_gene_indexes(gene_file, gene_mapper=self, workers=workers)
+        self.store_index()
 
+    def store_index(self):
+        """
+        stores the index in the database
+        :return:
+        """
         logging.info('Writing index data to database...')
         session = Session.get()
-        json_data = json.dumps(dict(human_gene_dict=self.human_gene_dict,
-                                    gene_to_human_id_dict=self.gene_to_human_id_dict))
-        EntityResolverData.overwrite_resolver_data(session, name=GeneMapper.NAME, json_data=json_data)
+        store_resolver_data(session, GeneMapper.NAME, dict(human_gene_dict=self.human_gene_dict,
+                                                           gene_to_human_id_dict=self.gene_to_human_id_dict))
 
     def load_index(self):
         """
@@ -73,14 +55,10 @@ class GeneMapper:
         :param index_file:
         :return:
         """
-        session = Session.get()
-        data = EntityResolverData.load_data_from_json(session, name=GeneMapper.NAME)
-        if "human_gene_dict" in data and "gene_to_human_id_dict" in data:
-            self.human_gene_dict = data["human_gene_dict"]
-            self.gene_to_human_id_dict = data["gene_to_human_id_dict"]
-        else:
-            self.human_gene_dict = {}
-            self.gene_to_human_id_dict = {}
+        data = load_resolver_data(GeneMapper.NAME, fields=["human_gene_dict"])
+        self.human_gene_dict = data.get("human_gene_dict", {})
+        # gene ids are stored in a compact integer-keyed map
+        self.gene_to_human_id_dict = load_int_keyed_map(IntKeyedIntMap, GeneMapper.NAME, "gene_to_human_id_dict")
         logging.info('Index for gene mapper load from database ({} keys)'.format(len(self.gene_to_human_id_dict)))
 
     def map_to_human_gene(self, gene_id):
@@ -0,0 +1,216 @@
+"""
+Compact integer-keyed maps for the gene indexes
+
+Keys are stored in a sorted int64 array and looked up by binary search. Values are either stored
+in a parallel int64 array or as offsets into a utf-8 string pool. The arrays are persisted as .npy
+files and memory-mapped when loaded. Lookups accept ints and int-like strings, so that gene ids
+behave the same before and after a JSON round trip.
+"""
+import logging
+import os
+import shutil
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from datetime import datetime
+
+import numpy as np
+
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import EntityResolverData
+from narrant.config import RESOLVER_SNAPSHOT_DIR
+from narrant.entity.snapshot import get_resolver_data_version, get_snapshot_path
+
+VERSION_FILE = "version.txt"
+
+
+def _to_int_key(key) -> int:
+    try:
+        return int(key)
+    except (TypeError, ValueError):
+        raise KeyError(key)
+
+
+class IntKeyedMap(Mapping, ABC):
+    """
+    Base class: a read-only mapping from int64 keys to values stored in numpy arrays
+    """
+    ARRAYS = ["keys"]
+
+    def __init__(self, arrays: dict, version: str = None):
+        self._arrays = arrays
+        self.keys_array = arrays["keys"]
+        self.version = version
+
+    @abstractmethod
+    def _value_at(self, idx: int):
+        """
+        :param idx: position of a key in the sorted keys array
+        :return: the value of the key
+        """
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def from_dict(data: dict):
+        """
+        Builds a map from a dictionary (keys are converted to ints)
+        :param data: a dictionary
+        :return: a map of the concrete class
+        """
+        pass
+
+    def _find(self, key) -> int:
+        key = _to_int_key(key)
+        idx = int(np.searchsorted(self.keys_array, key))
+        if idx < len(self.keys_array) and self.keys_array[idx] == key:
+            return idx
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        return self._value_at(self._find(key))
+
+    def __contains__(self, key):
+        try:
+            self._find(key)
+            return True
+        except KeyError:
+            return False
+
+    def __len__(self):
+        return len(self.keys_array)
+
+    def __iter__(self):
+        for key in self.keys_array:
+            yield int(key)
+
+    def items(self):
+        for idx, key in enumerate(self.keys_array):
+            yield int(key), self._value_at(idx)
+
+    def values(self):
+        for idx in range(len(self.keys_array)):
+            yield self._value_at(idx)
+
+    @staticmethod
+    def _sorted_items(data: dict) -> list:
+        return sorted((int(k), v) for k, v in data.items())
+
+    def save(self, path: str, version: str):
+        """
+        Saves the arrays as .npy files into a directory
+        The directory is written to a temporary location first and moved afterwards
+        :param path: the target directory
+        :param version: the version of the data
+        :return: None
+        """
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        os.makedirs(tmp_path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(tmp_path, f'{name}.npy'), np.asarray(self._arrays[name]))
+        with open(os.path.join(tmp_path, VERSION_FILE), 'wt') as f:
+            f.write(version)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+        self.version = version
+
+    @classmethod
+    def open(cls, path: str):
+        """
+        Opens a saved map (arrays are memory-mapped)
+        :param path: the directory of the map
+        :return: the map or None if the directory does not contain a complete map
+        """
+        version_file = os.path.join(path, VERSION_FILE)
+        if not os.path.isfile(version_file):
+            return None
+        with open(version_file, 'rt') as f:
+            version = f.read().strip()
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in cls.ARRAYS}
+        return cls(arrays, version=version)
+
+
+class IntKeyedIntMap(IntKeyedMap):
+    """
+    Maps int64 keys to int64 values (e.g. gene id -> human gene id)
+    """
+    ARRAYS = ["keys", "values"]
+
+    def __init__(self, arrays: dict, version: str = None):
+        super().__init__(arrays, version=version)
+        self.values_array = arrays["values"]
+
+    def _value_at(self, idx: int):
+        return int(self.values_array[idx])
+
+    @staticmethod
+    def from_dict(data: dict):
+        items = IntKeyedMap._sorted_items(data)
+        keys = np.fromiter((k for k, _ in items), dtype=np.int64, count=len(items))
+        values = np.fromiter((int(v) for _, v in items), dtype=np.int64, count=len(items))
+        return IntKeyedIntMap(dict(keys=keys, values=values))
+
+
+class IntKeyedStringMap(IntKeyedMap):
+    """
+    Maps int64 keys to tuples of strings (e.g. gene id -> (symbol, description))
+    The strings of key i are stored in the pool at offsets[i * columns + j] to offsets[i * columns + j + 1]
+    """
+    ARRAYS = ["keys", "offsets", "pool"]
+
+    def __init__(self, arrays: dict, version: str = None):
+        super().__init__(arrays, version=version)
+        self.offsets = arrays["offsets"]
+        self.pool = arrays["pool"]
+        self.columns = (len(self.offsets) - 1) // len(self.keys_array) if len(self.keys_array) else 0
+
+    def _value_at(self, idx: int):
+        values = []
+        for col in range(idx * self.columns, (idx + 1) * self.columns):
+            values.append(self.pool[self.offsets[col]:self.offsets[col + 1]].tobytes().decode('utf-8'))
+        return tuple(values)
+
+    @staticmethod
+    def from_dict(data: dict):
+        items = IntKeyedMap._sorted_items(data)
+        keys = np.fromiter((k for k, _ in items), dtype=np.int64, count=len(items))
+        encoded = [str(s).encode('utf-8') for _, value in items for s in value]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        pool = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return IntKeyedStringMap(dict(keys=keys, offsets=offsets, pool=pool))
+
+
+def load_int_keyed_map(map_class, name: str, field: str = None, snapshot_dir: str = RESOLVER_SNAPSHOT_DIR):
+    """
+    Loads an integer-keyed map of resolver data
+    The saved map is used if its version matches the version of the resolver data in the database.
+    Otherwise, the JSON blob is loaded, converted and saved (if the resolver data has a version)
+    :param map_class: IntKeyedIntMap or IntKeyedStringMap
+    :param name: name of the resolver data
+    :param field: if the blob is a dictionary of dictionaries, the field to load
+    :param snapshot_dir: directory of the saved maps
+    :return: a map of the given class
+    """
+    start_time = datetime.now()
+    session = Session.get()
+    version = get_resolver_data_version(session, name)
+    path = get_snapshot_path(name, field, snapshot_dir=snapshot_dir) + '.intmap'
+    if version:
+        int_map = map_class.open(path)
+        if int_map is not None and int_map.version == version:
+            logging.info(f'{name} integer map opened in {datetime.now() - start_time}s')
+            return int_map
+
+    data = EntityResolverData.load_data_from_json(session, name)
+    if field:
+        data = data.get(field, {})
+    int_map = map_class.from_dict(data)
+    logging.info(f'{name} integer map ({len(int_map)} keys) built in {datetime.now() - start_time}s')
+    if version:
+        try:
+            int_map.save(path, version)
+            int_map = map_class.open(path)
+        except OSError as e:
+            logging.warning(f'Cannot save integer map {path} ({e})')
+    return int_map
@@ -0,0 +1,167 @@
+import logging
+from typing import Iterable
+
+from sqlalchemy import MetaData, Table, Column, String, Integer, Index, select, delete
+
+from kgextractiontoolbox.backend.database import Session
+from narrant.entity.meshontology import MeSHOntology
+
+MESH_PREFIX = 'MESH:'
+
+metadata = MetaData()
+
+# Transitive closure of the MeSH hierarchy
+# Each descriptor is stored with all of its ancestors (and itself with depth 0)
+# Ids are stored as they are used in Tag and Predication (e.g. MESH:D009369)
+mesh_ancestor_closure = Table(
+    "mesh_ancestor_closure", metadata,
+    Column("descriptor_id", String, primary_key=True),
+    Column("ancestor_id", String, primary_key=True),
+    Column("depth", Integer, nullable=False),
+    Index("idx_mesh_ancestor_closure_ancestor", "ancestor_id", "depth", "descriptor_id")
+)
+
+BULK_INSERT_AFTER_K = 100000
+
+
+def _to_mesh_id(descriptor_id: str) -> str:
+    if descriptor_id.startswith(MESH_PREFIX):
+        return descriptor_id
+    return f'{MESH_PREFIX}{descriptor_id}'
+
+
+def compute_ancestor_closure(ontology: MeSHOntology) -> Iterable[dict]:
+    """
+    Computes the transitive closure of the MeSH hierarchy
+    If an ancestor is reachable via several tree numbers, the smallest depth is kept
+    :param ontology: a MeSHOntology instance
+    :return: an iterator over dicts (descriptor_id, ancestor_id, depth)
+    """
+    for descriptor_id, tree_numbers in ontology.descriptor2treeno.items():
+        ancestors = {descriptor_id: 0}
+        for tn in tree_numbers:
+            depth = 0
+            while '.' in tn:
+                tn = tn.rpartition('.')[0]
+                depth += 1
+                if tn not in ontology.treeno2desc:
+                    continue
+                ancestor_id = ontology.treeno2desc[tn][0]
+                if ancestor_id not in ancestors or ancestors[ancestor_id] > depth:
+                    ancestors[ancestor_id] = depth
+        for ancestor_id, depth in ancestors.items():
+            yield dict(descriptor_id=_to_mesh_id(descriptor_id), ancestor_id=_to_mesh_id(ancestor_id), depth=depth)
+
+
+def create_and_store_closure_table(ontology: MeSHOntology = None):
+    """
+    Creates the closure table (if it does not exist) and replaces its content
+    :param ontology: a MeSHOntology instance (if None, the stored ontology index is used)
+    :return: Nothing
+    """
+    if not ontology:
+        ontology = MeSHOntology()
+    session = Session.get()
+    metadata.create_all(session.bind, tables=[mesh_ancestor_closure], checkfirst=True)
+
+    logging.info('Deleting old MeSH closure entries...')
+    session.execute(delete(mesh_ancestor_closure))
+
+    logging.info('Computing and storing MeSH closure...')
+    values, no_rows = [], 0
+    for row in compute_ancestor_closure(ontology):
+        values.append(row)
+        if len(values) >= BULK_INSERT_AFTER_K:
+            session.execute(mesh_ancestor_closure.insert(), values)
+            no_rows += len(values)
+            values.clear()
+    if values:
+        session.execute(mesh_ancestor_closure.insert(), values)
+        no_rows += len(values)
+    session.commit()
+    logging.info(f'{no_rows} closure entries stored')
+
+
+def descendants_of(descriptor_ids: Iterable[str], max_depth: int = None):
+    """
+    Builds a subquery that selects all descendants (including the descriptors themselves)
+    :param descriptor_ids: a list of MeSH descriptor ids (with or without MESH: prefix)
+    :param max_depth: maximum distance to the given descriptors (None = unlimited)
+    :return: a select statement over descriptor ids
+    """
+    ids = [_to_mesh_id(d) for d in descriptor_ids]
+    q = select(mesh_ancestor_closure.c.descriptor_id).where(mesh_ancestor_closure.c.ancestor_id.in_(ids))
+    if max_depth is not None:
+        q = q.where(mesh_ancestor_closure.c.depth <= max_depth)
+    return q
+
+
+def ancestors_of(descriptor_ids: Iterable[str], max_depth: int = None):
+    """
+    Builds a subquery that selects all ancestors (including the descriptors themselves)
+    :param descriptor_ids: a list of MeSH descriptor ids (with or without MESH: prefix)
+    :param max_depth: maximum distance to the given descriptors (None = unlimited)
+    :return: a select statement over ancestor ids
+    """
+    ids = [_to_mesh_id(d) for d in descriptor_ids]
+    q = select(mesh_ancestor_closure.c.ancestor_id).where(mesh_ancestor_closure.c.descriptor_id.in_(ids))
+    if max_depth is not None:
+        q = q.where(mesh_ancestor_closure.c.depth <= max_depth)
+    return q
+
+
+def filter_by_descendants(column, descriptor_ids: Iterable[str], max_depth: int = None):
+    """
+    Filter expression that expands the given descriptors to their whole sub-hierarchy
+    Can be used on entity id columns, e.g. Tag.ent_id, Predication.subject_id or Predication.object_id:
+        session.query(Tag.document_id).filter(filter_by_descendants(Tag.ent_id, ["D009369"]))
+    :param column: a column holding entity ids
+    :param descriptor_ids: a list of MeSH descriptor ids (with or without MESH: prefix)
+    :param max_depth: maximum distance to the given descriptors (None = unlimited)
+    :return: a filter expression
+    """
+    return column.in_(descendants_of(descriptor_ids, max_depth=max_depth))
+
+
+def query_descendants(session, descriptor_id: str, max_depth: int = None) -> [(str, int)]:
+    """
+    Retrieves all descendants of a descriptor from the closure table
+    :param session: a database session
+    :param descriptor_id: a MeSH descriptor id (with or without MESH: prefix)
+    :param max_depth: maximum distance to the descriptor (None = unlimited)
+    :return: a list of (descriptor id, depth)
+    """
+    q = select(mesh_ancestor_closure.c.descriptor_id, mesh_ancestor_closure.c.depth)
+    q = q.where(mesh_ancestor_closure.c.ancestor_id == _to_mesh_id(descriptor_id))
+    if max_depth is not None:
+        q = q.where(mesh_ancestor_closure.c.depth <= max_depth)
+    return [(r[0], r[1]) for r in session.execute(q)]
+
+
+def query_ancestors(session, descriptor_id: str, max_depth: int = None) -> [(str, int)]:
+    """
+    Retrieves all ancestors of a descriptor from the closure table
+    :param session: a database session
+    :param descriptor_id: a MeSH descriptor id (with or without MESH: prefix)
+    :param max_depth: maximum distance to the descriptor (None = unlimited)
+    :return: a list of (ancestor id, depth)
+    """
+    q = select(mesh_ancestor_closure.c.ancestor_id, mesh_ancestor_closure.c.depth)
+    q = q.where(mesh_ancestor_closure.c.descriptor_id == _to_mesh_id(descriptor_id))
+    if max_depth is not None:
+        q = q.where(mesh_ancestor_closure.c.depth <= max_depth)
+    return [(r[0], r[1]) for r in session.execute(q)]
+
+
+def main():
+    logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        level=logging.INFO)
+
+    logging.info('Computing MeSH ancestor closure table...')
+    create_and_store_closure_table()
+    logging.info('Finished')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,12 @@
-import json
 import logging
+from bisect import bisect_left
 from datetime import datetime
 
 from kgextractiontoolbox.backend.database import Session
-from kgextractiontoolbox.backend.models import EntityResolverData
-from kgextractiontoolbox.progress import print_progress_with_eta
 from narrant.config import MESH_DESCRIPTORS_FILE
+from narrant.entity.snapshot import store_resolver_data, load_resolver_data
 from narrant.entitylinking.enttypes import DOSAGE_FORM, METHOD, DISEASE, VACCINE, HEALTH_STATUS, TISSUE, LAB_METHOD
-from narrant.mesh.data import MeSHDB
+from narrant.mesh.cache import load_descriptors
 
 MESH_TREE_NAMES = dict(
     A="Anatomy",
@@ -53,6 +52,7 @@ class MeSHOntology:
     """
 
     NAME = "MeSHOntology"
+    INDEX_FIELDS = ["treeno2desc", "descriptor2treeno", "descriptor2enttypes", "descriptor2typedtreeno"]
 
     __instance = None
 
@@ -64,6 +64,9 @@ class MeSHOntology:
     def __init__(self):
         self.treeno2desc = {}
         self.descriptor2treeno = {}
+        self.descriptor2enttypes = {}
+        self.descriptor2typedtreeno = {}
+        self._sorted_tree_numbers = None
         self.load_index()
 
     def _clear_index(self):
@@ -73,6 +76,9 @@ class MeSHOntology:
         """
         self.treeno2desc = {}
         self.descriptor2treeno = {}
+        self.descriptor2enttypes = {}
+        self.descriptor2typedtreeno = {}
+        self._sorted_tree_numbers = None
 
     def _add_descriptor_for_tree_no(self, descriptor_id, descriptor_heading, tree_no: str):
         """
@@ -85,20 +91,36 @@ class MeSHOntology:
         if tree_no in self.treeno2desc:
             raise KeyError('tree number is already mapped to: {}'.format(self.treeno2desc[tree_no]))
         self.treeno2desc[tree_no] = (descriptor_id, descriptor_heading)
+        self._sorted_tree_numbers = None
+
+    def _get_sorted_tree_numbers(self) -> [str]:
+        """
+        Returns all tree numbers in lexicographical order (computed on first use)
+        All tree numbers that start with the same prefix form a consecutive range in this list
+        :return: sorted list of tree numbers
+        """
+        if self._sorted_tree_numbers is None:
+            self._sorted_tree_numbers = sorted(self.treeno2desc.keys())
+        return self._sorted_tree_numbers
 
     def find_descriptors_start_with_tree_no(self, tree_no: str) -> [(str, str)]:
         """
         Finds all descriptors which are in a tree starting with the tree number
+        The sorted tree numbers are searched via bisect, so a query costs O(log n + k)
         :param tree_no: tree number which should be the start of the descriptors
         :return: a list of descriptors (id, heading)
         """
         results = []
         visited = set()
-        for d_tree_no, (d_id, d_heading) in self.treeno2desc.items():
+        sorted_tree_numbers = self._get_sorted_tree_numbers()
+        for idx in range(bisect_left(sorted_tree_numbers, tree_no), len(sorted_tree_numbers)):
+            d_tree_no = sorted_tree_numbers[idx]
+            if not d_tree_no.startswith(tree_no):
+                break
+            d_id, d_heading = self.treeno2desc[d_tree_no]
             if d_id not in visited:
-                if d_tree_no.startswith(tree_no):
-                    results.append((d_id, d_heading))
-                    visited.add(d_id)
+                results.append((d_id, d_heading))
+                visited.add(d_id)
         return results
 
     def get_descriptor_for_tree_no(self, tree_no: str) -> (str, str):
@@ -136,16 +158,9 @@ class MeSHOntology:
         :param descriptor_id: the mesh descriptor id
         :return: list of tree numbers
         """
-        relevant_tree_numbers = []
-        for tn in self.descriptor2treeno[descriptor_id]:
-            try:
-                if MeSHOntology.tree_number_to_entity_type(tn):
-                    relevant_tree_numbers.append(tn)
-            except KeyError:
-                pass
-        if len(relevant_tree_numbers) == 0:
+        if descriptor_id not in self.descriptor2typedtreeno:
             raise KeyError(f'Descriptor {descriptor_id} has no relevant tree numbers')
-        return relevant_tree_numbers
+        return self.descriptor2typedtreeno[descriptor_id]
 
     def get_entity_types_for_descriptor(self, descriptor_id: str) -> [str]:
         """
@@ -153,19 +168,28 @@ class MeSHOntology:
         :param descriptor_id: a MeSH descriptor id
         :return: entity types
         """
-        tree_nos = self.get_tree_numbers_for_descriptor(descriptor_id)
-        ent_types = set()
-        for tn in tree_nos:
-            try:
-                for et in MeSHOntology.tree_number_to_entity_type(tn):
-                    ent_types.add(et)
-            except KeyError:
-                pass
+        if descriptor_id not in self.descriptor2enttypes:
+            raise KeyError(f'Cannot decode entity type from MeSH {descriptor_id} '
+                           f'(tree no.: {self.descriptor2treeno.get(descriptor_id)})')
+        return self.descriptor2enttypes[descriptor_id]
 
-        if len(ent_types) == 0:
-            raise KeyError(f'Cannot decode entity type from MeSH {descriptor_id} (tree no.: {tree_nos})')
+    def get_entity_types_for_descriptors(self, descriptor_ids: [str]) -> {str: [str]}:
+        """
+        Return the entity types for a batch of descriptor ids
+        Descriptors without an entity type are not contained in the result
+        :param descriptor_ids: an iterable of MeSH descriptor ids
+        :return: a dictionary mapping each descriptor id to its entity types
+        """
+        return {d_id: self.descriptor2enttypes[d_id] for d_id in descriptor_ids if d_id in self.descriptor2enttypes}
 
-        return list(ent_types)
+    @staticmethod
+    def _entity_types_for_tree_number(tree_number: str) -> [str]:
+        """
+        Computes the entity types for a given tree number
+        :param tree_number: the tree number to check
+        :return: a list of entity types (empty if no entity type was found)
+        """
+        return [et for tn, et in MESH_TREE_TO_ENTITY_TYPE if tree_number.startswith(tn)]
 
     @staticmethod
     def tree_number_to_entity_type(tree_number: str) -> [str]:
@@ -175,15 +199,32 @@ class MeSHOntology:
         :param tree_number: the tree number to check
         :return: a list of entity types
         """
-        hits = []
-        for tn, et in MESH_TREE_TO_ENTITY_TYPE:
-            if tree_number.startswith(tn):
-                hits.append(et)
+        hits = MeSHOntology._entity_types_for_tree_number(tree_number)
         if hits:
             return hits
         else:
             raise KeyError(f'No entity type for tree number {tree_number} found')
 
+    def _build_entity_type_index(self):
+        """
+        Computes the entity types and the tree numbers with entity type for every descriptor
+        Descriptors without any entity type are not stored
+        :return: Nothing
+        """
+        self.descriptor2enttypes = {}
+        self.descriptor2typedtreeno = {}
+        for descriptor_id, tree_nos in self.descriptor2treeno.items():
+            ent_types = set()
+            typed_tree_nos = []
+            for tn in tree_nos:
+                tn_types = MeSHOntology._entity_types_for_tree_number(tn)
+                if tn_types:
+                    ent_types.update(tn_types)
+                    typed_tree_nos.append(tn)
+            if ent_types:
+                self.descriptor2enttypes[descriptor_id] = sorted(ent_types)
+                self.descriptor2typedtreeno[descriptor_id] = typed_tree_nos
+
     def __build_index_from_mesh(self, mesh_file=MESH_DESCRIPTORS_FILE):
         """
         Builds the index from a raw MeSH XML file
@@ -191,19 +232,18 @@ class MeSHOntology:
         :return: Nothing
         """
         self._clear_index()
-        logging.info('Loading MeSH...')
-        mesh = MeSHDB()
-        mesh.load_xml(mesh_file)
-        descs = mesh.get_all_descs()
-        logging.info('Processing descriptors...')
+        logging.info('Processing descriptors of {}...'.format(mesh_file))
         start_time = datetime.now()
-        descriptor_count = len(descs)
-        for idx, desc in enumerate(descs):
+        descriptor_count = 0
+        for desc in load_descriptors(mesh_file):
             for tn in desc.tree_numbers:
                 self._add_descriptor_for_tree_no(desc.unique_id, desc.heading, tn)
                 self._add_tree_number_for_descriptor(desc.unique_id, tn)
-            print_progress_with_eta("building mesh ontology", idx, descriptor_count, start_time, print_every_k=1)
-        logging.info('MeSH Ontology complete')
+            descriptor_count += 1
+            if descriptor_count % 10000 == 0:
+                logging.info('{} descriptors processed ({}s)'.format(descriptor_count, datetime.now() - start_time))
+        logging.info('MeSH Ontology complete ({} descriptors in {}s)'.format(descriptor_count,
+                                                                            datetime.now() - start_time))
 
     def create_and_store_index(self):
         """
@@ -211,25 +251,35 @@ class MeSHOntology:
         :return: Nothing
         """
         self.__build_index_from_mesh(mesh_file=MESH_DESCRIPTORS_FILE)
+        logging.info('Computing entity types for descriptors...')
+        self._build_entity_type_index()
 
         logging.info('Storing index to database... ')
         session = Session.get()
-        json_data = json.dumps(dict(treeno2desc=self.treeno2desc, descriptor2treeno=self.descriptor2treeno))
-        EntityResolverData.overwrite_resolver_data(session, name=MeSHOntology.NAME, json_data=json_data)
+        store_resolver_data(session, MeSHOntology.NAME, dict(treeno2desc=self.treeno2desc,
+                                                             descriptor2treeno=self.descriptor2treeno,
+                                                             descriptor2enttypes=self.descriptor2enttypes,
+                                                             descriptor2typedtreeno=self.descriptor2typedtreeno))
 
     def load_index(self):
         """
-        Loads the whole ontology from database
+        Loads the whole ontology from database (or from its local snapshot if it is up to date)
         :return: None
         """
-        session = Session.get()
-        json_data = EntityResolverData.load_data_from_json(session, name=MeSHOntology.NAME)
+        json_data = load_resolver_data(MeSHOntology.NAME, fields=MeSHOntology.INDEX_FIELDS)
         if "treeno2desc" in json_data and "descriptor2treeno" in json_data:
             self.treeno2desc = json_data["treeno2desc"]
             self.descriptor2treeno = json_data["descriptor2treeno"]
         else:
             self.treeno2desc = {}
             self.descriptor2treeno = {}
+        if "descriptor2enttypes" in json_data and "descriptor2typedtreeno" in json_data:
+            self.descriptor2enttypes = json_data["descriptor2enttypes"]
+            self.descriptor2typedtreeno = json_data["descriptor2typedtreeno"]
+        else:
+            # index was stored by an older version
+            self._build_entity_type_index()
+        self._sorted_tree_numbers = None
 
     def retrieve_subdescriptors(self, decriptor_id: str) -> [(str)]:
         """
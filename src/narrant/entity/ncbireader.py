@@ -0,0 +1,206 @@
+"""
+Parallel parsing of the NCBI gene_info and taxonomy dumps
+
+The gzip file is decompressed by the calling process and split into line-aligned chunks.
+The chunks are parsed by a process pool and the results are consumed in file order.
+The workers filter the lines, so that only the rows which are kept in an index are sent back.
+The gene_info file is read once for both the GeneResolver and the GeneMapper index.
+"""
+import gzip
+import logging
+import multiprocessing
+from array import array
+from datetime import datetime
+
+from narrant.config import GENE_FILE, TAXONOMY_FILE
+
+CHUNK_SIZE = 8 * 1024 * 1024
+HUMAN_SPECIES_ID = '9606'
+SPECIES_NAME_COMMON = 'genbank common name'
+SPECIES_NAME_SCIENTIFIC = 'scientific name'
+SPECIES_NAME_COMMON_SHORTCUT = "c"
+SPECIES_NAME_SCIENTIFIC_SHORTCUT = "s"
+
+# filter settings of the worker processes (set by the pool initializer)
+_worker_settings = {}
+
+
+def _init_worker(settings: dict):
+    _worker_settings.clear()
+    _worker_settings.update(settings)
+
+
+def read_line_chunks(gz_file: str, chunk_size: int = CHUNK_SIZE, skip_lines: int = 1):
+    """
+    Decompresses a gzip text file and yields chunks that contain only complete lines
+    :param gz_file: path to the gzip file
+    :param chunk_size: approximate number of characters per chunk
+    :param skip_lines: number of header lines to skip
+    :return: an iterator over text chunks
+    """
+    with gzip.open(gz_file, 'rt') as f:
+        for _ in range(skip_lines):
+            f.readline()
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            if not chunk.endswith('\n'):
+                chunk += f.readline()
+            yield chunk
+
+
+def parse_chunks(gz_file: str, parse_function, settings: dict = None, workers: int = 1,
+                 chunk_size: int = CHUNK_SIZE, skip_lines: int = 1):
+    """
+    Parses a gzip text file chunk-wise (in parallel if more than one worker is used)
+    :param gz_file: path to the gzip file
+    :param parse_function: a module-level function that parses a text chunk
+    :param settings: settings which are available to the parse function in each worker
+    :param workers: number of worker processes
+    :param chunk_size: approximate number of characters per chunk
+    :param skip_lines: number of header lines to skip
+    :return: an iterator over the parse results (in file order)
+    """
+    settings = settings if settings else {}
+    chunks = read_line_chunks(gz_file, chunk_size=chunk_size, skip_lines=skip_lines)
+    if workers <= 1:
+        _init_worker(settings)
+        for chunk in chunks:
+            yield parse_function(chunk)
+    else:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(settings,)) as pool:
+            yield from pool.imap(parse_function, chunks)
+
+
+def parse_gene_info_chunk(chunk: str):
+    """
+    Parses a chunk of gene_info lines
+    Components: [0] = tax_id, [1] = gene_id, [2] = gene symbol, [8] = description
+    :param chunk: text chunk with complete lines
+    :return: (genes [(gene id, symbol, description)], human genes [(symbol, gene id)],
+              non-human genes (symbols, gene ids, symbol positions)) - the non-human genes are returned as
+              the distinct symbols of the chunk and two arrays: the gene ids and the position of their symbol
+    """
+    collect_genes = _worker_settings.get("collect_genes", False)
+    collect_human_genes = _worker_settings.get("collect_human_genes", False)
+    gene_ids = _worker_settings.get("gene_ids")
+    genes, human_genes = [], []
+    symbol_positions = {}
+    non_human_ids, non_human_positions = array('q'), array('l')
+    for line in chunk.splitlines():
+        components = line.strip().split('\t')
+        if len(components) < 9:
+            continue
+        gene_id = int(components[1])
+        gene_symbol = components[2]
+        if collect_genes and (gene_ids is None or gene_id in gene_ids):
+            genes.append((gene_id, gene_symbol, components[8]))
+        if not collect_human_genes:
+            continue
+        if components[0] == HUMAN_SPECIES_ID:
+            human_genes.append((gene_symbol, gene_id))
+        else:
+            non_human_ids.append(gene_id)
+            non_human_positions.append(symbol_positions.setdefault(gene_symbol, len(symbol_positions)))
+    return genes, human_genes, (list(symbol_positions), non_human_ids, non_human_positions)
+
+
+def build_gene_indexes(gene_file: str = GENE_FILE, gene_resolver=None, gene_mapper=None, gene_ids: set = None,
+                       workers: int = 1, chunk_size: int = CHUNK_SIZE):
+    """
+    Builds the GeneResolver and the GeneMapper index in a single pass over the gene_info file
+    Non-human genes are mapped to the first human gene with the same symbol. A non-human gene whose symbol
+    already belongs to a human gene is mapped immediately. All other non-human genes are kept compactly (gene id
+    arrays and one string per symbol) and are mapped after the file has been read
+    :param gene_file: path to the gene_info.gz file
+    :param gene_resolver: a GeneResolver whose geneid2name index should be built (or None)
+    :param gene_mapper: a GeneMapper whose human_gene_dict and gene_to_human_id_dict should be built (or None)
+    :param gene_ids: only these gene ids are kept for the GeneResolver (None = all genes)
+    :param workers: number of worker processes
+    :param chunk_size: approximate number of characters per chunk
+    :return: None
+    """
+    start_time = datetime.now()
+    logging.info(f'Reading gene input file: {gene_file} ({workers} workers)')
+    settings = dict(collect_genes=gene_resolver is not None, collect_human_genes=gene_mapper is not None,
+                    gene_ids=gene_ids)
+    human_gene_dict = {}
+    gene_to_human_id_dict = {}
+    # non-human genes whose symbol had no human gene when they were read
+    pending_symbol_ids = {}
+    pending_gene_ids, pending_symbols = array('q'), array('l')
+    for genes, human_genes, non_human_genes in parse_chunks(gene_file, parse_gene_info_chunk, settings=settings,
+                                                            workers=workers, chunk_size=chunk_size):
+        if gene_resolver is not None:
+            for gene_id, gene_symbol, description in genes:
+                gene_resolver.geneid2name[gene_id] = (gene_symbol, description)
+        for gene_symbol, gene_id in human_genes:
+            # the first human gene with a symbol is used
+            if gene_symbol not in human_gene_dict:
+                human_gene_dict[gene_symbol] = gene_id
+        symbols, non_human_ids, positions = non_human_genes
+        human_ids = [human_gene_dict.get(symbol) for symbol in symbols]
+        symbol_ids = [None] * len(symbols)
+        for gene_id, position in zip(non_human_ids, positions):
+            human_id = human_ids[position]
+            if human_id is not None:
+                gene_to_human_id_dict[gene_id] = human_id
+                continue
+            if symbol_ids[position] is None:
+                symbol_ids[position] = pending_symbol_ids.setdefault(symbols[position], len(pending_symbol_ids))
+            pending_gene_ids.append(gene_id)
+            pending_symbols.append(symbol_ids[position])
+    logging.info(f'Gene input file read in {datetime.now() - start_time}s')
+
+    if gene_mapper is not None:
+        # map the genes which were read before the human gene of their symbol
+        human_ids = [human_gene_dict.get(symbol) for symbol in pending_symbol_ids]
+        for gene_id, symbol_id in zip(pending_gene_ids, pending_symbols):
+            human_id = human_ids[symbol_id]
+            if human_id is not None:
+                gene_to_human_id_dict[gene_id] = human_id
+        gene_mapper.human_gene_dict = human_gene_dict
+        gene_mapper.gene_to_human_id_dict = gene_to_human_id_dict
+        logging.info(f'{len(gene_to_human_id_dict)} genes mapped to {len(human_gene_dict)} human gene symbols')
+
+
+def parse_taxonomy_chunk(chunk: str):
+    """
+    Parses a chunk of taxonomy names.dmp lines
+    :param chunk: text chunk with complete lines
+    :return: a list of (species id, name shortcut, name)
+    """
+    species_ids = _worker_settings.get("species_ids")
+    translator = str.maketrans({p: '' for p in '[]()'})
+    names = []
+    for line in chunk.splitlines():
+        if SPECIES_NAME_COMMON in line or SPECIES_NAME_SCIENTIFIC in line:
+            components = line.split('\t')
+            species_id = components[0]
+            # skip species that are not requested
+            if species_ids is not None and int(species_id) not in species_ids:
+                continue
+            # Remove brackets
+            name = components[2].translate(translator).strip()
+            if SPECIES_NAME_COMMON in line:
+                names.append((species_id, SPECIES_NAME_COMMON_SHORTCUT, name))
+            else:
+                names.append((species_id, SPECIES_NAME_SCIENTIFIC_SHORTCUT, name))
+    return names
+
+
+def read_species_names(species_file: str = TAXONOMY_FILE, species_ids: set = None, workers: int = 1,
+                       chunk_size: int = CHUNK_SIZE):
+    """
+    Reads the common and scientific species names of the taxonomy names file
+    :param species_file: path to the taxonomy names file (gzip)
+    :param species_ids: only these species ids are kept (None = all species)
+    :param workers: number of worker processes
+    :param chunk_size: approximate number of characters per chunk
+    :return: an iterator over (species id, name shortcut, name)
+    """
+    logging.info(f'Reading species input file: {species_file} ({workers} workers)')
+    for names in parse_chunks(species_file, parse_taxonomy_chunk, settings=dict(species_ids=species_ids),
+                              workers=workers, chunk_size=chunk_size):
+        yield from names
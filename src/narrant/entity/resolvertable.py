@@ -0,0 +1,140 @@
+"""
+Keyed storage of the entity resolver data
+
+The name resolvers (MeSH, Gene and Species) are stored in two formats:
+- the JSON blob in entity_resolver_data: it is the source of the local snapshots (narrant.entity.snapshot)
+  which are used when a whole index is needed, e.g. to resolve all names of a document batch in memory
+- one row per key in the entity_resolver_entry table (primary key: resolver name + key): single names
+  can be resolved by indexed lookups without loading (and keeping) a whole index, e.g. by the exports
+All other resolver data (e.g. the MeSH ontology or the gene mapper) is only read as a whole and therefore
+only stored as a JSON blob. Both formats of a name resolver are written by store_resolver_data, so
+they always share one version.
+"""
+import json
+import logging
+from collections import OrderedDict
+from typing import Iterable, Dict
+
+from sqlalchemy import MetaData, Table, Column, String, Text, select, delete, inspect
+
+metadata = MetaData()
+
+entity_resolver_entry = Table(
+    "entity_resolver_entry", metadata,
+    Column("name", String, primary_key=True),
+    Column("key", String, primary_key=True),
+    Column("value", Text, nullable=False)
+)
+
+BULK_INSERT_AFTER_K = 100000
+LOOKUP_BATCH_SIZE = 10000
+
+
+def store_resolver_entries(session, name: str, data: dict):
+    """
+    Replaces all entries of a resolver in the keyed table
+    Keys are converted to strings and values are stored as JSON (like json.dumps does for the blob)
+    :param session: a database session
+    :param name: name of the resolver data
+    :param data: a dictionary with JSON serializable values
+    :return: None
+    """
+    metadata.create_all(session.bind, tables=[entity_resolver_entry], checkfirst=True)
+    session.execute(delete(entity_resolver_entry).where(entity_resolver_entry.c.name == name))
+    values = []
+    for key, value in data.items():
+        values.append(dict(name=name, key=str(key), value=json.dumps(value)))
+        if len(values) >= BULK_INSERT_AFTER_K:
+            session.execute(entity_resolver_entry.insert(), values)
+            values.clear()
+    if values:
+        session.execute(entity_resolver_entry.insert(), values)
+    session.commit()
+    logging.info(f'{len(data)} keyed entries stored for {name}')
+
+
+def update_resolver_entries(session, name: str, upserts: dict, deletes: Iterable = ()):
+    """
+    Changes single entries of a resolver in the keyed table (all other entries are kept)
+    :param session: a database session
+    :param name: name of the resolver data
+    :param upserts: a dictionary key -> value of entries which are inserted or replaced
+    :param deletes: keys of entries which are deleted
+    :return: None
+    """
+    metadata.create_all(session.bind, tables=[entity_resolver_entry], checkfirst=True)
+    upsert_keys = {str(k) for k in upserts}
+    delete_keys = {str(k) for k in deletes} - upsert_keys
+    keys = sorted(upsert_keys | delete_keys)
+    for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+        session.execute(delete(entity_resolver_entry).where(entity_resolver_entry.c.name == name)
+                        .where(entity_resolver_entry.c.key.in_(keys[i:i + LOOKUP_BATCH_SIZE])))
+    values = [dict(name=name, key=str(key), value=json.dumps(value)) for key, value in upserts.items()]
+    for i in range(0, len(values), BULK_INSERT_AFTER_K):
+        session.execute(entity_resolver_entry.insert(), values[i:i + BULK_INSERT_AFTER_K])
+    session.commit()
+    logging.info(f'{len(upserts)} keyed entries inserted or replaced and {len(delete_keys)} deleted for {name}')
+
+
+def has_resolver_entries(session, name: str) -> bool:
+    """
+    Checks whether keyed entries were stored for a resolver
+    :param session: a database session
+    :param name: name of the resolver data
+    :return: True if at least one entry exists
+    """
+    # the table is created when the first entries are stored
+    if not inspect(session.bind).has_table(entity_resolver_entry.name):
+        return False
+    q = select(entity_resolver_entry.c.key).where(entity_resolver_entry.c.name == name).limit(1)
+    return session.execute(q).first() is not None
+
+
+def lookup_resolver_entries(session, name: str, keys: Iterable) -> Dict[str, object]:
+    """
+    Looks up several keys of a resolver (one query per batch of keys)
+    :param session: a database session
+    :param name: name of the resolver data
+    :param keys: the keys to look up (converted to strings)
+    :return: a dictionary key -> value that contains only the found keys
+    """
+    keys = sorted({str(k) for k in keys})
+    result = {}
+    for i in range(0, len(keys), LOOKUP_BATCH_SIZE):
+        q = select(entity_resolver_entry.c.key, entity_resolver_entry.c.value)
+        q = q.where(entity_resolver_entry.c.name == name)
+        q = q.where(entity_resolver_entry.c.key.in_(keys[i:i + LOOKUP_BATCH_SIZE]))
+        for key, value in session.execute(q):
+            result[key] = json.loads(value)
+    return result
+
+
+class LRUCache:
+    """
+    A simple least-recently-used cache
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,257 @@
+"""
+Local binary snapshots of the entity resolver data
+
+The resolver indexes are stored as JSON blobs in the entity_resolver_data table. Parsing these
+blobs takes seconds and the whole index must be kept in memory. Therefore, each blob is written
+once into a local snapshot file (a sorted key table) that is memory-mapped and queried by binary
+search. Values are decoded on first access only and memoized afterwards. Small snapshots are decoded
+into a dictionary at once, because their lookups are part of hot loops (e.g. in MeSHOntology).
+
+A snapshot is only used if its version matches the version entry stored next to the blob in the
+database. Blobs without a version entry (stored by older versions) are loaded from JSON.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import uuid
+from collections.abc import Mapping
+from datetime import datetime
+
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import EntityResolverData
+from narrant.config import RESOLVER_SNAPSHOT_DIR
+from narrant.entity.resolvertable import store_resolver_entries
+
+SNAPSHOT_MAGIC = b'NRSNAP01'
+VERSION_SUFFIX = " version"
+# snapshots with at most this number of keys are decoded into a dictionary when they are loaded
+MAX_DECODED_SNAPSHOT_SIZE = 250000
+
+
+class SnapshotDict(Mapping):
+    """
+    A read-only dictionary backed by a memory-mapped snapshot file
+    File layout:
+        magic | version length (uint32) | version | number of keys n (uint64)
+        key offsets ((n+1) x uint64) | value offsets ((n+1) x uint64) | keys | values
+    Keys are utf-8 encoded strings in sorted order, values are JSON encoded
+    Decoded values are memoized, so repeated lookups of the same key neither search nor decode again
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f'{path} is not a resolver snapshot')
+        pos = len(SNAPSHOT_MAGIC)
+        version_len, = struct.unpack_from('<I', self._mm, pos)
+        pos += 4
+        self.version = self._mm[pos:pos + version_len].decode('utf-8')
+        pos += version_len
+        self._size, = struct.unpack_from('<Q', self._mm, pos)
+        pos += 8
+        self._key_offsets = pos
+        self._value_offsets = self._key_offsets + 8 * (self._size + 1)
+        self._keys_start = self._value_offsets + 8 * (self._size + 1)
+        keys_len, = struct.unpack_from('<Q', self._mm, self._key_offsets + 8 * self._size)
+        self._values_start = self._keys_start + keys_len
+        # key -> decoded value
+        self._decoded = {}
+
+    def __reduce__(self):
+        # worker processes reopen the file instead of copying the mapping
+        return SnapshotDict, (self.path,)
+
+    def _key_at(self, idx: int) -> bytes:
+        start, end = struct.unpack_from('<QQ', self._mm, self._key_offsets + 8 * idx)
+        return self._mm[self._keys_start + start:self._keys_start + end]
+
+    def _value_at(self, idx: int):
+        start, end = struct.unpack_from('<QQ', self._mm, self._value_offsets + 8 * idx)
+        return json.loads(self._mm[self._values_start + start:self._values_start + end])
+
+    def _find(self, key) -> int:
+        if not isinstance(key, str):
+            return -1
+        key = key.encode('utf-8')
+        lo, hi = 0, self._size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._size and self._key_at(lo) == key:
+            return lo
+        return -1
+
+    def __getitem__(self, key):
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        idx = self._find(key)
+        if idx < 0:
+            raise KeyError(key)
+        value = self._value_at(idx)
+        self._decoded[key] = value
+        return value
+
+    def __contains__(self, key):
+        return key in self._decoded or self._find(key) >= 0
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        for idx in range(self._size):
+            yield self._key_at(idx).decode('utf-8')
+
+    def items(self):
+        for idx in range(self._size):
+            yield self._key_at(idx).decode('utf-8'), self._value_at(idx)
+
+    def values(self):
+        for idx in range(self._size):
+            yield self._value_at(idx)
+
+    def to_dict(self) -> dict:
+        """
+        Decodes all keys and values of the snapshot
+        :return: a dictionary
+        """
+        return dict(self.items())
+
+    @staticmethod
+    def write(path: str, version: str, data: dict):
+        """
+        Writes a dictionary as a snapshot file
+        Keys are converted to strings (like json.dumps does)
+        The file is written to a temporary file first and moved afterwards, so that concurrent readers
+        never see a partial snapshot
+        :param path: path of the snapshot file
+        :param version: the version of the data
+        :param data: a dictionary with JSON serializable values
+        :return: None
+        """
+        entries = sorted((str(k).encode('utf-8'), json.dumps(v).encode('utf-8')) for k, v in data.items())
+        version = version.encode('utf-8')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack('<I', len(version)))
+            f.write(version)
+            f.write(struct.pack('<Q', len(entries)))
+            for part in (0, 1):
+                offset = 0
+                offsets = [0]
+                for entry in entries:
+                    offset += len(entry[part])
+                    offsets.append(offset)
+                f.write(struct.pack(f'<{len(offsets)}Q', *offsets))
+            for part in (0, 1):
+                for entry in entries:
+                    f.write(entry[part])
+        os.replace(tmp_path, path)
+
+
+def get_snapshot_path(name: str, field: str = None, snapshot_dir: str = RESOLVER_SNAPSHOT_DIR) -> str:
+    file_name = name if not field else f'{name}.{field}'
+    return os.path.join(snapshot_dir, file_name.replace(' ', '_') + '.snapshot')
+
+
+def get_resolver_data_version(session, name: str) -> str:
+    """
+    Loads the version entry of a resolver blob
+    :param session: a database session
+    :param name: name of the resolver data
+    :return: the version or None if no version was stored
+    """
+    try:
+        return EntityResolverData.load_data_from_json(session, name + VERSION_SUFFIX).get("version")
+    except (ValueError, AttributeError):
+        # no version entry (the index was stored by an older version): the JSON of a missing entry
+        # cannot be decoded (JSONDecodeError is a ValueError) or is not a dictionary
+        return None
+
+
+def store_resolver_data(session, name: str, data: dict, keyed: bool = False):
+    """
+    Stores resolver data as a JSON blob in the database together with a new version entry
+    :param session: a database session
+    :param name: name of the resolver data
+    :param data: a JSON serializable dictionary
+    :param keyed: the data is also written into the keyed resolver table to allow single lookups
+    (only for name resolvers, see narrant.entity.resolvertable)
+    :return: None
+    """
+    json_data = json.dumps(data)
+    logging.info(f'Writing {name} index ({len(data)} keys) to DB (entity_resolver_data table)')
+    EntityResolverData.overwrite_resolver_data(session, name=name, json_data=json_data)
+    version = json.dumps(dict(version=uuid.uuid4().hex))
+    EntityResolverData.overwrite_resolver_data(session, name=name + VERSION_SUFFIX, json_data=version)
+
+    if keyed:
+        store_resolver_entries(session, name, data)
+
+
+def _open_snapshot(path: str, version: str):
+    if not os.path.isfile(path):
+        return None
+    try:
+        snapshot = SnapshotDict(path)
+    except (ValueError, OSError, struct.error) as e:
+        logging.warning(f'Ignoring invalid snapshot {path} ({e})')
+        return None
+    if snapshot.version != version:
+        logging.debug(f'Snapshot {path} is outdated')
+        return None
+    return snapshot
+
+
+def _decode_small_snapshot(snapshot: SnapshotDict, max_decoded_size: int):
+    if len(snapshot) <= max_decoded_size:
+        return snapshot.to_dict()
+    return snapshot
+
+
+def load_resolver_data(name: str, fields: [str] = None, snapshot_dir: str = RESOLVER_SNAPSHOT_DIR,
+                       max_decoded_size: int = MAX_DECODED_SNAPSHOT_SIZE):
+    """
+    Loads resolver data from its local snapshot if it is up to date, otherwise the JSON blob is loaded
+    from the database and a new snapshot is written
+    :param name: name of the resolver data
+    :param fields: if the blob is a dictionary of dictionaries, each field gets its own snapshot
+    :param snapshot_dir: directory of the snapshot files
+    :param max_decoded_size: snapshots with at most this number of keys are decoded into a dictionary
+    :return: a mapping (or a dictionary field -> mapping if fields are given)
+    """
+    start_time = datetime.now()
+    session = Session.get()
+    version = get_resolver_data_version(session, name)
+    parts = fields if fields else [None]
+    paths = {part: get_snapshot_path(name, part, snapshot_dir=snapshot_dir) for part in parts}
+
+    if version:
+        snapshots = {part: _open_snapshot(path, version) for part, path in paths.items()}
+        if all(s is not None for s in snapshots.values()):
+            snapshots = {part: _decode_small_snapshot(s, max_decoded_size) for part, s in snapshots.items()}
+            logging.info(f'{name} snapshot opened in {datetime.now() - start_time}s')
+            return snapshots if fields else snapshots[None]
+
+    json_data = EntityResolverData.load_data_from_json(session, name)
+    logging.info(f'{name} JSON data loaded in {datetime.now() - start_time}s')
+    data = {part: json_data[part] for part in parts if part in json_data} if fields else {None: json_data}
+    if version:
+        for part, part_data in data.items():
+            try:
+                SnapshotDict.write(paths[part], version, part_data)
+                if len(part_data) > max_decoded_size:
+                    data[part] = SnapshotDict(paths[part])
+            except OSError as e:
+                logging.warning(f'Cannot write snapshot {paths[part]} ({e})')
+    return data if fields else data[None]
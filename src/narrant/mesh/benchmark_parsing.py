@@ -0,0 +1,88 @@
+import logging
+import time
+from argparse import ArgumentParser
+
+from lxml import etree
+
+from narrant.config import MESH_DESCRIPTORS_FILE, MESH_SUPPLEMENTARY_FILE
+from narrant.mesh.data import BaseNode, Descriptor, MESH_QUERY_DESCRIPTOR_RECORD
+from narrant.mesh.supplementary import SupplementaryRecord, MESH_SUPP_QUERY_DESCRIPTOR_RECORD
+
+
+def node_values(value):
+    """
+    Converts a parsed node (and its nested nodes) into comparable tuples
+    """
+    if isinstance(value, BaseNode):
+        return tuple((key, node_values(getattr(value, key, None))) for key in value.attrs)
+    if isinstance(value, list):
+        return tuple(node_values(v) for v in value)
+    return value
+
+
+def parse_records(records, record_class, use_field_parser: bool):
+    BaseNode.use_field_parser = use_field_parser
+    try:
+        return [record_class.from_element(record) for record in records]
+    finally:
+        BaseNode.use_field_parser = True
+
+
+def benchmark(filename: str, supplementary: bool = False, repetitions: int = 3, limit: int = None):
+    """
+    Compares the parse speed of the XPath-per-field parsing and the single-pass field parser
+    :param filename: path to a MeSH descriptor or supplementary XML file
+    :param supplementary: the file is a supplementary file
+    :param repetitions: number of repetitions (the best run is reported)
+    :param limit: only parse the first n records
+    :return: None
+    """
+    record_class = SupplementaryRecord if supplementary else Descriptor
+    query = MESH_SUPP_QUERY_DESCRIPTOR_RECORD if supplementary else MESH_QUERY_DESCRIPTOR_RECORD
+    logging.info(f'Loading {filename}...')
+    records = etree.parse(filename).xpath(query)
+    if limit:
+        records = records[:limit]
+    logging.info(f'Benchmarking the parsing of {len(records)} records ({repetitions} repetitions)...')
+
+    timings = {}
+    results = {}
+    for use_field_parser in [False, True]:
+        best = None
+        for _ in range(repetitions):
+            start = time.perf_counter()
+            results[use_field_parser] = parse_records(records, record_class, use_field_parser)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[use_field_parser] = best
+
+    if [node_values(r) for r in results[False]] != [node_values(r) for r in results[True]]:
+        raise ValueError('Results of XPath parsing and single-pass parsing differ')
+
+    xpath_time, single_pass_time = timings[False], timings[True]
+    logging.info(f'xpath per field: {xpath_time:.4f}s ({1000 * xpath_time / len(records):.4f}ms per record)')
+    logging.info(f'single pass    : {single_pass_time:.4f}s '
+                 f'({1000 * single_pass_time / len(records):.4f}ms per record)')
+    logging.info(f'speedup        : {xpath_time / single_pass_time:.1f}x')
+
+
+def main():
+    parser = ArgumentParser(description="Benchmarks the parsing of MeSH records")
+    parser.add_argument("-i", "--input", help="MeSH XML file (default: MeSH descriptor file of the project config)")
+    parser.add_argument("--supplementary", action="store_true", help="Benchmark the supplementary file")
+    parser.add_argument("-r", "--repetitions", type=int, default=3, help="Number of repetitions (default: 3)")
+    parser.add_argument("-n", "--limit", type=int, help="Only parse the first n records")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        level=logging.INFO)
+
+    filename = args.input
+    if not filename:
+        filename = MESH_SUPPLEMENTARY_FILE if args.supplementary else MESH_DESCRIPTORS_FILE
+    benchmark(filename, supplementary=args.supplementary, repetitions=args.repetitions, limit=args.limit)
+
+
+if __name__ == "__main__":
+    main()
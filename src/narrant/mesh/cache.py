@@ -0,0 +1,137 @@
+"""
+Persistent cache of pre-parsed MeSH records
+
+The MeSH descriptor and supplementary XML files are converted once into compact record tuples
+(ids, names, terms, tree numbers, ...) which are pickled into the cache directory. The cache file
+is keyed by the path and the md5 checksum of the XML file: a new MeSH release creates a new cache, an
+unchanged file is never parsed again. Files of the same name in different directories (e.g. an old and
+a new release) have their own caches.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import sys
+from collections import namedtuple
+from datetime import datetime
+from typing import List
+
+from narrant.config import MESH_DESCRIPTORS_FILE, MESH_SUPPLEMENTARY_FILE, MESH_CACHE_DIR
+from narrant.mesh.parallel import parse_descriptors_parallel
+from narrant.mesh.supplementary import parse_supplementary_records_parallel
+from narrant.util.filecache import file_checksum, read_cache_file, write_cache_file
+
+CACHE_FORMAT_VERSION = 1
+KIND_DESCRIPTORS = "descriptors"
+KIND_SUPPLEMENTARY = "supplementary"
+# fields parsed from the XML records
+DESCRIPTOR_FIELDS = ["unique_id", "heading", "tree_numbers", "terms", "qualifiers"]
+SUPPLEMENTARY_FIELDS = ["unique_id", "name", "note", "terms", "headings_mapped_to"]
+
+CachedDescriptor = namedtuple('CachedDescriptor', ['unique_id', 'heading', 'tree_numbers', 'terms',
+                                                   'qualifiers'])
+CachedDescriptor.name = property(lambda self: self.heading)
+CachedDescriptor.__doc__ = "Descriptor of the MeSH cache (terms are strings, qualifiers are qualifier ids)"
+
+CachedSupplementaryRecord = namedtuple('CachedSupplementaryRecord', ['unique_id', 'name', 'note', 'terms',
+                                                                     'headings_mapped_to'])
+CachedSupplementaryRecord.__doc__ = "Supplementary record of the MeSH cache (headings_mapped_to are descriptor ids)"
+
+
+def get_source_prefix(source_file: str, kind: str) -> str:
+    """
+    Computes the name prefix of all cache files of a source file
+    :param source_file: path to the MeSH XML file
+    :param kind: kind of the cached records
+    :return: '<file name>.<hash of the absolute path>.<kind>'
+    """
+    path_hash = hashlib.md5(os.path.abspath(source_file).encode('utf-8')).hexdigest()[:8]
+    return f'{os.path.basename(source_file)}.{path_hash}.{kind}'
+
+
+def get_cache_path(source_file: str, kind: str, checksum: str, cache_dir: str = MESH_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, f'{get_source_prefix(source_file, kind)}.{checksum}.cache')
+
+
+def _convert_descriptor(desc) -> CachedDescriptor:
+    return CachedDescriptor(sys.intern(desc.unique_id), desc.heading, tuple(desc.tree_numbers),
+                            tuple(t.string for t in desc.terms), tuple(q.ui for q in desc.allowable_qualifiers))
+
+
+def _convert_supplementary_record(record) -> CachedSupplementaryRecord:
+    return CachedSupplementaryRecord(sys.intern(record.unique_id), record.name, record.note,
+                                     tuple(t.string for t in record.terms),
+                                     tuple(h.unique_id for h in record.headings_mapped_to))
+
+
+def _load_records(source_file: str, kind: str, parse_function, fields: list, convert_function, cache_dir: str,
+                  force_rebuild: bool, workers: int) -> list:
+    start_time = datetime.now()
+    checksum = file_checksum(source_file)
+    path = get_cache_path(source_file, kind, checksum, cache_dir=cache_dir)
+    if not force_rebuild:
+        records = read_cache_file(path, CACHE_FORMAT_VERSION)
+        if records is not None:
+            logging.info(f'{len(records)} MeSH {kind} loaded from cache in {datetime.now() - start_time}s')
+            return records
+
+    logging.info(f'Building MeSH {kind} cache from {source_file}...')
+    records = parse_function(source_file, workers=workers, fields=fields, convert_function=convert_function)
+    try:
+        # caches of older versions of the source file (at the same path) are removed
+        write_cache_file(path, CACHE_FORMAT_VERSION,
+                         dict(source=os.path.abspath(source_file), kind=kind, checksum=checksum, size=len(records)),
+                         records,
+                         stale_pattern=os.path.join(cache_dir, f'{get_source_prefix(source_file, kind)}.*.cache'))
+    except OSError as e:
+        logging.warning(f'Cannot write MeSH cache {path} ({e})')
+    logging.info(f'{len(records)} MeSH {kind} parsed and cached in {datetime.now() - start_time}s')
+    return records
+
+
+def load_descriptors(mesh_file: str = MESH_DESCRIPTORS_FILE, cache_dir: str = MESH_CACHE_DIR,
+                     force_rebuild: bool = False, workers: int = 1) -> List[CachedDescriptor]:
+    """
+    Loads all descriptors of a MeSH descriptor file (parses the XML only if the file has not been cached yet)
+    :param mesh_file: path to the MeSH descriptor file (desc.xml)
+    :param cache_dir: directory of the cache files
+    :param force_rebuild: parse the XML file even if a cache exists
+    :param workers: number of worker processes to parse the XML file
+    :return: a list of CachedDescriptor (in file order)
+    """
+    return _load_records(mesh_file, KIND_DESCRIPTORS, parse_descriptors_parallel, DESCRIPTOR_FIELDS,
+                         _convert_descriptor, cache_dir, force_rebuild, workers)
+
+
+def load_supplementary_records(supp_file: str = MESH_SUPPLEMENTARY_FILE, cache_dir: str = MESH_CACHE_DIR,
+                               force_rebuild: bool = False, workers: int = 1) -> List[CachedSupplementaryRecord]:
+    """
+    Loads all records of a MeSH supplementary file (parses the XML only if the file has not been cached yet)
+    :param supp_file: path to the MeSH supplementary file (supp.xml)
+    :param cache_dir: directory of the cache files
+    :param force_rebuild: parse the XML file even if a cache exists
+    :param workers: number of worker processes to parse the XML file
+    :return: a list of CachedSupplementaryRecord (in file order)
+    """
+    return _load_records(supp_file, KIND_SUPPLEMENTARY, parse_supplementary_records_parallel, SUPPLEMENTARY_FIELDS,
+                         _convert_supplementary_record, cache_dir, force_rebuild, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts the MeSH XML files into the MeSH record cache")
+    parser.add_argument("--descriptors", default=MESH_DESCRIPTORS_FILE, help="MeSH descriptor file")
+    parser.add_argument("--supplementary", default=MESH_SUPPLEMENTARY_FILE, help="MeSH supplementary file")
+    parser.add_argument("-f", "--force", action="store_true", help="Rebuild the cache even if it is up to date")
+    parser.add_argument("-w", "--workers", default=1, type=int, help="Number of worker processes to parse the XML")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        level=logging.INFO)
+
+    load_descriptors(args.descriptors, force_rebuild=args.force, workers=args.workers)
+    load_supplementary_records(args.supplementary, force_rebuild=args.force, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,30 @@
 XML Documentation: https://www.nlm.nih.gov/mesh/xml_data_elements.html
 """
 import itertools
+from bisect import bisect_left
 from datetime import datetime
-from typing import List
+from typing import Iterator, List
 
 from lxml import etree
 
-from narrant.mesh.utils import get_text, get_attr, get_datetime, get_element_text, get_list
+from narrant.mesh.hierarchy import MeSHHierarchy
+from narrant.mesh.utils import get_text, get_attr, get_datetime, get_element_text, get_list, FieldParser
 
 MESH_QUERY_DESCRIPTOR_RECORD = "/DescriptorRecordSet/DescriptorRecord"
-MESH_QUERY_DESCRIPTOR_BY_ID = "/DescriptorRecordSet/DescriptorRecord/DescriptorUI[text()='{}']/parent::*"
-MESH_QUERY_DESCRIPTOR_BY_TREE_NUMBER = "/DescriptorRecordSet/DescriptorRecord/TreeNumberList" \
-                                       "/TreeNumber[text()='{}']/parent::*/parent::*"
-MESH_QUERY_DESCRIPTOR_IDS_BY_TREE_NUMBER = "/DescriptorRecordSet/DescriptorRecord/TreeNumberList" \
-                                           "/TreeNumber[starts-with(text(),'{}')]/parent::*/parent::*/DescriptorUI"
-MESH_QUERY_DESCRIPTOR_BY_HEADING_CONTAINS = "/DescriptorRecordSet/DescriptorRecord/DescriptorName" \
-                                            "/String[contains(text(),'{}')]/parent::*/parent::*"
-MESH_QUERY_DESCRIPTOR_BY_HEADING_EXACT = "/DescriptorRecordSet/DescriptorRecord/DescriptorName" \
-                                         "/String[text()='{}']/parent::*/parent::*"
-MESH_QUERY_DESCRIPTOR_BY_TERM = "/DescriptorRecordSet/DescriptorRecord/ConceptList/Concept/TermList/Term" \
-                                "/String[text()='{}']/parent::*/parent::*/parent::*/parent::*/parent::*"
+MESH_TAG_DESCRIPTOR_RECORD = "DescriptorRecord"
 
 
 class BaseNode:
+    """
+    Base class of MeSH records. The fields of a record are described by _attrs (key -> (func, *args)).
+    Subclasses declare their fields as __slots__, so records do not carry a per-instance __dict__.
+    _field_aliases maps readable field names to (dotted) field paths for the field selection.
+    """
+    __slots__ = ()
     _attrs = dict()
+    _field_aliases = dict()
+    # parse records in a single pass over their children (False: one XPath query per field)
+    use_field_parser = True
 
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
@@ -33,10 +34,54 @@ class BaseNode:
 
     @classmethod
     def from_element(cls, record, *args):
-        kwargs = dict()
-        for key, (func, *func_args) in cls._attrs.items():
-            kwargs[key] = func(record, *func_args)
-        return cls(**kwargs)
+        if not BaseNode.use_field_parser:
+            kwargs = dict()
+            for key, (func, *func_args) in cls._attrs.items():
+                kwargs[key] = func(record, *func_args)
+            return cls(**kwargs)
+        return cls(**cls.get_field_parser().parse(record))
+
+    @classmethod
+    def from_element_with_fields(cls, record, fields):
+        """
+        Creates a record that contains only the selected fields (other fields are not set)
+        :param record: the record element
+        :param fields: field names, aliases or dotted field paths (see _field_aliases)
+        :return: a record object
+        """
+        return cls(**cls.get_field_parser(fields).parse(record))
+
+    @classmethod
+    def resolve_fields(cls, fields) -> tuple:
+        """
+        Translates field aliases into field paths
+        :param fields: field names, aliases or dotted field paths
+        :return: a sorted tuple of field paths
+        """
+        paths = set()
+        for field in fields:
+            alias = cls._field_aliases.get(field, field)
+            if isinstance(alias, str):
+                paths.add(alias)
+            else:
+                paths.update(alias)
+        return tuple(sorted(paths))
+
+    @classmethod
+    def get_field_parser(cls, fields=None) -> FieldParser:
+        """
+        Returns the (cached) field parser of this class for a field selection
+        :param fields: field names, aliases or dotted field paths (None = all fields)
+        :return: a FieldParser
+        """
+        if "_field_parsers" not in cls.__dict__:
+            cls._field_parsers = dict()
+        selection = cls.resolve_fields(fields) if fields is not None else None
+        parser = cls._field_parsers.get(selection)
+        if parser is None:
+            parser = FieldParser(cls._attrs, fields=selection)
+            cls._field_parsers[selection] = parser
+        return parser
 
     def print(self, print_unset=False):
         for key in self._attrs.keys():
@@ -63,6 +108,10 @@ class Term(BaseNode):
         term_ui=(get_text, "TermUI", True),
         thesaurus_id_list=(get_list, "ThesaurusIDList", get_element_text),
     )
+    _field_aliases = dict(
+        string="_string",
+    )
+    __slots__ = tuple(_attrs.keys())
 
     @property
     def id(self):
@@ -86,6 +135,7 @@ class ConceptRelation(BaseNode):
         concept2ui=(get_text, "Concept2UI"),
         relation_name=(get_attr, "RelationName"),
     )
+    __slots__ = tuple(_attrs.keys())
 
 
 class Concept(BaseNode):
@@ -102,6 +152,11 @@ class Concept(BaseNode):
         translators_english_scope_note=(get_text, "TranslatorsEnglishScopeNote"),
         translators_scope_note=(get_text, "TranslatorsScopeNote"),
     )
+    _field_aliases = dict(
+        name="_name",
+        terms="term_list._string",
+    )
+    __slots__ = tuple(_attrs.keys())
 
     @property
     def name(self):
@@ -124,12 +179,12 @@ class Concept(BaseNode):
 
 # TODO: Add reference to descriptor
 class PharmacologicalAction(BaseNode):
-    pass
+    __slots__ = ()
 
 
 # TODO: Add reference to descriptor
 class SeeRelatedDescriptor(BaseNode):
-    pass
+    __slots__ = ()
 
 
 class AllowableQualifier(BaseNode):
@@ -137,6 +192,7 @@ class AllowableQualifier(BaseNode):
         _qualifier_ui=(get_text, "QualifierReferredTo/QualifierUI"),
         _qualifier_name=(get_text, "QualifierReferredTo/QualifierName/String")
     )
+    __slots__ = tuple(_attrs.keys())
 
     @property
     def name(self):
@@ -170,6 +226,16 @@ class Descriptor(BaseNode):
         _unique_id=(get_text, "DescriptorUI", True),
         allowable_qualifiers_list=(get_list, "AllowableQualifiersList", AllowableQualifier.from_element)
     )
+    _field_aliases = dict(
+        unique_id="_unique_id",
+        name="_name",
+        heading="_name",
+        tree_numbers="tree_number_list",
+        terms="concept_list.term_list._string",
+        note="mesh_note",
+        qualifiers="allowable_qualifiers_list._qualifier_ui",
+    )
+    __slots__ = tuple(_attrs.keys()) + ("_parents", "_lineages", "_terms")
 
     @property
     def heading(self) -> str:
@@ -198,22 +264,20 @@ class Descriptor(BaseNode):
     @property
     def parents(self):
         if not hasattr(self, "_parents"):
-            parent_tns = [".".join(tn.split(".")[:-1]) for tn in self.tree_numbers if "." in tn]
-            parents = [MeSHDB().desc_by_tree_number(tn) for tn in parent_tns]
+            db = MeSHDB()
+            parents = [db.desc_by_id(p) for p in db.get_hierarchy().parents(self.unique_id)]
             setattr(self, "_parents", parents)
         return getattr(self, "_parents")
 
     @property
     def lineages(self):
         """
+        Lineages are computed by the (memoized) hierarchy of the MeSHDB.
         :return: List of lists of Descriptors.
         """
         if not hasattr(self, "_lineages"):
-            parent_lineages = [lineage for p in self.parents for lineage in p.lineages]
-            if parent_lineages:
-                lineages = [lineage + [self] for lineage in parent_lineages]
-            else:
-                lineages = [[self]]
+            db = MeSHDB()
+            lineages = [[db.desc_by_id(d) for d in lineage] for lineage in db.get_hierarchy().lineages(self.unique_id)]
             setattr(self, "_lineages", lineages)
         return getattr(self, "_lineages")
 
@@ -221,6 +285,14 @@ class Descriptor(BaseNode):
         common = [[x for x, y in zip(l1, l2) if x == y] for l1 in self.lineages for l2 in other.lineages]
         return [x for x in common if x]
 
+    def get_lowest_common_ancestor(self, other):
+        """
+        :return: the deepest Descriptor which is an ancestor of both descriptors (or None)
+        """
+        db = MeSHDB()
+        lca = db.get_hierarchy().lowest_common_ancestor(self.unique_id, other.unique_id)
+        return db.desc_by_id(lca) if lca else None
+
     @property
     def terms(self) -> List[Term]:
         if not hasattr(self, "_terms"):
@@ -238,6 +310,41 @@ class Descriptor(BaseNode):
         return self.unique_id < other.unique_id
 
 
+def iterparse_records(filename, tag, record_class, fields=None):
+    """
+    Streams the records of a MeSH XML file without building the whole tree
+    Each record element is converted and cleared afterwards. Already processed siblings are removed from
+    the root element, so that memory consumption does not grow with the file size.
+
+    :param filename: Path to a MeSH XML file
+    :param tag: Tag of the record elements (e.g. DescriptorRecord)
+    :param record_class: BaseNode class which is created for each record
+    :param fields: only parse these fields of each record (None = all fields)
+    :return: an iterator over record objects
+    """
+    context = etree.iterparse(filename, events=("end",), tag=tag)
+    for _, element in context:
+        if fields is None:
+            yield record_class.from_element(element)
+        else:
+            yield record_class.from_element_with_fields(element, fields)
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+    del context
+
+
+def iterate_descriptors(filename, fields=None) -> Iterator[Descriptor]:
+    """
+    Streams all descriptors of a MeSH descriptor file (desc.xml)
+
+    :param filename: Path to the MeSH descriptor file
+    :param fields: only parse these fields, e.g. ["unique_id", "heading", "terms"] (None = all fields)
+    :return: an iterator over Descriptor objects (in file order)
+    """
+    return iterparse_records(filename, MESH_TAG_DESCRIPTOR_RECORD, Descriptor, fields=fields)
+
+
 # noinspection PyTypeChecker,PyUnresolvedReferences
 class MeSHDB:
     """
@@ -247,23 +354,37 @@ class MeSHDB:
     - desc_by_tree_number
     - descs_by_name
     - descs_by_term
+    - descs_under_tree_number
+
+    Loading a file streams all descriptors once and builds in-memory indexes (by id, tree number, heading and
+    lowercased term strings), so that all lookups are answered without keeping the XML tree.
     """
     __instance = None
 
     def __new__(cls):
         if cls.__instance is None:
             cls.__instance = super().__new__(cls)
-            cls.__instance.tree = None
-            cls.__instance._desc_by_id = dict()
-            cls.__instance._desc_by_tree_number = dict()
-            cls.__instance._desc_by_name = dict()
+            cls.__instance._clear_index()
         return cls.__instance
 
+    def _clear_index(self):
+        self._descs = list()
+        self._desc_by_id = dict()
+        self._desc_by_tree_number = dict()
+        self._desc_by_name = dict()
+        self._descs_by_term = dict()
+        # sorted tree numbers for prefix queries and the hierarchy (computed on demand)
+        self._sorted_tree_numbers = None
+        self._hierarchy = None
+
     def get_index(self):
         return dict(
+            _descs=self._descs,
             _desc_by_id=self._desc_by_id,
             _desc_by_tree_number=self._desc_by_tree_number,
             _desc_by_name=self._desc_by_name,
+            _descs_by_term=self._descs_by_term,
+            _sorted_tree_numbers=self._sorted_tree_numbers,
         )
 
     def set_index(self, index):
@@ -273,18 +394,21 @@ class MeSHDB:
     def load_xml(self, filename, verbose=False, force_load=False):
         if not self._desc_by_id or force_load:
             start = datetime.now()
-            self.tree = etree.parse(filename)
-            end = datetime.now()
+            self.build_index(iterate_descriptors(filename))
             if verbose:
-                print("XML loaded in {}".format(end - start))
+                print("Index of {} descriptors built in {}".format(len(self._descs), datetime.now() - start))
+
+    def build_index(self, descriptors):
+        """
+        Rebuilds the indexes
+        :param descriptors: an iterable of descriptors (e.g. iterate_descriptors)
+        """
+        self._clear_index()
+        for desc in descriptors:
+            self.add_desc(desc)
 
     def get_all_descs(self) -> List[Descriptor]:
-        descs = []
-        records = self.tree.xpath(MESH_QUERY_DESCRIPTOR_RECORD)
-        for idx, record in enumerate(records):
-            desc = Descriptor.from_element(record)
-            descs.append(desc)
-        return descs
+        return list(self._descs)
 
     def add_desc(self, desc_obj):
         """
@@ -292,67 +416,83 @@ class MeSHDB:
 
         .. note::
 
-           The try-except was introduced because some descriptors (e.g., Female) don't have a tre number.
+           Some descriptors (e.g., Female) don't have a tree number.
 
         :param desc_obj: Descriptor object to add
         """
+        if desc_obj.unique_id not in self._desc_by_id:
+            self._descs.append(desc_obj)
         self._desc_by_id[desc_obj.unique_id] = desc_obj
         for tn in desc_obj.tree_numbers:
             self._desc_by_tree_number[tn] = desc_obj
+        self._sorted_tree_numbers = None
+        self._hierarchy = None
         self._desc_by_name[desc_obj.heading] = desc_obj
+        for term in {t.string.lower() for t in desc_obj.terms}:
+            descs = self._descs_by_term.setdefault(term, [])
+            if desc_obj not in descs:
+                descs.append(desc_obj)
+
+    def get_hierarchy(self) -> MeSHHierarchy:
+        """
+        Returns the hierarchy (adjacency, lineages and lowest common ancestors) of the loaded descriptors
+        The hierarchy is built once per load.
+        """
+        if self._hierarchy is None:
+            self._hierarchy = MeSHHierarchy(self._descs)
+        return self._hierarchy
 
     def desc_by_id(self, unique_id):
         if unique_id not in self._desc_by_id:
-            query = MESH_QUERY_DESCRIPTOR_BY_ID.format(unique_id)
-            desc_rec = self.tree.xpath(query)
-            if desc_rec:
-                desc = Descriptor.from_element(desc_rec[0])
-                self.add_desc(desc)
-            else:
-                raise ValueError("Descriptor {} not found.".format(unique_id))
+            raise ValueError("Descriptor {} not found.".format(unique_id))
         return self._desc_by_id[unique_id]
 
+    def descs_by_ids(self, unique_ids) -> List[Descriptor]:
+        """
+        Bulk lookup of descriptors
+        :param unique_ids: an iterable of descriptor ids
+        :return: a list of descriptors (in the order of the ids)
+        :raises: ValueError if a descriptor is unknown
+        """
+        return [self.desc_by_id(uid) for uid in unique_ids]
+
     def descs_under_tree_number(self, tree_number):
-        query = MESH_QUERY_DESCRIPTOR_IDS_BY_TREE_NUMBER.format(tree_number + ".")
-        records = self.tree.xpath(query)
-        ids = [record.text.strip() for record in records]
-        desc_list = [self.desc_by_id(uid) for uid in ids]
-        return sorted(desc_list)
+        if self._sorted_tree_numbers is None:
+            self._sorted_tree_numbers = sorted(self._desc_by_tree_number.keys())
+        tree_numbers = self._sorted_tree_numbers
+        prefix = tree_number + "."
+        descs = dict()
+        idx = bisect_left(tree_numbers, prefix)
+        while idx < len(tree_numbers) and tree_numbers[idx].startswith(prefix):
+            desc = self._desc_by_tree_number[tree_numbers[idx]]
+            descs[desc.unique_id] = desc
+            idx += 1
+        return sorted(descs.values())
 
     def desc_by_tree_number(self, tree_number):
         if tree_number not in self._desc_by_tree_number:
-            query = MESH_QUERY_DESCRIPTOR_BY_TREE_NUMBER.format(tree_number)
-            desc_rec = self.tree.xpath(query)
-            if desc_rec:
-                desc = Descriptor.from_element(desc_rec[0])
-                self.add_desc(desc)
-            else:
-                raise ValueError("Descriptor {} not found.".format(tree_number))
+            raise ValueError("Descriptor {} not found.".format(tree_number))
         return self._desc_by_tree_number[tree_number]
 
-    def descs_by_term(self, term):
-        query = MESH_QUERY_DESCRIPTOR_BY_TERM.format(term)
-        records = self.tree.xpath(query)
-        desc_list = [Descriptor.from_element(record) for record in records]
-        # Add to cache
-        for desc in desc_list:
-            if desc.unique_id not in self._desc_by_id:
-                self.add_desc(desc)
-        return desc_list
+    def descs_by_term(self, term, ignore_case=False):
+        """
+        Selects all descriptors that have a term with the given string
+        :param term: the term string
+        :param ignore_case: match the term case-insensitively
+        :return: a list of descriptors (in file order)
+        """
+        candidates = self._descs_by_term.get(term.lower(), [])
+        if ignore_case:
+            return list(candidates)
+        return [desc for desc in candidates if any(t.string == term for t in desc.terms)]
 
     def descs_by_name(self, name, match_exact=True, search_terms=True):
         if match_exact and name in self._desc_by_name:
             return [self._desc_by_name[name]]
         if match_exact:
-            query = MESH_QUERY_DESCRIPTOR_BY_HEADING_EXACT.format(name)
+            desc_list = []
         else:
-            query = MESH_QUERY_DESCRIPTOR_BY_HEADING_CONTAINS.format(name)
-        records = self.tree.xpath(query)
-        desc_list = [Descriptor.from_element(record) for record in records]
-        # Add to cache
-        for desc in desc_list:
-            if desc.unique_id not in self._desc_by_id:
-                self.add_desc(desc)
+            desc_list = [desc for desc in self._descs if name in desc.heading]
         # Search by terms
         if not desc_list and search_terms:
             desc_list = self.descs_by_term(name)
@@ -375,78 +515,18 @@ class MeSHDB:
         result.sort()
         return result
 
+    def extract_tree_json(self, categories) -> str:
+        """
+        Exports the hierarchy of MeSH categories as JSON (see narrant.mesh.export.tree_json)
+
+        :param categories: MeSH categories (e.g. C) or top-level tree numbers (e.g. C04)
+        :return: a JSON array with one nested node for each top-level tree number
+        """
+        from narrant.mesh.export.tree_json import build_tree_number_index, get_top_level_tree_numbers, \
+            iterate_tree_json
+        sorted_tree_numbers, tree_number2desc = build_tree_number_index(self._descs)
+        top_tree_numbers = get_top_level_tree_numbers(sorted_tree_numbers, categories)
+        return ''.join(iterate_tree_json(sorted_tree_numbers, tree_number2desc, top_tree_numbers))
+
     def extract_disease_json(self):
-        diseases = self.get_descs_starting_with('C')
-        diseases_string = ''
-        for x in diseases:
-            if x != diseases[0]:
-                diseases_string = diseases_string[:-1]
-                diseases_string += ', ' + self.build_string(self.desc_by_tree_number(x))[1:]
-            else:
-                diseases_string += self.build_string(self.desc_by_tree_number(x))
-        return diseases_string
-
-    def build_string(self, node):
-        par_tree = node.tree_numbers[0]
-        for t in node.tree_numbers[1:]:
-            par_tree += '; {}'.format(t)
-        par_tree_list = par_tree.split("; ")
-        par_tree_str = par_tree_list[0]
-        first_dots = par_tree_str.count('.')
-        if len(self.descs_under_tree_number(par_tree_str)) == 0:
-            result_string = '[{"name": "' + self.desc_by_tree_number(
-                par_tree_str).heading + '", "children": [{"name": "(MESH:' + self.desc_by_tree_number(
-                par_tree_str).unique_id + ')"}]}, '
-        else:
-            result_string = '[{"name": "' + self.desc_by_tree_number(
-                par_tree_str).heading + ' (MESH:' + self.desc_by_tree_number(
-                par_tree_str).unique_id + ')", "children": '
-        child_list = self.descs_under_tree_number(par_tree_str)
-        result = []
-        for e in child_list:
-            num = e.tree_numbers[0]
-            for t in e.tree_numbers[1:]:
-                num += ';{}'.format(t)
-            temp_list = num.split(";")
-            for x in temp_list:
-                if x not in result and x.startswith(par_tree_str):
-                    result.append(x)
-        result.sort()
-        last_leaf_branch = 1
-        check_dots = par_tree_str.count('.')
-        for element in result:
-            if len(self.descs_under_tree_number(element)) == 0:  # and element.count('.') >= check_dots:
-                if element.count('.') < check_dots:
-                    result_string = result_string[:len(result_string) - 2]
-                    for i in range(0, check_dots - element.count('.')):
-                        result_string += ']}'
-                    result_string += ', '
-                if last_leaf_branch == 1:
-                    result_string += '['
-                result_string += '{"name": "' + self.desc_by_tree_number(
-                    element).heading + '", "children": [{"name": "(MESH:' + self.desc_by_tree_number(
-                    element).unique_id + ')"}]}, '
-                last_leaf_branch = 0
-                check_dots = element.count('.')
-            else:
-                if last_leaf_branch == 0:
-                    result_string = result_string[:len(result_string) - 2]
-                    if element.count('.') < check_dots:
-                        for i in range(0, check_dots - element.count('.')):
-                            result_string += ']}'
-                    else:
-                        for i in range(0, element.count('.') - check_dots):
-                            result_string += ']}'
-                    result_string += ', '
-                    result_string += '{"name": "' + self.desc_by_tree_number(
-                        element).heading + ' (MESH:' + self.desc_by_tree_number(element).unique_id + ')", "children": '
-                else:
-                    result_string += '[{"name": "' + self.desc_by_tree_number(
-                        element).heading + ' (MESH:' + self.desc_by_tree_number(element).unique_id + ')", "children": '
-                last_leaf_branch = 1
-                check_dots = element.count('.')
-        result_string = result_string[:len(result_string) - 2]
-        result_string += ']'
-        for i in range(0, check_dots - first_dots):
-            result_string += '}]'
-        return result_string
+        return self.extract_tree_json(["C"])
@@ -0,0 +1,176 @@
+"""
+Differences between two MeSH releases
+
+Compares the descriptors (and supplementary records) of an old and a new MeSH release and reports
+added, deleted and renamed records as well as changed tree numbers and changed terms. The diff can be
+stored as JSON and is used to update the database, the MeSH resolver and the tagger indexes incrementally,
+i.e. only for the affected ids.
+"""
+import json
+import logging
+from argparse import ArgumentParser
+from typing import Dict, Set, Tuple
+
+from narrant.config import MESH_CACHE_DIR
+from narrant.mesh.cache import load_descriptors, load_supplementary_records
+
+
+class MeSHReleaseDiff:
+    """
+    Added, deleted and changed records between two MeSH releases (records are identified by their unique id)
+    """
+
+    def __init__(self):
+        # id -> name
+        self.added: Dict[str, str] = dict()
+        self.deleted: Dict[str, str] = dict()
+        # id -> (old name, new name)
+        self.renamed: Dict[str, Tuple[str, str]] = dict()
+        # id -> (old tree numbers, new tree numbers)
+        self.tree_numbers_changed: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = dict()
+        # id -> (added terms, removed terms)
+        self.terms_changed: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = dict()
+        # tree numbers of all added, deleted and changed descriptors (old and new release)
+        self.affected_tree_numbers: Set[str] = set()
+
+    def compare(self, old_records, new_records):
+        """
+        Adds the differences between two lists of records to this diff
+        :param old_records: records of the old release (cached records with unique_id, name, terms as strings and
+        optionally tree_numbers)
+        :param new_records: records of the new release
+        :return: None
+        """
+        old_by_id = {r.unique_id: r for r in old_records}
+        new_by_id = {r.unique_id: r for r in new_records}
+        for record_id, old in old_by_id.items():
+            old_tree_numbers = tuple(getattr(old, 'tree_numbers', ()))
+            if record_id not in new_by_id:
+                self.deleted[record_id] = old.name
+                self.affected_tree_numbers.update(old_tree_numbers)
+                continue
+            new = new_by_id[record_id]
+            new_tree_numbers = tuple(getattr(new, 'tree_numbers', ()))
+            changed = False
+            if old.name != new.name:
+                self.renamed[record_id] = (old.name, new.name)
+                changed = True
+            if sorted(old_tree_numbers) != sorted(new_tree_numbers):
+                self.tree_numbers_changed[record_id] = (old_tree_numbers, new_tree_numbers)
+                changed = True
+            old_terms, new_terms = set(old.terms), set(new.terms)
+            if old_terms != new_terms:
+                self.terms_changed[record_id] = (tuple(sorted(new_terms - old_terms)),
+                                                 tuple(sorted(old_terms - new_terms)))
+                changed = True
+            if changed:
+                self.affected_tree_numbers.update(old_tree_numbers)
+                self.affected_tree_numbers.update(new_tree_numbers)
+        for record_id, new in new_by_id.items():
+            if record_id not in old_by_id:
+                self.added[record_id] = new.name
+                self.affected_tree_numbers.update(getattr(new, 'tree_numbers', ()))
+
+    def affected_ids(self) -> Set[str]:
+        """
+        :return: the ids of all added, deleted and changed records
+        """
+        return set(self.added) | set(self.deleted) | set(self.renamed) | set(self.tree_numbers_changed) \
+               | set(self.terms_changed)
+
+    def is_empty(self) -> bool:
+        return len(self.affected_ids()) == 0
+
+    def affects_subtrees(self, subtrees) -> bool:
+        """
+        Checks whether a change touches a descriptor below one of the subtrees (old or new release)
+        :param subtrees: tree number prefixes (e.g. C04)
+        :return: True if an affected tree number starts with one of the subtrees
+        """
+        subtrees = tuple(subtrees)
+        return any(tn.startswith(subtrees) for tn in self.affected_tree_numbers)
+
+    def summary(self) -> str:
+        return f'{len(self.added)} added, {len(self.deleted)} deleted, {len(self.renamed)} renamed, ' \
+               f'{len(self.tree_numbers_changed)} with changed tree numbers, ' \
+               f'{len(self.terms_changed)} with changed terms'
+
+    def to_dict(self) -> dict:
+        return dict(added=self.added, deleted=self.deleted,
+                    renamed={k: list(v) for k, v in self.renamed.items()},
+                    tree_numbers_changed={k: [list(o), list(n)] for k, (o, n) in self.tree_numbers_changed.items()},
+                    terms_changed={k: [list(a), list(r)] for k, (a, r) in self.terms_changed.items()},
+                    affected_tree_numbers=sorted(self.affected_tree_numbers))
+
+    @staticmethod
+    def from_dict(data: dict):
+        mesh_diff = MeSHReleaseDiff()
+        mesh_diff.added = dict(data["added"])
+        mesh_diff.deleted = dict(data["deleted"])
+        mesh_diff.renamed = {k: tuple(v) for k, v in data["renamed"].items()}
+        mesh_diff.tree_numbers_changed = {k: (tuple(o), tuple(n)) for k, (o, n) in
+                                          data["tree_numbers_changed"].items()}
+        mesh_diff.terms_changed = {k: (tuple(a), tuple(r)) for k, (a, r) in data["terms_changed"].items()}
+        mesh_diff.affected_tree_numbers = set(data["affected_tree_numbers"])
+        return mesh_diff
+
+    def save(self, path: str):
+        with open(path, 'wt') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    @staticmethod
+    def load(path: str):
+        with open(path, 'rt') as f:
+            return MeSHReleaseDiff.from_dict(json.load(f))
+
+
+def diff_mesh_releases(old_descriptor_file: str, new_descriptor_file: str, old_supplementary_file: str = None,
+                       new_supplementary_file: str = None, workers: int = 1,
+                       cache_dir: str = MESH_CACHE_DIR) -> MeSHReleaseDiff:
+    """
+    Computes the differences between two MeSH releases (the files are read via the MeSH cache)
+    :param old_descriptor_file: MeSH descriptor file of the old release
+    :param new_descriptor_file: MeSH descriptor file of the new release
+    :param old_supplementary_file: MeSH supplementary file of the old release (optional)
+    :param new_supplementary_file: MeSH supplementary file of the new release (optional)
+    :param workers: number of worker processes to parse the MeSH files (if they are not cached yet)
+    :param cache_dir: directory of the MeSH cache files
+    :return: a MeSHReleaseDiff
+    """
+    mesh_diff = MeSHReleaseDiff()
+    logging.info(f'Comparing MeSH descriptors of {old_descriptor_file} and {new_descriptor_file}...')
+    mesh_diff.compare(load_descriptors(old_descriptor_file, cache_dir=cache_dir, workers=workers),
+                      load_descriptors(new_descriptor_file, cache_dir=cache_dir, workers=workers))
+    if old_supplementary_file and new_supplementary_file:
+        logging.info(f'Comparing MeSH supplementary records of {old_supplementary_file} and '
+                     f'{new_supplementary_file}...')
+        mesh_diff.compare(load_supplementary_records(old_supplementary_file, cache_dir=cache_dir,
+                                                     workers=workers),
+                          load_supplementary_records(new_supplementary_file, cache_dir=cache_dir,
+                                                     workers=workers))
+    logging.info(f'MeSH release diff: {mesh_diff.summary()}')
+    return mesh_diff
+
+
+def main():
+    parser = ArgumentParser(description="Computes the differences between two MeSH releases")
+    parser.add_argument("old", help="MeSH descriptor file of the old release")
+    parser.add_argument("new", help="MeSH descriptor file of the new release")
+    parser.add_argument("--old-supplementary", help="MeSH supplementary file of the old release")
+    parser.add_argument("--new-supplementary", help="MeSH supplementary file of the new release")
+    parser.add_argument("-o", "--output", required=True, help="Path of the diff (JSON)")
+    parser.add_argument("-w", "--workers", default=1, type=int, help="Number of worker processes to parse the XML")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        level=logging.INFO)
+
+    mesh_diff = diff_mesh_releases(args.old, args.new, args.old_supplementary, args.new_supplementary,
+                                   workers=args.workers)
+    mesh_diff.save(args.output)
+    logging.info(f'Diff written to {args.output}')
+
+
+if __name__ == "__main__":
+    main()
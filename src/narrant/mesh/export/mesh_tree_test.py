@@ -1,14 +1,12 @@
 from narrant.config import MESH_DESCRIPTORS_FILE
-from narrant.mesh.data import MeSHDB
+from narrant.mesh.cache import load_descriptors
+from narrant.mesh.export.tree_json import export_tree_json
 
 
 def main():
-    db = MeSHDB()
-    db.load_xml(MESH_DESCRIPTORS_FILE)
-    disease_str = db.extract_disease_json()
-    print(disease_str)
-    with open('mesh_disease_tree.json', 'w') as f:
-        f.write(disease_str)
+    export_tree_json(load_descriptors(MESH_DESCRIPTORS_FILE), ["C"], 'mesh_disease_tree.json')
+    with open('mesh_disease_tree.json', 'rt') as f:
+        print(f.read())
 
 
 if __name__ == "__main__":
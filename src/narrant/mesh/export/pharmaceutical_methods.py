@@ -1,7 +1,7 @@
 import logging
 
 from narrant.config import MESH_DESCRIPTORS_FILE
-from narrant.mesh.data import MeSHDB
+from narrant.mesh.cache import load_descriptors
 
 METHODS_QUALIFIER = 'Q000379'
 PM_TREE_NUMBERS_TO_KEEP = ['E']
@@ -13,13 +13,10 @@ def main():
                         level=logging.INFO)
 
     logging.info('load mesh file...')
-    meshdb: MeSHDB = MeSHDB()
-    meshdb.load_xml(MESH_DESCRIPTORS_FILE)
-
     logging.info('beginning export of descriptors...')
     with open('pharmaceutical_methods_2021.tsv', 'w') as f:
         f.write('MeSH Descriptor\tHeading\tMeSH Tree\tTerms\n')
-        for d in meshdb.get_all_descs():
+        for d in load_descriptors(MESH_DESCRIPTORS_FILE):
             has_correct_tree = False
             for tn in d.tree_numbers:
                 if tn.startswith('E'):
@@ -29,9 +26,7 @@ def main():
             if not has_correct_tree:
                 continue
             # get all synonyms
-            term_str = d.terms[0].string
-            for t in d.terms[1:]:
-                term_str += '; {}'.format(t.string)
+            term_str = '; '.join(d.terms)
 
             tree_str = None
             for t in d.tree_numbers:
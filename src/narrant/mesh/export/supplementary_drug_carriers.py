@@ -1,20 +1,23 @@
 import logging
+from argparse import ArgumentParser
 
 from narrant.config import MESH_SUPPLEMENTARY_FILE
-from narrant.mesh.supplementary import MeSHDBSupplementary
+from narrant.mesh.cache import load_supplementary_records
 
 
 def main():
+    parser = ArgumentParser(description="Exports MeSH supplementary drug carrier records")
+    parser.add_argument("-w", "--workers", default=1, type=int,
+                        help="Number of worker processes to parse the MeSH files")
+    args = parser.parse_args()
+
     logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
                         datefmt='%Y-%m-%d:%H:%M:%S',
                         level=logging.INFO)
 
     logging.info('load MeSH Supplementary file...')
-    meshdb: MeSHDBSupplementary = MeSHDBSupplementary()
-    meshdb.load_xml(MESH_SUPPLEMENTARY_FILE)
-
     relevant_records = []
-    for record in meshdb.get_all_records():
+    for record in load_supplementary_records(MESH_SUPPLEMENTARY_FILE, workers=args.workers):
         if record.note and 'drug carrier' in record.note.lower():
             relevant_records.append(record)
 
@@ -23,9 +26,7 @@ def main():
         f.write('MeSH Record\tHeading\tTerms\n')
         for d in relevant_records:
             # get all synonyms
-            term_str = d.terms[0].string
-            for t in d.terms[1:]:
-                term_str += '; {}'.format(t.string)
+            term_str = '; '.join(d.terms)
 
             f.write('{}\t{}\t{}\n'.format(d.unique_id, d.name, term_str))
 
@@ -0,0 +1,119 @@
+"""
+Hierarchical JSON export of MeSH trees
+
+The nested hierarchy below a set of top-level tree numbers is written in a single pass over the sorted
+tree numbers. Descendants of a tree number form a contiguous range in lexicographic order, so each node is
+opened when it is visited and closed as soon as the next tree number leaves its subtree.
+
+Format (one entry per tree number):
+- inner node: {"name": "<heading> (MESH:<descriptor id>)", "children": [...]}
+- leaf node: {"name": "<heading>", "children": [{"name": "(MESH:<descriptor id>)"}]}
+"""
+import json
+import logging
+from argparse import ArgumentParser
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Tuple
+
+from narrant.config import MESH_DESCRIPTORS_FILE
+from narrant.mesh.cache import load_descriptors
+
+
+def build_tree_number_index(descriptors) -> Tuple[List[str], Dict[str, Tuple[str, str]]]:
+    """
+    Builds the sorted tree-number index of a list of descriptors
+    :param descriptors: an iterable of descriptors (objects with unique_id, heading and tree_numbers)
+    :return: the sorted tree numbers and a dictionary tree number -> (heading, descriptor id)
+    """
+    tree_number2desc = dict()
+    for desc in descriptors:
+        for tn in desc.tree_numbers:
+            tree_number2desc[tn] = (desc.heading, desc.unique_id)
+    return sorted(tree_number2desc.keys()), tree_number2desc
+
+
+def get_top_level_tree_numbers(sorted_tree_numbers: List[str], categories: List[str]) -> List[str]:
+    """
+    :param sorted_tree_numbers: sorted tree numbers
+    :param categories: MeSH categories (e.g. C) or tree number prefixes (e.g. C04)
+    :return: the sorted top-level tree numbers (without a dot) that start with one of the categories
+    """
+    return [tn for tn in sorted_tree_numbers if '.' not in tn and any(tn.startswith(c) for c in categories)]
+
+
+def iterate_tree_json(sorted_tree_numbers: List[str], tree_number2desc: Dict[str, Tuple[str, str]],
+                      top_tree_numbers: List[str]) -> Iterator[str]:
+    """
+    Streams the JSON hierarchy below a set of tree numbers
+    :param sorted_tree_numbers: all tree numbers (sorted)
+    :param tree_number2desc: tree number -> (heading, descriptor id)
+    :param top_tree_numbers: tree numbers of the top-level nodes (each one is exported with its subtree)
+    :return: an iterator over JSON text chunks (a JSON array of the top-level nodes)
+    """
+    yield '['
+    for top_idx, top_tn in enumerate(top_tree_numbers):
+        if top_idx > 0:
+            yield ', '
+        idx = bisect_left(sorted_tree_numbers, top_tn)
+        # stack of open nodes: (tree number, has emitted a child)
+        stack = []
+        while idx < len(sorted_tree_numbers):
+            tn = sorted_tree_numbers[idx]
+            if tn != top_tn and not tn.startswith(top_tn + '.'):
+                break
+            idx += 1
+            while stack and not tn.startswith(stack[-1][0] + '.'):
+                stack.pop()
+                yield ']}'
+            if stack:
+                if stack[-1][1]:
+                    yield ', '
+                stack[-1] = (stack[-1][0], True)
+            heading, descriptor_id = tree_number2desc[tn]
+            has_children = idx < len(sorted_tree_numbers) and sorted_tree_numbers[idx].startswith(tn + '.')
+            if has_children:
+                yield '{{"name": {}, "children": ['.format(json.dumps(f'{heading} (MESH:{descriptor_id})'))
+                stack.append((tn, False))
+            else:
+                yield '{{"name": {}, "children": [{{"name": {}}}]}}'.format(json.dumps(heading),
+                                                                            json.dumps(f'(MESH:{descriptor_id})'))
+        while stack:
+            stack.pop()
+            yield ']}'
+    yield ']'
+
+
+def export_tree_json(descriptors, categories: List[str], output_file: str):
+    """
+    Writes the JSON hierarchy of MeSH categories into a file
+    :param descriptors: an iterable of descriptors (objects with unique_id, heading and tree_numbers)
+    :param categories: MeSH categories (e.g. C) or top-level tree numbers (e.g. C04)
+    :param output_file: path of the JSON file
+    :return: None
+    """
+    sorted_tree_numbers, tree_number2desc = build_tree_number_index(descriptors)
+    top_tree_numbers = get_top_level_tree_numbers(sorted_tree_numbers, categories)
+    logging.info(f'Exporting {len(top_tree_numbers)} MeSH trees to {output_file}...')
+    with open(output_file, 'wt') as f:
+        for chunk in iterate_tree_json(sorted_tree_numbers, tree_number2desc, top_tree_numbers):
+            f.write(chunk)
+
+
+def main():
+    parser = ArgumentParser(description="Exports MeSH trees as hierarchical JSON")
+    parser.add_argument("output", help="Path of the JSON file")
+    parser.add_argument("-c", "--categories", nargs="+", default=["C"],
+                        help="MeSH categories or top-level tree numbers to export (default: C)")
+    parser.add_argument("-i", "--input", default=MESH_DESCRIPTORS_FILE, help="MeSH descriptor file")
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s,%(msecs)d %(levelname)-8s [%(filename)s:%(lineno)d] %(message)s',
+                        datefmt='%Y-%m-%d:%H:%M:%S',
+                        level=logging.INFO)
+
+    export_tree_json(load_descriptors(args.input), args.categories, args.output)
+    logging.info('export finished')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Precomputed MeSH hierarchy
+
+The hierarchy is built once from a list of descriptors (Descriptor or cached descriptor records).
+It provides parent and child adjacency by tree number and by descriptor, memoized lineages and
+lowest-common-ancestor (LCA) queries. LCA queries are answered in constant time by a range minimum
+query over the Euler tour of the tree-number forest.
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+ROOT = ""
+
+
+def parent_tree_number(tree_number: str) -> Optional[str]:
+    """
+    :param tree_number: a MeSH tree number (e.g. C04.557.470)
+    :return: the tree number of the parent (e.g. C04.557) or None for top-level tree numbers
+    """
+    idx = tree_number.rfind('.')
+    if idx < 0:
+        return None
+    return tree_number[:idx]
+
+
+class MeSHHierarchy:
+    """
+    Parent/child adjacency, lineages and lowest common ancestors of the MeSH tree
+    """
+
+    def __init__(self, descriptors):
+        """
+        :param descriptors: an iterable of descriptors (objects with unique_id and tree_numbers)
+        """
+        self.tree_number_to_descriptor: Dict[str, str] = dict()
+        self.descriptor_to_tree_numbers: Dict[str, List[str]] = dict()
+        for desc in descriptors:
+            self.descriptor_to_tree_numbers[desc.unique_id] = list(desc.tree_numbers)
+            for tn in desc.tree_numbers:
+                self.tree_number_to_descriptor[tn] = desc.unique_id
+
+        self.tree_number_children: Dict[str, List[str]] = {ROOT: []}
+        for tn in sorted(self.tree_number_to_descriptor.keys()):
+            parent = parent_tree_number(tn)
+            if parent is None or parent not in self.tree_number_to_descriptor:
+                parent = ROOT
+            self.tree_number_children.setdefault(parent, []).append(tn)
+
+        self.descriptor_parents: Dict[str, List[str]] = dict()
+        self.descriptor_children: Dict[str, List[str]] = dict()
+        # descriptor id -> parent tree numbers without a descriptor (parents and lineages cannot be computed)
+        self.missing_parent_tree_numbers: Dict[str, List[str]] = dict()
+        for descriptor_id, tree_numbers in self.descriptor_to_tree_numbers.items():
+            parents = []
+            for tn in tree_numbers:
+                parent = parent_tree_number(tn)
+                if parent is None:
+                    continue
+                if parent in self.tree_number_to_descriptor:
+                    parents.append(self.tree_number_to_descriptor[parent])
+                else:
+                    self.missing_parent_tree_numbers.setdefault(descriptor_id, []).append(parent)
+            self.descriptor_parents[descriptor_id] = parents
+            for parent in parents:
+                children = self.descriptor_children.setdefault(parent, [])
+                if descriptor_id not in children:
+                    children.append(descriptor_id)
+        for children in self.descriptor_children.values():
+            children.sort()
+
+        self._lineages: Dict[str, List[Tuple[str, ...]]] = dict()
+        self._build_euler_tour()
+
+    def _build_euler_tour(self):
+        """
+        Computes the Euler tour of the tree-number forest (below a virtual root) and a sparse table over the
+        depths of the tour for constant-time range minimum queries
+        """
+        self._node_tree_numbers = [ROOT]
+        node_ids = {ROOT: 0}
+        euler, depths = [], []
+        self._first_visit = dict()
+        stack = [(ROOT, 0, iter(self.tree_number_children.get(ROOT, [])))]
+        euler.append(0)
+        depths.append(0)
+        self._first_visit[ROOT] = 0
+        while stack:
+            tn, depth, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                if stack:
+                    euler.append(node_ids[stack[-1][0]])
+                    depths.append(stack[-1][1])
+                continue
+            node_ids[child] = len(self._node_tree_numbers)
+            self._node_tree_numbers.append(child)
+            self._first_visit[child] = len(euler)
+            euler.append(node_ids[child])
+            depths.append(depth + 1)
+            stack.append((child, depth + 1, iter(self.tree_number_children.get(child, []))))
+
+        self._euler = np.array(euler, dtype=np.int32)
+        self._euler_depths = np.array(depths, dtype=np.int32)
+        # sparse table: level k stores the position of the minimum depth in [i, i + 2^k)
+        levels = [np.arange(len(euler), dtype=np.int32)]
+        length = 1
+        while 2 * length <= len(euler):
+            prev = levels[-1]
+            left, right = prev[:-length], prev[length:]
+            levels.append(np.where(self._euler_depths[left] <= self._euler_depths[right], left, right))
+            length *= 2
+        self._sparse_table = levels
+
+    def _range_min_position(self, i: int, j: int) -> int:
+        if i > j:
+            i, j = j, i
+        level = (j - i + 1).bit_length() - 1
+        left = self._sparse_table[level][i]
+        right = self._sparse_table[level][j - (1 << level) + 1]
+        return int(left) if self._euler_depths[left] <= self._euler_depths[right] else int(right)
+
+    def depth(self, tree_number: str) -> int:
+        """
+        :param tree_number: a MeSH tree number
+        :return: the depth of the tree number (top-level tree numbers have depth 1)
+        """
+        return tree_number.count('.') + 1
+
+    def parent_tree_number(self, tree_number: str) -> Optional[str]:
+        parent = parent_tree_number(tree_number)
+        return parent if parent in self.tree_number_to_descriptor else None
+
+    def child_tree_numbers(self, tree_number: str) -> List[str]:
+        return list(self.tree_number_children.get(tree_number, []))
+
+    def _check_parents(self, descriptor_id: str):
+        if descriptor_id in self.missing_parent_tree_numbers:
+            raise ValueError("Descriptor {} not found.".format(self.missing_parent_tree_numbers[descriptor_id][0]))
+
+    def parents(self, descriptor_id: str) -> List[str]:
+        """
+        :param descriptor_id: a descriptor id
+        :return: the parent descriptor ids (one for each tree number that has a parent)
+        :raises ValueError: if a parent tree number of the descriptor has no descriptor
+        """
+        self._check_parents(descriptor_id)
+        return list(self.descriptor_parents[descriptor_id])
+
+    def children(self, descriptor_id: str) -> List[str]:
+        """
+        :param descriptor_id: a descriptor id
+        :return: the sorted ids of the direct child descriptors
+        """
+        return list(self.descriptor_children.get(descriptor_id, []))
+
+    def lineages(self, descriptor_id: str) -> List[Tuple[str, ...]]:
+        """
+        Computes all lineages (paths from a top-level descriptor to the descriptor) - results are memoized
+        :param descriptor_id: a descriptor id
+        :return: a list of tuples of descriptor ids (each ends with the descriptor itself)
+        :raises ValueError: if a parent tree number of the descriptor or of an ancestor has no descriptor
+        """
+        if descriptor_id in self._lineages:
+            return self._lineages[descriptor_id]
+        # iterative post-order computation to avoid deep recursion
+        stack = [descriptor_id]
+        while stack:
+            current = stack[-1]
+            self._check_parents(current)
+            missing = [p for p in self.descriptor_parents[current] if p not in self._lineages]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            if current in self._lineages:
+                continue
+            parent_lineages = [lineage for p in self.descriptor_parents[current] for lineage in self._lineages[p]]
+            if parent_lineages:
+                self._lineages[current] = [lineage + (current,) for lineage in parent_lineages]
+            else:
+                self._lineages[current] = [(current,)]
+        return self._lineages[descriptor_id]
+
+    def common_lineages(self, descriptor_id: str, other_id: str) -> List[List[str]]:
+        """
+        Computes the common prefixes of all pairs of lineages of two descriptors
+        :return: a list of non-empty common lineages
+        """
+        common = [[x for x, y in zip(l1, l2) if x == y] for l1 in self.lineages(descriptor_id)
+                  for l2 in self.lineages(other_id)]
+        return [x for x in common if x]
+
+    def lowest_common_ancestor_tree_number(self, tree_number: str, other: str) -> Optional[str]:
+        """
+        Computes the lowest common ancestor of two tree numbers in constant time
+        :return: the tree number of the lowest common ancestor or None if the tree numbers have no common ancestor
+        """
+        position = self._range_min_position(self._first_visit[tree_number], self._first_visit[other])
+        lca = self._node_tree_numbers[self._euler[position]]
+        return lca if lca != ROOT else None
+
+    def lowest_common_ancestor(self, descriptor_id: str, other_id: str) -> Optional[str]:
+        """
+        Computes the deepest common ancestor of two descriptors over all pairs of their tree numbers
+        A descriptor is an ancestor of itself.
+        :return: the descriptor id of the lowest common ancestor or None if there is none
+        """
+        best_tn, best_depth = None, 0
+        for tn in self.descriptor_to_tree_numbers[descriptor_id]:
+            for other_tn in self.descriptor_to_tree_numbers[other_id]:
+                lca = self.lowest_common_ancestor_tree_number(tn, other_tn)
+                if lca is not None:
+                    depth = self.depth(lca)
+                    if depth > best_depth or (depth == best_depth and lca < best_tn):
+                        best_tn, best_depth = lca, depth
+        if best_tn is None:
+            return None
+        return self.tree_number_to_descriptor[best_tn]
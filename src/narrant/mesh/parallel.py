@@ -0,0 +1,80 @@
+"""
+Process-parallel parsing of large MeSH XML files
+
+The file is split into byte ranges that start at a record element. Each worker reads its range,
+wraps it into the root element, parses the records and returns them. The results of the ranges
+are merged in file order. The size of a range is bounded, because each range is parsed into a
+complete lxml tree. Without additional workers, the file is streamed instead (see iterparse_records).
+"""
+import logging
+import multiprocessing
+import os
+from datetime import datetime
+
+from lxml import etree
+
+from narrant.mesh.data import MESH_TAG_DESCRIPTOR_RECORD, Descriptor, iterparse_records
+from narrant.util.xmlranges import MIN_RANGE_SIZE, MAX_RANGE_SIZE, compute_record_ranges, get_number_of_ranges
+
+
+def _parse_range(arguments):
+    filename, start, end, tag, record_class, fields, convert_function = arguments
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        content = f.read(end - start)
+    root = etree.fromstring(b'<RecordSet>' + content + b'</RecordSet>')
+    results = []
+    for element in root.iterchildren(tag=tag):
+        if fields is None:
+            record = record_class.from_element(element)
+        else:
+            record = record_class.from_element_with_fields(element, fields)
+        results.append(convert_function(record) if convert_function else record)
+    return results
+
+
+def parse_records_parallel(filename: str, tag: str, record_class, workers: int = 1, fields=None,
+                           convert_function=None, min_range_size: int = MIN_RANGE_SIZE,
+                           max_range_size: int = MAX_RANGE_SIZE) -> list:
+    """
+    Parses all records of a MeSH XML file with a process pool (with a single worker, the file is streamed)
+    :param filename: path to the XML file
+    :param tag: tag of the record elements
+    :param record_class: BaseNode class which is created for each record
+    :param workers: number of worker processes
+    :param fields: only parse these fields of each record (None = all fields)
+    :param convert_function: a module-level function which converts each record in the worker (or None)
+    :param min_range_size: minimum number of bytes per range
+    :param max_range_size: maximum number of bytes per range
+    :return: a list of records (in file order)
+    """
+    start_time = datetime.now()
+    records = []
+    if workers <= 1:
+        logging.info(f'Streaming {filename}...')
+        for record in iterparse_records(filename, tag, record_class, fields=fields):
+            records.append(convert_function(record) if convert_function else record)
+    else:
+        no_ranges = get_number_of_ranges(os.path.getsize(filename), workers, min_range_size=min_range_size,
+                                         max_range_size=max_range_size)
+        ranges = compute_record_ranges(filename, tag, no_ranges)
+        tasks = [(filename, start, end, tag, record_class, fields, convert_function) for start, end in ranges]
+        logging.info(f'Parsing {filename} in {len(tasks)} ranges ({workers} workers)...')
+        with multiprocessing.Pool(min(workers, max(1, len(tasks)))) as pool:
+            for range_records in pool.imap(_parse_range, tasks):
+                records.extend(range_records)
+    logging.info(f'{len(records)} records parsed in {datetime.now() - start_time}s')
+    return records
+
+
+def parse_descriptors_parallel(filename: str, workers: int = 1, fields=None, convert_function=None) -> list:
+    """
+    Parses all descriptors of a MeSH descriptor file (desc.xml) with a process pool
+    :param filename: path to the MeSH descriptor file
+    :param workers: number of worker processes
+    :param fields: only parse these fields (None = all fields)
+    :param convert_function: a module-level function which converts each descriptor in the worker (or None)
+    :return: a list of descriptors (in file order)
+    """
+    return parse_records_parallel(filename, MESH_TAG_DESCRIPTOR_RECORD, Descriptor, workers=workers, fields=fields,
+                                  convert_function=convert_function)
@@ -1,13 +1,15 @@
 import itertools
 from datetime import datetime
-from typing import List
+from typing import Iterator, List
 
 from lxml import etree
 
-from narrant.mesh.data import BaseNode, Concept, Term
+from narrant.mesh.data import BaseNode, Concept, Term, iterparse_records
+from narrant.mesh.parallel import parse_records_parallel
 from narrant.mesh.utils import get_text, get_datetime, get_list
 
 MESH_SUPP_QUERY_DESCRIPTOR_RECORD = "/SupplementalRecordSet/SupplementalRecord"
+MESH_SUPP_TAG_RECORD = "SupplementalRecord"
 MESH_SUPP_QUERY_DESCRIPTOR_BY_ID = "/SupplementalRecordSet/SupplementalRecord/SupplementalRecordUI[text()='{}']/parent::*"
 
 MESH_SUPP_QUERY_DESCRIPTOR_BY_HEADING_CONTAINS = "/SupplementalRecordSet/SupplementalRecord/SupplementalRecordName" \
@@ -24,6 +26,11 @@ class SupplementaryRecordMappedTo(BaseNode):
         _unique_id=(get_text, "DescriptorReferredTo/DescriptorUI", True),
 
     )
+    _field_aliases = dict(
+        name="_name",
+        unique_id="_unique_id",
+    )
+    __slots__ = tuple(_attrs.keys())
 
     @property
     def name(self):
@@ -51,6 +58,14 @@ class SupplementaryRecord(BaseNode):
         _unique_id=(get_text, "SupplementalRecordUI", True),
         term_list=(get_list, "TermList", Term.from_element, True),
     )
+    _field_aliases = dict(
+        name="_name",
+        unique_id="_unique_id",
+        note="_note",
+        terms="concept_list.term_list._string",
+        headings_mapped_to="_heading_mapped_to._unique_id",
+    )
+    __slots__ = tuple(_attrs.keys()) + ("_terms",)
 
     @property
     def name(self):
@@ -86,6 +101,32 @@ class SupplementaryRecord(BaseNode):
         return "<SupplementaryRecord {} ({})>".format(self.name, self.unique_id)
 
 
+def iterate_supplementary_records(filename, fields=None) -> Iterator[SupplementaryRecord]:
+    """
+    Streams all records of a MeSH supplementary file (supp.xml)
+
+    :param filename: Path to the MeSH supplementary file
+    :param fields: only parse these fields, e.g. ["unique_id", "name"] (None = all fields)
+    :return: an iterator over SupplementaryRecord objects (in file order)
+    """
+    return iterparse_records(filename, MESH_SUPP_TAG_RECORD, SupplementaryRecord, fields=fields)
+
+
+def parse_supplementary_records_parallel(filename, workers: int = 1, fields=None,
+                                         convert_function=None) -> List[SupplementaryRecord]:
+    """
+    Parses all records of a MeSH supplementary file (supp.xml) with a process pool
+
+    :param filename: Path to the MeSH supplementary file
+    :param workers: number of worker processes
+    :param fields: only parse these fields (None = all fields)
+    :param convert_function: a module-level function which converts each record in the worker (or None)
+    :return: a list of SupplementaryRecord objects (or converted records) in file order
+    """
+    return parse_records_parallel(filename, MESH_SUPP_TAG_RECORD, SupplementaryRecord, workers=workers,
+                                  fields=fields, convert_function=convert_function)
+
+
 class MeSHDBSupplementary:
     """
     Class is a Singleton for the MeSH Supplementary database.
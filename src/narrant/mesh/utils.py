@@ -1,4 +1,5 @@
 import datetime
+import sys
 
 from lxml import etree
 
@@ -80,3 +81,139 @@ def get_element_text(element, is_required=False):
     :return: text of element
     """
     return element.text
+
+
+class FieldParser:
+    """
+    Extracts all fields of a record in a single pass over its children.
+
+    The field specification of a BaseNode (``_attrs``) is compiled once: each field is assigned to the tag of
+    the child element it is read from, so parsing a record walks its children once and dispatches them by tag
+    instead of evaluating one XPath query per field. The results are the same as calling the field functions
+    (get_text, get_list, get_datetime, get_attr) on the record.
+    """
+
+    def __init__(self, attrs: dict, fields=None):
+        """
+        :param attrs: field specification of a BaseNode (key -> (func, *args))
+        :param fields: only extract these fields (None = all fields). Fields of list items are selected with
+                       dotted paths, e.g. "term_list._string" selects the string of each term of a term list
+        :raises ValueError: if a selected field is not part of the specification
+        """
+        self.attributes = []
+        self.handlers = dict()
+        self.defaults = []
+        self.fallbacks = []
+        selection = FieldParser._split_fields(attrs, fields)
+        for key, (func, *args) in attrs.items():
+            if selection is not None:
+                if key not in selection:
+                    continue
+                if func is get_list:
+                    args = [args[0], FieldParser._select_item_func(args[1], selection[key])] + args[2:]
+            if func is get_attr:
+                self.attributes.append((key, args[0]))
+                continue
+            if func not in (get_text, get_list, get_datetime):
+                # unknown field function: evaluate it on the whole record
+                self.fallbacks.append((key, func, args))
+                continue
+            tag, _, path = args[0].partition('/')
+            self.handlers.setdefault(tag, []).append((key, func, path, args[1:]))
+            self.defaults.append((key, func, args))
+
+    @staticmethod
+    def _split_fields(attrs: dict, fields):
+        """
+        Splits the selected fields into the top-level keys and the fields selected for their list items
+        :return: a dictionary (key -> set of item fields) or None if all fields are selected
+        """
+        if fields is None:
+            return None
+        selection = dict()
+        for field in fields:
+            key, _, item_field = field.partition('.')
+            if key not in attrs:
+                raise ValueError(f'Unknown field: {key} (available: {", ".join(attrs.keys())})')
+            item_fields = selection.setdefault(key, set())
+            if item_field:
+                item_fields.add(item_field)
+        return selection
+
+    @staticmethod
+    def _select_item_func(item_func, item_fields: set):
+        """
+        Restricts the parsing of list items to the selected item fields
+        """
+        item_class = getattr(item_func, "__self__", None)
+        if not item_fields or not hasattr(item_class, "from_element_with_fields"):
+            return item_func
+        item_fields = tuple(sorted(item_fields))
+        return lambda element, *args: item_class.from_element_with_fields(element, item_fields)
+
+    @staticmethod
+    def _extract(func, element, path, args):
+        """
+        Extracts a field from a child element
+        :return: the value or None if the child does not contain the field
+        """
+        if func is get_text:
+            if path:
+                element = element.find(path)
+                if element is None:
+                    return None
+            return element.text.strip() if element.text is not None else None
+        if func is get_datetime:
+            year, month, day = element.findtext("Year"), element.findtext("Month"), element.findtext("Day")
+            if year is None or month is None or day is None:
+                return None
+            return datetime.datetime(year=int(year), month=int(month), day=int(day))
+        # get_list
+        if path:
+            element = element.find(path)
+            if element is None:
+                return []
+        item_func = args[0]
+        children_required = args[1] if len(args) > 1 else False
+        if item_func is get_element_text:
+            # list entries such as tree numbers and thesaurus ids repeat a lot
+            return [sys.intern(x.text) if x.text is not None else None
+                    for x in element.iterchildren(tag=etree.Element)]
+        return [item_func(x, children_required) for x in element.iterchildren(tag=etree.Element)]
+
+    def parse(self, record) -> dict:
+        """
+        Parses the fields of a record
+        :param record: the record element
+        :return: a dictionary of field values (key -> value)
+        """
+        values = dict()
+        for key, name in self.attributes:
+            value = record.get(name)
+            # attribute values (Y/N flags, lexical tags, ...) are shared by many records
+            values[key] = sys.intern(value) if value is not None else None
+        handlers = self.handlers
+        for child in record.iterchildren(tag=etree.Element):
+            child_handlers = handlers.get(child.tag)
+            if not child_handlers:
+                continue
+            for key, func, path, args in child_handlers:
+                if func is get_list:
+                    # get_list selects the children of all matching elements
+                    values.setdefault(key, []).extend(self._extract(func, child, path, args))
+                elif key not in values:
+                    value = self._extract(func, child, path, args)
+                    if value is not None:
+                        values[key] = value
+        for key, func, args in self.defaults:
+            if key not in values:
+                if func is get_list:
+                    values[key] = []
+                elif len(args) > 1 and args[1]:
+                    # missing required field: the field function raises the error
+                    values[key] = func(record, *args)
+                else:
+                    values[key] = "" if func is get_text else None
+        for key, func, args in self.fallbacks:
+            values[key] = func(record, *args)
+        return values
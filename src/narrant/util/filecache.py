@@ -0,0 +1,88 @@
+"""
+Helpers of the file-based caches (MeSH record cache, vocabulary cache, index build fingerprints)
+
+A cache file consists of two pickles: a header (a dictionary with the format version and a description of the
+cached content) and the payload. Cache files are written to a temporary file first, so a reader never sees a
+partially written file.
+"""
+import glob
+import hashlib
+import logging
+import os
+import pickle
+
+# (path, size, modification time) -> md5 checksum
+_checksums = {}
+
+
+def file_checksum(path: str) -> str:
+    """
+    Computes the md5 checksum of a file (memoized as long as the size and modification time do not change)
+    :param path: path to the file
+    :return: the hex digest
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _checksums:
+        hash_md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hash_md5.update(chunk)
+        _checksums[key] = hash_md5.hexdigest()
+    return _checksums[key]
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    Fingerprint of an input file (name, size and modification time) - cheaper than a checksum
+    :param path: path to the file
+    :return: a fingerprint string (or 'missing' if the file does not exist)
+    """
+    if not os.path.isfile(path):
+        return "missing"
+    stat = os.stat(path)
+    return f'{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+def read_cache_file(path: str, format_version: int):
+    """
+    Reads the payload of a cache file
+    :param path: path to the cache file
+    :param format_version: the expected format version of the header
+    :return: the payload or None if the file is missing, has another format version or cannot be read
+    """
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            header = pickle.load(f)
+            if header.get("format_version") != format_version:
+                logging.warning(f'Ignore cache {path}: format version {header.get("format_version")} '
+                                f'does not match {format_version}')
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError) as e:
+        logging.warning(f'Ignore cache {path}: cannot be read ({e})')
+        return None
+
+
+def write_cache_file(path: str, format_version: int, header: dict, payload, stale_pattern: str = None):
+    """
+    Writes a cache file (to a temporary file first) and removes outdated cache files
+    :param path: path to the cache file
+    :param format_version: the format version which is stored in the header
+    :param header: further information about the cached content (stored in the header)
+    :param payload: the cached object
+    :param stale_pattern: a glob pattern of outdated cache files which are removed (the new file is kept)
+    :return: None
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(dict(header, format_version=format_version), f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    if stale_pattern:
+        for stale_path in glob.glob(stale_pattern):
+            if stale_path != path:
+                os.remove(stale_path)
@@ -0,0 +1,95 @@
+"""
+Splits large XML files into byte ranges of complete record elements
+
+Each range starts at a record element, so the records of a range can be parsed independently of the other
+ranges (e.g. by the workers of a process pool).
+"""
+import os
+import re
+
+MIN_RANGE_SIZE = 4 * 1024 * 1024
+# bounds the memory of the lxml tree of a single range
+MAX_RANGE_SIZE = 16 * 1024 * 1024
+RANGES_PER_WORKER = 4
+SEARCH_WINDOW = 1024 * 1024
+
+
+def _find_tag(f, pattern, offset: int) -> int:
+    """
+    Finds the next occurrence of a tag pattern at or after an offset
+    :return: the offset of the match or None if the pattern does not occur anymore
+    """
+    overlap = 64
+    while True:
+        f.seek(offset)
+        window = f.read(SEARCH_WINDOW)
+        if not window:
+            return None
+        match = pattern.search(window)
+        if match:
+            return offset + match.start()
+        if len(window) < SEARCH_WINDOW:
+            return None
+        offset += SEARCH_WINDOW - overlap
+
+
+def _compute_range_starts(f, record_pattern, first: int, end: int, no_ranges: int) -> [int]:
+    starts = [first]
+    for idx in range(1, no_ranges):
+        start = _find_tag(f, record_pattern, first + idx * (end - first) // no_ranges)
+        if start is not None and starts[-1] < start < end:
+            starts.append(start)
+    return starts
+
+
+def get_number_of_ranges(file_size: int, workers: int, min_range_size: int = MIN_RANGE_SIZE,
+                         max_range_size: int = MAX_RANGE_SIZE) -> int:
+    """
+    Computes the number of ranges of a file: RANGES_PER_WORKER ranges per worker as long as the ranges have at
+    least min_range_size bytes, but always enough ranges to keep each range below max_range_size bytes
+    :param file_size: size of the file in bytes
+    :param workers: number of worker processes
+    :param min_range_size: minimum number of bytes per range
+    :param max_range_size: maximum number of bytes per range
+    :return: the number of ranges
+    """
+    no_ranges = min(workers * RANGES_PER_WORKER, file_size // max(1, min_range_size))
+    return max(1, no_ranges, -(-file_size // max(1, max_range_size)))
+
+
+def compute_record_ranges(filename: str, tag: str, no_ranges: int, list_tag: str = None) -> [(int, int)]:
+    """
+    Splits an XML file into byte ranges which contain complete records only
+    :param filename: path to the XML file
+    :param tag: tag of the record elements (e.g. SupplementalRecord)
+    :param no_ranges: the desired number of ranges
+    :param list_tag: tag of the element which contains the records - the last range ends at its closing tag
+    (None = the records are closed by the last closing tag of the file)
+    :return: a list of (start, end) byte offsets
+    """
+    record_pattern = re.compile(b'<' + tag.encode('utf-8') + rb'[\s>]')
+    file_size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        first = _find_tag(f, record_pattern, 0)
+        if first is None:
+            return []
+        if list_tag is None:
+            # the record set is closed by the last closing tag of the file
+            f.seek(max(0, file_size - SEARCH_WINDOW))
+            tail = f.read()
+            end = max(0, file_size - SEARCH_WINDOW) + tail.rfind(b'</')
+            starts = _compute_range_starts(f, record_pattern, first, end, no_ranges)
+        else:
+            # other elements may follow the record list: its closing tag is searched after the last record start
+            # of a first split, then the records are split again up to the closing tag
+            list_end_pattern = re.compile(b'</' + list_tag.encode('utf-8') + b'>')
+            starts = _compute_range_starts(f, record_pattern, first, file_size, no_ranges)
+            end = None
+            while end is None:
+                end = _find_tag(f, list_end_pattern, starts[-1])
+                if end is None:
+                    starts.pop()
+                    if not starts:
+                        return []
+            starts = _compute_range_starts(f, record_pattern, first, end, no_ranges)
+    return list(zip(starts, starts[1:] + [end]))
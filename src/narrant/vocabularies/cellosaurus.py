@@ -0,0 +1,119 @@
+"""
+Streaming parser of the Cellosaurus XML file (cellosaurus.xml)
+
+The cell lines are read with iterparse. Each cell line and each publication (the other large list of the file) is
+cleared after it has been parsed and the lists are removed from the root once they are complete, so the memory
+does not grow with the file size. Optionally, the file is split into byte ranges of complete cell-line
+elements which are parsed by a process pool.
+"""
+import logging
+import multiprocessing
+import os
+from datetime import datetime
+from typing import Iterator, List, Tuple
+
+from lxml import etree
+
+from narrant.util.xmlranges import compute_record_ranges, get_number_of_ranges, MIN_RANGE_SIZE, MAX_RANGE_SIZE
+
+CELLOSAURUS_TAG_CELL_LINE = "cell-line"
+CELLOSAURUS_TAG_CELL_LINE_LIST = "cell-line-list"
+CELLOSAURUS_TAG_PUBLICATION = "publication"
+CELLOSAURUS_TAG_PUBLICATION_LIST = "publication-list"
+
+# top-level lists of the file -> tag of their entries (the entries are cleared while the file is streamed)
+CELLOSAURUS_LIST_ENTRY_TAGS = {CELLOSAURUS_TAG_CELL_LINE_LIST: CELLOSAURUS_TAG_CELL_LINE,
+                               CELLOSAURUS_TAG_PUBLICATION_LIST: CELLOSAURUS_TAG_PUBLICATION}
+
+# (entity id, heading, synonyms)
+CellLineEntry = Tuple[str, str, List[str]]
+
+
+def parse_cell_line(element) -> CellLineEntry:
+    """
+    Parses a cell-line element. The primary accession number is the entity id, the name of type identifier
+    is the heading and the names of type synonym are the synonyms.
+    :param element: a cell-line element
+    :return: a tuple (entity id, heading, synonyms)
+    """
+    entity_id = element.find("accession-list/accession").text.strip().replace("_", ":")
+
+    heading = ""
+    synonyms = list()
+    for name in element.find("name-list"):
+        name_str = name.text.strip()
+        name_type = name.get("type", "")
+        if name_type == "identifier":
+            assert heading == ""
+            heading = name_str
+        elif name_type == "synonym":
+            synonyms.append(name_str)
+    return entity_id, heading, synonyms
+
+
+def iterate_cell_lines(cellosaurus_file: str) -> Iterator[CellLineEntry]:
+    """
+    Streams the cell lines of a Cellosaurus XML file
+    :param cellosaurus_file: path to cellosaurus.xml
+    :return: an iterator over (entity id, heading, synonyms)
+    """
+    tags = list(CELLOSAURUS_LIST_ENTRY_TAGS.keys()) + list(CELLOSAURUS_LIST_ENTRY_TAGS.values())
+    for _, element in etree.iterparse(cellosaurus_file, events=("end",), tag=tags):
+        parent = element.getparent()
+        if parent is None:
+            continue
+        if element.tag in CELLOSAURUS_LIST_ENTRY_TAGS:
+            # the list is complete: remove it from the root
+            if parent.getparent() is None:
+                element.clear()
+                parent.remove(element)
+            continue
+        # entries are only handled as direct children of their list (e.g. not the publications of a cell line)
+        if CELLOSAURUS_LIST_ENTRY_TAGS.get(parent.tag) != element.tag:
+            continue
+        if element.tag == CELLOSAURUS_TAG_CELL_LINE:
+            yield parse_cell_line(element)
+        # free the memory of the parsed element and its predecessors
+        element.clear()
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def _parse_cell_line_range(arguments) -> List[CellLineEntry]:
+    filename, start, end = arguments
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        content = f.read(end - start)
+    root = etree.fromstring(b'<' + CELLOSAURUS_TAG_CELL_LINE_LIST.encode('utf-8') + b'>' + content +
+                            b'</' + CELLOSAURUS_TAG_CELL_LINE_LIST.encode('utf-8') + b'>')
+    return [parse_cell_line(element) for element in root.iterchildren(tag=CELLOSAURUS_TAG_CELL_LINE)]
+
+
+def iterate_cell_lines_parallel(cellosaurus_file: str, workers: int = 1,
+                                min_range_size: int = MIN_RANGE_SIZE,
+                                max_range_size: int = MAX_RANGE_SIZE) -> Iterator[CellLineEntry]:
+    """
+    Parses the cell lines of a Cellosaurus XML file with a process pool (ranges are yielded in file order)
+    :param cellosaurus_file: path to cellosaurus.xml
+    :param workers: number of worker processes (1 = stream the file in this process)
+    :param min_range_size: minimum number of bytes per range
+    :param max_range_size: maximum number of bytes per range
+    :return: an iterator over (entity id, heading, synonyms)
+    """
+    if workers <= 1:
+        yield from iterate_cell_lines(cellosaurus_file)
+        return
+
+    start_time = datetime.now()
+    no_ranges = get_number_of_ranges(os.path.getsize(cellosaurus_file), workers, min_range_size=min_range_size,
+                                     max_range_size=max_range_size)
+    ranges = compute_record_ranges(cellosaurus_file, CELLOSAURUS_TAG_CELL_LINE, no_ranges,
+                                   list_tag=CELLOSAURUS_TAG_CELL_LINE_LIST)
+    tasks = [(cellosaurus_file, start, end) for start, end in ranges]
+    logging.info(f'Parsing {cellosaurus_file} in {len(tasks)} ranges ({workers} workers)...')
+    count = 0
+    with multiprocessing.Pool(min(workers, max(1, len(tasks)))) as pool:
+        for entries in pool.imap(_parse_cell_line_range, tasks):
+            count += len(entries)
+            yield from entries
+    logging.info(f'{count} cell lines parsed in {datetime.now() - start_time}s')
@@ -0,0 +1,186 @@
+"""
+Concurrent and resumable harvesting of the ChEMBL API
+
+The number of records is read from the first page (page_meta.total_count). The offsets of all other pages
+are computed from it and the pages are requested concurrently by a bounded pool of worker threads. Failed
+requests are retried with exponential backoff. Each completed page is written into the pages directory and
+recorded in a manifest, so an interrupted harvest resumes with the missing pages only.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from kgextractiontoolbox.progress import Progress
+
+MANIFEST_NAME = "manifest.json"
+PAGES_DIR_NAME = "pages"
+# status codes of responses which are retried (all other errors fail immediately)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class ChemblHarvestError(Exception):
+    pass
+
+
+class ChemblHarvester:
+    """
+    Requests all pages of a ChEMBL API resource (e.g. molecule or target) into a harvest directory
+    """
+
+    def __init__(self, base_url: str, url_path: str, url_params: Dict, json_data_kw: str, harvest_dir: str,
+                 workers: int = 8, page_size: int = 1000, max_retries: int = 5, backoff: float = 1.0,
+                 timeout: float = 60):
+        """
+        :param base_url: URL of the ChEMBL server (e.g. https://www.ebi.ac.uk)
+        :param url_path: path of the API resource (e.g. /chembl/api/data/molecule)
+        :param url_params: request parameters (format, filters, ...) - limit and offset are set by the harvester
+        :param json_data_kw: key of the records in the JSON response (e.g. molecules)
+        :param harvest_dir: directory of the manifest and the page files
+        :param workers: number of concurrent requests
+        :param page_size: number of records per request
+        :param max_retries: number of retries of a failed request
+        :param backoff: the n-th retry waits backoff * 2^(n-1) seconds
+        :param timeout: timeout of a single request in seconds
+        """
+        self.base_url = base_url
+        self.url_path = url_path
+        self.url_params = {k: v for k, v in url_params.items() if k not in ('limit', 'offset')}
+        self.json_data_kw = json_data_kw
+        self.harvest_dir = harvest_dir
+        self.pages_dir = os.path.join(harvest_dir, PAGES_DIR_NAME)
+        self.manifest_path = os.path.join(harvest_dir, MANIFEST_NAME)
+        self.workers = max(1, workers)
+        self.page_size = page_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+
+    def get_query_id(self) -> str:
+        """
+        :return: an id of the harvested query (a manifest of another query is not resumed)
+        """
+        query = json.dumps(dict(url=self.base_url + self.url_path, params=self.url_params,
+                                page_size=self.page_size), sort_keys=True)
+        return hashlib.md5(query.encode('utf-8')).hexdigest()
+
+    def get_page_url(self, offset: int) -> str:
+        params = dict(self.url_params, limit=self.page_size, offset=offset)
+        return "{}{}?{}".format(self.base_url, self.url_path, "&".join([f"{k}={v}" for k, v in params.items()]))
+
+    def get_page_path(self, offset: int) -> str:
+        return os.path.join(self.pages_dir, "{}_{:09}.json".format(self.json_data_kw, offset))
+
+    def _get_session(self) -> requests.Session:
+        # one session (connection pool) per worker thread
+        if not hasattr(self._local, "session"):
+            session = requests.Session()
+            session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._local.session = session
+        return self._local.session
+
+    def _request_page(self, offset: int) -> dict:
+        """
+        Requests a single page and retries failed requests with exponential backoff
+        :param offset: offset of the page
+        :return: the JSON response
+        """
+        url = self.get_page_url(offset)
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            with self._lock:
+                self.requests_sent += 1
+            try:
+                response = self._get_session().get(url, timeout=self.timeout)
+            except requests.RequestException as e:
+                logging.warning(f'Request {url} failed (attempt {attempt + 1}): {e}')
+                continue
+            with response:
+                if response.ok:
+                    return response.json()
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise ChemblHarvestError(f'Request {url} failed with status {response.status_code}')
+                logging.warning(f'Request {url} failed with status {response.status_code} (attempt {attempt + 1})')
+        raise ChemblHarvestError(f'Request {url} failed after {self.max_retries + 1} attempts')
+
+    def _load_manifest(self) -> dict:
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path, 'rt') as f:
+                manifest = json.load(f)
+            if manifest.get("query_id") == self.get_query_id():
+                return manifest
+            logging.info('Harvest manifest belongs to another query - starting a new harvest')
+        return dict(query_id=self.get_query_id(), total_count=None, completed={})
+
+    def _write_manifest(self, manifest: dict):
+        tmp_path = f'{self.manifest_path}.tmp'
+        with open(tmp_path, 'wt') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _store_page(self, manifest: dict, offset: int, result: dict):
+        records = result[self.json_data_kw]
+        path = self.get_page_path(offset)
+        with open(f'{path}.tmp', 'wt') as f:
+            f.write(json.dumps(records))
+        os.replace(f'{path}.tmp', path)
+        with self._lock:
+            manifest["completed"][str(offset)] = len(records)
+            self._write_manifest(manifest)
+
+    def harvest(self) -> int:
+        """
+        Requests all missing pages (pages of a previous, interrupted harvest of the same query are kept)
+        :return: the number of harvested records
+        """
+        os.makedirs(self.pages_dir, exist_ok=True)
+        manifest = self._load_manifest()
+        # remove pages of another query and partially written pages
+        for file_name in os.listdir(self.pages_dir):
+            if not manifest["completed"] or file_name.endswith('.tmp'):
+                os.remove(os.path.join(self.pages_dir, file_name))
+
+        if manifest["total_count"] is None:
+            logging.info(f'Start requesting data {self.get_page_url(0)}')
+            result = self._request_page(0)
+            manifest["total_count"] = result['page_meta']['total_count']
+            self._store_page(manifest, 0, result)
+
+        offsets = range(0, manifest["total_count"], self.page_size)
+        missing = [offset for offset in offsets if str(offset) not in manifest["completed"]]
+        logging.info(f'{manifest["total_count"]} records in {len(offsets)} pages ({len(offsets) - len(missing)} '
+                     f'already harvested) - requesting {len(missing)} pages with {self.workers} workers')
+
+        progress = Progress(total=len(missing), text='total API requests')
+        progress.start_time()
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._request_page, offset): offset for offset in missing}
+            for idx, future in enumerate(as_completed(futures)):
+                offset = futures[future]
+                try:
+                    self._store_page(manifest, offset, future.result())
+                except ChemblHarvestError as e:
+                    logging.error(str(e))
+                    failed.append(offset)
+                progress.print_progress(idx + 1)
+        progress.done()
+
+        if failed:
+            raise ChemblHarvestError(f'{len(failed)} pages could not be harvested - run the harvest again to '
+                                     f'resume (manifest: {self.manifest_path})')
+        harvested = sum(manifest["completed"].values())
+        logging.info(f'Retrieved {harvested} from {manifest["total_count"]} total records in {len(offsets)} pages '
+                     f'({self.requests_sent} requests)')
+        return harvested
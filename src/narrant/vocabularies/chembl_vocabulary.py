@@ -1,18 +1,16 @@
-import json
 import logging
 import os
 import shutil
-import tempfile
 from abc import abstractmethod, ABC
 
-import requests
-
-from kgextractiontoolbox.progress import Progress
+from narrant.config import CHEMBL_HARVEST_DIR
+from narrant.vocabularies.chembl_harvester import ChemblHarvester, ChemblHarvestError, PAGES_DIR_NAME
 
 URL = "https://www.ebi.ac.uk"
-URL_PATH = "/chembl/api/data/{}?{}"
+URL_PATH = "/chembl/api/data/{}"
 REQ_LIMIT = 1000
 DEFAULT_PARAMS = dict(format='json', limit=REQ_LIMIT)
+DEFAULT_WORKERS = 8
 
 
 class ChemblVocabulary(ABC):
@@ -30,14 +28,15 @@ class ChemblVocabulary(ABC):
         self.vocab_dir = vocab_dir
         self.vocab_type = vocab_type
         self.url_path_kw = vocab_type.lower()
-        self.url_params = DEFAULT_PARAMS
+        self.base_url = URL
+        self.url_params = dict(DEFAULT_PARAMS)
         self.json_data_kw = "{}s".format(vocab_type.lower())
 
     @abstractmethod
     def _create_vocabulary_from_dir(self, tmp_dir):
         pass
 
-    def initialize_vocabulary(self, force_create=False):
+    def initialize_vocabulary(self, force_create=False, workers=DEFAULT_WORKERS):
         logging.info("Initializing {} vocabulary.".format(self.vocab_type))
         vocab_exist = os.path.isfile(self.vocab_dir)
 
@@ -49,61 +48,32 @@ class ChemblVocabulary(ABC):
             logging.info("Remove old {} vocabulary.")
             os.remove(self.vocab_dir)
 
-        root_dir = tempfile.mkdtemp()
-        logging.info("Using tmp dir {}.".format(root_dir))
-        num_targets = self._request_chembl_jsons(root_dir)
+        # the harvest directory is kept if the harvest fails, so that the next run resumes it
+        harvest_dir = os.path.join(CHEMBL_HARVEST_DIR, self.json_data_kw)
+        logging.info("Using harvest dir {}.".format(harvest_dir))
+        try:
+            num_targets = self._request_chembl_jsons(harvest_dir, workers=workers)
+        except ChemblHarvestError as e:
+            logging.error("Harvesting {} data failed: {}. Stopping...".format(self.vocab_type, e))
+            return
 
         if num_targets == 0:
-            logging.error("No {} data available. Removing tmp dir. Stopping...".format(self.vocab_type))
-            shutil.rmtree(root_dir)
+            logging.error("No {} data available. Removing harvest dir. Stopping...".format(self.vocab_type))
+            shutil.rmtree(harvest_dir)
             return
 
-        self._create_vocabulary_from_dir(root_dir)
-
-        logging.info(f'Remove temp directory: {root_dir}')
-        shutil.rmtree(root_dir)
-
-    def _request_chembl_jsons(self, tmp_dir):
-        total_requests = 0
-        actual_targets = 0
-        iteration = 0
-        num_files = 0
-        p = None
-        next_req = URL_PATH.format(self.url_path_kw, "&".join([f"{k}={v}" for k, v in self.url_params.items()]))
-
-        logging.info('Start requesting data {}{}'.format(URL, next_req))
-
-        while True:
-            response = requests.get("{}{}".format(URL, next_req))
-            if not response.ok:
-                logging.error('An error occurred in the {} api request.'.format(iteration))
-                break
-
-            result = response.json()
-            if not p:
-                total_requests = result['page_meta']['total_count']
-                num_files = total_requests // REQ_LIMIT + 1
-                p = Progress(total=num_files, text='total API requests')
-                p.start_time()
+        self._create_vocabulary_from_dir(os.path.join(harvest_dir, PAGES_DIR_NAME))
 
-            api_data = result[self.json_data_kw]
-            actual_targets += len(api_data)
+        logging.info(f'Remove harvest directory: {harvest_dir}')
+        shutil.rmtree(harvest_dir)
 
-            iteration += 1
-
-            with open(os.path.join(tmp_dir, "{}_{:02}.json".format(self.json_data_kw, iteration)), "w") as file:
-                file.write(json.dumps(api_data))
-                file.close()
-
-            response.close()
-            p.print_progress(iteration)
-
-            if result['page_meta']['next']:
-                next_req = result['page_meta']['next']
-            else:
-                break
-
-        p.done()
-        logging.info("Retrieved {} from {} total targets in {}/{} requests."
-                     .format(actual_targets, total_requests, iteration, num_files))
-        return actual_targets
+    def _request_chembl_jsons(self, harvest_dir, workers=DEFAULT_WORKERS):
+        """
+        Requests all records of the vocabulary type from the ChEMBL API (see ChemblHarvester)
+        :param harvest_dir: directory of the harvest (the JSON pages are written into its pages directory)
+        :param workers: number of concurrent requests
+        :return: the number of retrieved records
+        """
+        harvester = ChemblHarvester(self.base_url, URL_PATH.format(self.url_path_kw), self.url_params,
+                                    self.json_data_kw, harvest_dir, workers=workers, page_size=REQ_LIMIT)
+        return harvester.harvest()
@@ -4,6 +4,7 @@ import logging
 import os
 from collections import defaultdict
 from datetime import datetime
+from functools import partial
 from typing import Set
 
 from lxml import etree as ET
@@ -17,9 +18,13 @@ from narrant import config
 from narrant.config import CHEMBL_BLACKLIST_FILE, DRUG_TAGGER_VOCAB
 from narrant.entitylinking.enttypes import DRUG
 from narrant.vocabularies.chembl_vocabulary import ChemblVocabulary
+from narrant.vocabularies.vocabulary_cache import load_cached_vocabulary
 
 
 class DrugVocabulary(ChemblVocabulary):
+    # increasing the version invalidates all cached drug vocabularies
+    CHEMBL_DRUGS_VERSION = 1
+
     def __init__(self):
         """
         Note that our chembl drugs are retrieved via /molecules and not via /drugs! For that we need to add a
@@ -91,10 +96,35 @@ class DrugVocabulary(ChemblVocabulary):
                                            expand_terms=True,
                                            ignore_excipient_terms=True,
                                            ignore_drugbank_chemicals=True):
+        """
+        Creates the drug vocabulary from the ChEMBL vocabulary
+        The vocabulary is cached and only recomputed if an input file or a parameter changes
+        :param source_file: the ChEMBL drug vocabulary (created if it does not exist)
+        :param expand_terms: expand the terms of the vocabulary
+        :param ignore_excipient_terms: ignore ChEMBL entries that have an excipient term
+        :param ignore_drugbank_chemicals: ignore ChEMBL entries that have a chemical term
+        :return: a dictionary term -> set of ChEMBL ids
+        """
         # create drug vocabulary if it does not exist
         if not os.path.isfile(source_file):
             DrugVocabulary().initialize_vocabulary()
 
+        input_files = [source_file, CHEMBL_BLACKLIST_FILE]
+        if ignore_excipient_terms:
+            input_files.extend([config.EXCIPIENT_TAGGER_DATABASE_FILE, config.EXCIPIENT_CURATED_LIST_FILE,
+                                config.EXCIPIENT_TAGGER_DRUGBANK_EXCIPIENT_FILE])
+        if ignore_drugbank_chemicals:
+            input_files.append(config.CHEMBL_CHEMICAL_DATABASE_FILE)
+        params = dict(expand_terms=expand_terms, ignore_excipient_terms=ignore_excipient_terms,
+                      ignore_drugbank_chemicals=ignore_drugbank_chemicals)
+        return load_cached_vocabulary("chembl_drugs", params, input_files,
+                                      partial(DrugVocabulary._create_drug_vocabulary_from_chembl, source_file,
+                                              **params),
+                                      version=DrugVocabulary.CHEMBL_DRUGS_VERSION)
+
+    @staticmethod
+    def _create_drug_vocabulary_from_chembl(source_file, expand_terms, ignore_excipient_terms,
+                                            ignore_drugbank_chemicals):
         # read excipient terms if they should be ignored
         excipient_terms = set()
         if ignore_excipient_terms:
@@ -1,13 +1,17 @@
 import logging
+from functools import partial
 from itertools import islice
 
 import narrant.vocabularies.drug_vocabulary as drug_vocab
 from kgextractiontoolbox.entitylinking.tagging.dictagger import clean_vocab_word_by_split_rules
 from kgextractiontoolbox.entitylinking.tagging.vocabulary import expand_vocabulary_term
 from narrant import config
+from narrant.vocabularies.vocabulary_cache import load_cached_vocabulary
 
 
 class ExcipientVocabulary:
+    # version of the cached excipient names (increase it if _read_excipients_names changes)
+    EXCIPIENT_NAMES_VERSION = 1
 
     @staticmethod
     def _parse_single_excipient_per_line_file(filepath: str, expand_terms) -> {str: [str]}:
@@ -32,6 +36,19 @@ class ExcipientVocabulary:
                               excipients_curated_file=config.EXCIPIENT_CURATED_LIST_FILE,
                               drugbank_excipient_file=config.EXCIPIENT_TAGGER_DRUGBANK_EXCIPIENT_FILE,
                               expand_terms=True):
+        """
+        Reads the excipient names of the excipient database, the curated and the DrugBank excipient list
+        The result is cached and only recomputed if an input file or a parameter changes
+        :return: a dictionary term -> set of excipient headings
+        """
+        return load_cached_vocabulary("excipient_names", dict(expand_terms=expand_terms),
+                                      [source_file, excipients_curated_file, drugbank_excipient_file],
+                                      partial(ExcipientVocabulary._read_excipients_names, source_file,
+                                              excipients_curated_file, drugbank_excipient_file, expand_terms),
+                                      version=ExcipientVocabulary.EXCIPIENT_NAMES_VERSION)
+
+    @staticmethod
+    def _read_excipients_names(source_file, excipients_curated_file, drugbank_excipient_file, expand_terms):
         excipient_dict = {}
         with open(source_file, 'rt') as f:
             for line in islice(f, 1, None):
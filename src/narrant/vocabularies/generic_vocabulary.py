@@ -2,9 +2,10 @@ import logging
 import os
 from abc import ABCMeta
 from collections import defaultdict
-from typing import Set
+from typing import List, Set
 
 from kgextractiontoolbox.entitylinking.tagging.vocabulary import Vocabulary
+from narrant.config import MESH_DESCRIPTORS_FILE, MESH_CACHE_DIR
 from narrant.entity.entityresolver import EntityResolver
 from narrant.vocabularies.mesh_vocabulary import MeSHVocabulary
 
@@ -40,6 +41,57 @@ def transform_term2entities_index_to_vocabulary(term2entities: {str: Set[str]},
 
 
 class GenericVocabulary(ABCMeta):
+    # MeSH vocabularies computed in a shared pass: (vocabulary directory, expand terms) -> term -> MeSH ids
+    _preloaded_mesh_vocabularies = {}
+
+    @staticmethod
+    def load_mesh_tree_numbers(vocab_dir: str):
+        """
+        Loads the MeSH subtrees of a vocabulary directory
+        :param vocab_dir: a vocabulary directory
+        :return: a set of tree numbers or None if the directory does not contain a mesh_tree_numbers.txt
+        """
+        mesh_tree_file = os.path.join(vocab_dir, "mesh_tree_numbers.txt")
+        if not os.path.isfile(mesh_tree_file):
+            return None
+        tree_numbers = set()
+        with open(mesh_tree_file, 'rt') as f:
+            for line in f:
+                if line.strip():
+                    tree_numbers.add(line.strip())
+        return tree_numbers
+
+    @staticmethod
+    def preload_mesh_vocabularies(vocab_dirs: List[str], expand_terms=True, mesh_file=MESH_DESCRIPTORS_FILE,
+                                  cache_dir=MESH_CACHE_DIR):
+        """
+        Creates the MeSH subtree vocabularies of several vocabulary directories with a single pass over MeSH
+        The preloaded vocabularies are used by create_vocabulary_from_directory until they are cleared
+        :param vocab_dirs: a list of vocabulary directories
+        :param expand_terms: expand the terms of the vocabularies
+        :param mesh_file: path to the MeSH descriptor file
+        :param cache_dir: directory of the MeSH cache files
+        :return: None
+        """
+        subtrees_by_vocab = {}
+        for vocab_dir in vocab_dirs:
+            tree_numbers = GenericVocabulary.load_mesh_tree_numbers(vocab_dir)
+            if tree_numbers is not None:
+                subtrees_by_vocab[os.path.abspath(vocab_dir)] = tree_numbers
+        if not subtrees_by_vocab:
+            return
+        logging.info(f'Creating MeSH vocabularies for {len(subtrees_by_vocab)} directories in a single pass...')
+        mesh_vocabs = MeSHVocabulary.create_mesh_vocabs(subtrees_by_vocab, mesh_file=mesh_file,
+                                                       expand_terms=expand_terms, cache_dir=cache_dir)
+        for vocab_dir, desc_by_term in mesh_vocabs.items():
+            GenericVocabulary._preloaded_mesh_vocabularies[(vocab_dir, expand_terms)] = desc_by_term
+
+    @staticmethod
+    def clear_preloaded_mesh_vocabularies():
+        """
+        Releases all preloaded MeSH vocabularies
+        """
+        GenericVocabulary._preloaded_mesh_vocabularies.clear()
 
     @staticmethod
     def load_additional_mesh_descriptors(file):
@@ -64,16 +116,38 @@ class GenericVocabulary(ABCMeta):
             else:
                 vocab1[term] = ids
 
+    @staticmethod
+    def is_affected_by_mesh_diff(vocab_dir: str, mesh_diff) -> bool:
+        """
+        Checks whether the MeSH part of a vocabulary directory changes between two MeSH releases
+        :param vocab_dir: a vocabulary directory (may contain mesh_tree_numbers.txt and mesh_descriptors.txt)
+        :param mesh_diff: a MeSHReleaseDiff
+        :return: True if a descriptor below the MeSH subtrees or an additional MeSH descriptor was changed
+        """
+        if not os.path.isdir(vocab_dir):
+            return False
+        tree_numbers = GenericVocabulary.load_mesh_tree_numbers(vocab_dir)
+        if tree_numbers is not None and mesh_diff.affects_subtrees(tree_numbers):
+            return True
+        add_mesh_desc_file = os.path.join(vocab_dir, 'mesh_descriptors.txt')
+        if os.path.isfile(add_mesh_desc_file):
+            additional_mesh_descriptors = GenericVocabulary.load_additional_mesh_descriptors(add_mesh_desc_file)
+            if additional_mesh_descriptors & mesh_diff.affected_ids():
+                return True
+        return False
+
     @staticmethod
     def create_vocabulary_from_directory(vocab_dir: str, expand_terms=True):
         desc_by_term = {}
         # Is a MeSH tree file included? then build the vocabulary from these subtrees
-        mesh_tree_file = os.path.join(vocab_dir, "mesh_tree_numbers.txt")
-        if os.path.isfile(mesh_tree_file):
-            tree_numbers = set()
-            with open(mesh_tree_file, 'rt') as f:
-                for line in f:
-                    tree_numbers.add(line.strip())
+        tree_numbers = GenericVocabulary.load_mesh_tree_numbers(vocab_dir)
+        preload_key = (os.path.abspath(vocab_dir), expand_terms)
+        if preload_key in GenericVocabulary._preloaded_mesh_vocabularies:
+            logging.info(f'Using preloaded MeSH vocabulary of tree numbers: {tree_numbers}')
+            # copy the preloaded vocabulary, several vocabularies may use the same directory
+            desc_by_term = {term: set(ids) for term, ids in
+                            GenericVocabulary._preloaded_mesh_vocabularies[preload_key].items()}
+        elif tree_numbers is not None:
             logging.info(f'Creating vocabulary from MeSH tree numbers: {tree_numbers}')
             desc_by_term = MeSHVocabulary.create_mesh_vocab(list(tree_numbers), expand_terms=expand_terms)
 
@@ -1,22 +1,24 @@
 import logging
 from collections import defaultdict
-from typing import List, Set
+from typing import Dict, Iterable, List, Set
 
 from kgextractiontoolbox.entitylinking.tagging.vocabulary import expand_vocabulary_term
-from narrant.config import MESH_DESCRIPTORS_FILE
-from narrant.mesh.data import MeSHDB
+from narrant.config import MESH_DESCRIPTORS_FILE, MESH_CACHE_DIR
+from narrant.mesh.cache import load_descriptors
 
 
 class MeSHVocabulary:
 
     @staticmethod
-    def create_mesh_vocab_from_desc(descriptors: Set[str], mesh_file=MESH_DESCRIPTORS_FILE, expand_terms=True):
-        meshdb = MeSHDB()
-        meshdb.load_xml(mesh_file)
+    def create_mesh_vocab_from_desc(descriptors: Set[str], mesh_file=MESH_DESCRIPTORS_FILE, expand_terms=True,
+                                    cache_dir=MESH_CACHE_DIR):
+        desc_by_id = {desc.unique_id: desc for desc in load_descriptors(mesh_file, cache_dir=cache_dir)}
         desc_by_term = defaultdict(set)
 
         for d in descriptors:
-            desc = meshdb.desc_by_id(d)
+            if d not in desc_by_id:
+                raise ValueError("Descriptor {} not found.".format(d))
+            desc = desc_by_id[d]
             mesh_desc = f'MESH:{desc.unique_id}'
             if expand_terms:
                 for t_e in expand_vocabulary_term(desc.name.lower().strip()):
@@ -25,39 +27,77 @@ class MeSHVocabulary:
                 desc_by_term[desc.name.lower().strip()].add(mesh_desc)
             for t in desc.terms:
                 if expand_terms:
-                    for t_e in expand_vocabulary_term(t.string.lower().strip()):
+                    for t_e in expand_vocabulary_term(t.lower().strip()):
                         desc_by_term[t_e].add(mesh_desc)
 
         return desc_by_term
 
     @staticmethod
-    def create_mesh_vocab(subtrees: List[str], mesh_file=MESH_DESCRIPTORS_FILE, expand_terms=True):
-        desc_by_term = defaultdict(set)
+    def build_subtree_prefix_index(subtrees_by_vocab: Dict[str, Iterable[str]]) -> Dict[int, Dict[str, Set[str]]]:
+        """
+        Builds a prefix index over the subtrees of several vocabularies
+        :param subtrees_by_vocab: a dictionary vocabulary name -> allowed MeSH subtrees (tree number prefixes)
+        :return: a dictionary prefix length -> (prefix -> names of the vocabularies that allow this prefix)
+        """
+        prefix_index = defaultdict(lambda: defaultdict(set))
+        for vocab_name, subtrees in subtrees_by_vocab.items():
+            for subtree in subtrees:
+                prefix_index[len(subtree)][subtree].add(vocab_name)
+        return {length: dict(prefixes) for length, prefixes in prefix_index.items()}
+
+    @staticmethod
+    def get_matching_vocabularies(tree_numbers: Iterable[str], prefix_index: Dict[int, Dict[str, Set[str]]]) \
+            -> Set[str]:
+        """
+        :param tree_numbers: the tree numbers of a descriptor
+        :param prefix_index: a prefix index (see build_subtree_prefix_index)
+        :return: the names of all vocabularies which allow a prefix of one of the tree numbers
+        """
+        matches = set()
+        for tn in tree_numbers:
+            for length, prefixes in prefix_index.items():
+                vocab_names = prefixes.get(tn[:length])
+                if vocab_names:
+                    matches.update(vocab_names)
+        return matches
+
+    @staticmethod
+    def create_mesh_vocabs(subtrees_by_vocab: Dict[str, Iterable[str]], mesh_file=MESH_DESCRIPTORS_FILE,
+                           expand_terms=True, cache_dir=MESH_CACHE_DIR) -> Dict[str, Dict[str, Set[str]]]:
+        """
+        Creates the vocabularies of several MeSH subtree sets with a single pass over MeSH
+        :param subtrees_by_vocab: a dictionary vocabulary name -> allowed MeSH subtrees (tree number prefixes)
+        :param mesh_file: path to the MeSH descriptor file
+        :param expand_terms: expand the terms of the vocabularies
+        :param cache_dir: directory of the MeSH cache files
+        :return: a dictionary vocabulary name -> (term -> set of MeSH descriptor ids)
+        """
+        prefix_index = MeSHVocabulary.build_subtree_prefix_index(subtrees_by_vocab)
+        vocabs = {vocab_name: defaultdict(set) for vocab_name in subtrees_by_vocab}
 
-        meshdb = MeSHDB()
-        meshdb.load_xml(mesh_file)
-        logging.info('Extracting MeSH information (terms) ...')
-        for desc in meshdb.get_all_descs():
-            has_correct_tree = False
-            # check if a descriptor's tree matches the allowed subtrees
-            for tn in desc.tree_numbers:
-                for allowed_tree in subtrees:
-                    if tn.startswith(allowed_tree):
-                        has_correct_tree = True
+        logging.info(f'Extracting MeSH information (terms) for {len(vocabs)} vocabularies ...')
+        for desc in load_descriptors(mesh_file, cache_dir=cache_dir):
+            vocab_names = MeSHVocabulary.get_matching_vocabularies(desc.tree_numbers, prefix_index)
             # ignore descriptor
-            if not has_correct_tree:
+            if not vocab_names:
                 continue
 
-            mesh_desc = f'MESH:{desc.unique_id}'
-            if expand_terms:
-                for t_e in expand_vocabulary_term(desc.name.lower().strip()):
-                    desc_by_term[t_e].add(mesh_desc)
-            else:
-                desc_by_term[desc.name.lower().strip()].add(mesh_desc)
-            for t in desc.terms:
+            # compute the terms of the descriptor once for all matching vocabularies
+            terms = set()
+            for t in [desc.name] + list(desc.terms):
                 if expand_terms:
-                    for t_e in expand_vocabulary_term(t.string.lower().strip()):
-                        desc_by_term[t_e].add(mesh_desc)
+                    terms.update(expand_vocabulary_term(t.lower().strip()))
                 else:
-                    desc_by_term[t.string.lower().strip()].add(mesh_desc)
-        return desc_by_term
+                    terms.add(t.lower().strip())
+            mesh_desc = f'MESH:{desc.unique_id}'
+            for vocab_name in vocab_names:
+                desc_by_term = vocabs[vocab_name]
+                for t in terms:
+                    desc_by_term[t].add(mesh_desc)
+        return vocabs
+
+    @staticmethod
+    def create_mesh_vocab(subtrees: List[str], mesh_file=MESH_DESCRIPTORS_FILE, expand_terms=True,
+                          cache_dir=MESH_CACHE_DIR):
+        return MeSHVocabulary.create_mesh_vocabs({"mesh": subtrees}, mesh_file=mesh_file, expand_terms=expand_terms,
+                                                 cache_dir=cache_dir)["mesh"]
@@ -0,0 +1,70 @@
+"""
+Content-addressed cache of intermediate vocabularies
+
+Vocabularies that are derived from large input files (e.g. the ChEMBL drug vocabulary) are used by several
+taggers and vocabularies. A cached vocabulary is keyed by its name, its parameters (e.g. expand_terms), the
+version of its builder and the md5 checksums of its input files. It is pickled into the cache directory (shared
+by all taggers and across runs). Changing an input file, a parameter or the builder version creates a new
+cache entry. Each load returns a new vocabulary, so callers may modify it.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List
+
+from narrant.config import VOCABULARY_CACHE_DIR
+from narrant.util.filecache import file_checksum, read_cache_file, write_cache_file
+
+CACHE_FORMAT_VERSION = 1
+
+
+def get_cache_key(name: str, params: Dict, input_files: List[str], version: int = 1) -> str:
+    """
+    Computes the key of a cached vocabulary
+    :param name: name of the vocabulary
+    :param params: parameters of the vocabulary (JSON serializable)
+    :param input_files: paths of the input files
+    :param version: version of the function which builds the vocabulary
+    :return: '<name>.<hash of the parameters>.<hash of the builder version and the input checksums>'
+    """
+    params_hash = hashlib.md5(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+    checksums = [file_checksum(path) for path in input_files]
+    inputs_hash = hashlib.md5(json.dumps([version, checksums]).encode('utf-8')).hexdigest()
+    return f'{name}.{params_hash}.{inputs_hash}'
+
+
+def load_cached_vocabulary(name: str, params: Dict, input_files: List[str], build_function, version: int = 1,
+                           cache_dir: str = VOCABULARY_CACHE_DIR) -> Dict:
+    """
+    Loads a vocabulary from the cache or builds and caches it
+    :param name: name of the vocabulary
+    :param params: parameters of the vocabulary which change its content (JSON serializable, e.g. expand_terms)
+    :param input_files: paths of all files the vocabulary is derived from (the key uses their content, not their
+    paths)
+    :param build_function: a function without arguments which builds the vocabulary
+    :param version: version of build_function (increase it whenever the built vocabulary changes)
+    :param cache_dir: directory of the cache files
+    :return: the vocabulary
+    """
+    start_time = datetime.now()
+    key = get_cache_key(name, params, input_files, version=version)
+    path = os.path.join(cache_dir, f'{key}.cache')
+    vocabulary = read_cache_file(path, CACHE_FORMAT_VERSION)
+    if vocabulary is not None:
+        logging.info(f'Vocabulary {name} ({len(vocabulary)} terms) loaded from cache in '
+                     f'{datetime.now() - start_time}s')
+    else:
+        vocabulary = build_function()
+        try:
+            # entries of the same vocabulary and parameters which were computed from older input files or by an
+            # older builder version are removed
+            stale_prefix = key.rsplit('.', 1)[0]
+            write_cache_file(path, CACHE_FORMAT_VERSION, dict(name=name, params=params, size=len(vocabulary)),
+                             vocabulary, stale_pattern=os.path.join(cache_dir, f'{stale_prefix}.*.cache'))
+        except OSError as e:
+            logging.warning(f'Cannot write vocabulary cache {path} ({e})')
+        logging.info(f'Vocabulary {name} ({len(vocabulary)} terms) built and cached in '
+                     f'{datetime.now() - start_time}s')
+    return vocabulary
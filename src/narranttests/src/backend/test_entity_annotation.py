@@ -0,0 +1,57 @@
+from unittest import TestCase, mock
+
+from kgextractiontoolbox.backend.database import Session
+from narrant.backend.exports.entity_annotation import EntityAnnotator
+import narrant.entity.entityresolver as entityresolver
+from narrant.entity.entityresolver import EntityResolver, MeshResolver, GeneResolver
+from narrant.entity.resolvertable import store_resolver_entries
+from narrant.entity.snapshot import store_resolver_data
+from narrant.entitylinking.enttypes import GENE, DISEASE
+
+
+class EntityAnnotatorTestCase(TestCase):
+
+    def setUp(self) -> None:
+        session = Session.get()
+        store_resolver_data(session, MeshResolver.MESH_NAME, {"D000001": "Calcimycin"}, keyed=True)
+        store_resolver_data(session, MeshResolver.MESH_SUPPLEMENT_NAME, {}, keyed=True)
+        store_resolver_data(session, GeneResolver.NAME, {1956: ["EGFR", "epidermal growth factor receptor"]}, keyed=True)
+        resolver = EntityResolver()
+        resolver._keyed_resolvers.clear()
+        resolver._name_cache.clear()
+        EntityAnnotator()._annotations.clear()
+
+    def test_annotate(self):
+        annotations = EntityAnnotator().annotate([("MESH:D000001", DISEASE), ("1956", GENE), ("1956", GENE),
+                                                  ("MESH:D999999", DISEASE)])
+        self.assertEqual(2, len(annotations))
+        self.assertEqual(("Calcimycin", "MeSH", "https://meshb.nlm.nih.gov/record/ui?ui=D000001"),
+                         annotations[("MESH:D000001", DISEASE)])
+        self.assertEqual(("epidermal growth factor receptor//EGFR", "NCBI Gene",
+                          "https://www.ncbi.nlm.nih.gov/gene/1956"),
+                         annotations[("1956", GENE)])
+
+    def test_annotate_memoized(self):
+        EntityAnnotator().annotate([("MESH:D000001", DISEASE)])
+        store_resolver_entries(Session.get(), MeshResolver.MESH_NAME, {"D000001": "Changed"})
+        EntityResolver()._name_cache.clear()
+        annotations = EntityAnnotator().annotate([("MESH:D000001", DISEASE)])
+        self.assertEqual("Calcimycin", annotations[("MESH:D000001", DISEASE)][0])
+
+        # a new version of the resolver data clears the memoized annotations (at the next version check)
+        store_resolver_data(Session.get(), MeshResolver.MESH_NAME, {"D000001": "Changed"}, keyed=True)
+        EntityResolver().check_resolver_versions(force=True)
+        annotations = EntityAnnotator().annotate([("MESH:D000001", DISEASE)])
+        self.assertEqual("Changed", annotations[("MESH:D000001", DISEASE)][0])
+
+    def test_versions_checked_once_per_interval(self):
+        EntityResolver().check_resolver_versions(force=True)
+        with mock.patch.object(entityresolver, "get_resolver_data_version",
+                               wraps=entityresolver.get_resolver_data_version) as get_version:
+            for _ in range(10):
+                EntityAnnotator().annotate([("MESH:D000001", DISEASE), ("1956", GENE)])
+            self.assertEqual(0, get_version.call_count)
+            with mock.patch.object(EntityResolver, "VERSION_CHECK_INTERVAL", 0):
+                EntityAnnotator().annotate([("MESH:D000001", DISEASE)])
+            # one query per resolver name
+            self.assertEqual(4, get_version.call_count)
@@ -0,0 +1,69 @@
+from unittest import TestCase
+
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import DocumentMetadata
+from kgextractiontoolbox.document.load_document import document_bulk_load
+from narrant.backend.sampling import DocumentSampler, collection_sampler, journal_sampler, iterate_texts
+from narranttests.util import resource_rel_path
+
+COLLECTION = "SamplingTest"
+DOCUMENT_IDS = {91001, 91002, 91003, 91004, 91005}
+
+
+class DocumentSamplerTestCase(TestCase):
+
+    def setUp(self) -> None:
+        document_bulk_load(resource_rel_path("classification/classifier_documents.txt"), COLLECTION)
+        session = Session.get()
+        session.query(DocumentMetadata).filter(DocumentMetadata.document_collection == COLLECTION).delete()
+        session.commit()
+        journals = {91001: "Österreichische Apotheker-Zeitung, Vol. 3 (2020)",
+                    91002: "Current pharmaceutical design, Vol. 21 No. 11 (2015)",
+                    91003: "CURRENT PHARMACEUTICAL DESIGN",
+                    91004: "Diabetes Care, Vol. 1",
+                    91005: "Pediatrics"}
+        DocumentMetadata.bulk_insert_values_into_table(session, [dict(document_id=d_id,
+                                                                      document_collection=COLLECTION,
+                                                                      authors="", journals=j,
+                                                                      publication_year=2020)
+                                                                 for d_id, j in journals.items()])
+
+    def test_collection_sampler(self):
+        sampler = collection_sampler(COLLECTION)
+        self.assertEqual(5, sampler.count())
+        sample = sampler.sample(3, exclude_ids={91001})
+        self.assertEqual(3, len(sample))
+        self.assertEqual(3, len(set(sample)))
+        self.assertTrue(set(sample) <= DOCUMENT_IDS - {91001})
+
+        self.assertSetEqual(DOCUMENT_IDS - {91002}, set(sampler.sample(10, exclude_ids={91002})))
+        self.assertListEqual([], sampler.sample(0))
+
+    def test_seeded_sample_is_reproducible(self):
+        sample = collection_sampler(COLLECTION, seed=42).sample(3, exclude_ids={91005})
+        self.assertEqual(3, len(sample))
+        self.assertNotIn(91005, sample)
+        for _ in range(5):
+            self.assertListEqual(sample, collection_sampler(COLLECTION, seed=42).sample(3, exclude_ids={91005}))
+
+    def test_conditions(self):
+        sampler = DocumentSampler(DocumentMetadata, "document_id",
+                                  lambda t: [t.document_collection == COLLECTION, t.document_id > 91003])
+        self.assertEqual(2, sampler.count())
+        self.assertSetEqual({91004, 91005}, set(sampler.sample(5)))
+
+    def test_journal_sampler(self):
+        journal_names = {"current pharmaceutical design", "österreichische apotheker-zeitung"}
+        relevant = journal_sampler(COLLECTION, journal_names, relevant=True, seed=1)
+        self.assertEqual(3, relevant.count())
+        self.assertSetEqual({91001, 91002, 91003}, set(relevant.sample(10)))
+
+        not_relevant = journal_sampler(COLLECTION, journal_names, relevant=False, seed=1)
+        self.assertEqual(2, not_relevant.count())
+        self.assertSetEqual({91004, 91005}, set(not_relevant.sample(10)))
+
+    def test_iterate_texts(self):
+        texts = dict(iterate_texts(COLLECTION, [91002, 91004]))
+        self.assertSetEqual({91002, 91004}, set(texts.keys()))
+        self.assertIn("Ibuprofen tablets reduce pain in adults.", texts[91002])
+        self.assertIn("Metformin therapy", texts[91004])
@@ -0,0 +1,60 @@
+from unittest import TestCase
+
+import narrant.classification.apply_classifiers as apply_classifiers_module
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import DocumentClassification
+from kgextractiontoolbox.document.load_document import document_bulk_load
+from kgextractiontoolbox.entitylinking.classifier import BaseClassifier
+from narrant.classification.apply_classifiers import apply_classifiers
+from narranttests.util import resource_rel_path
+
+COLLECTION = "ApplyClassifiersTest"
+DOCUMENTS_FILE = resource_rel_path("classification/classifier_documents.txt")
+
+
+class KeywordTestClassifier(BaseClassifier):
+
+    def __init__(self, classification: str, keyword: str):
+        super().__init__(classification)
+        self.keyword = keyword
+
+    def classify_document(self, doc, consider_sections=False):
+        if self.keyword in doc.get_text_content(sections=consider_sections).lower():
+            doc.classification[self.classification] = self.keyword
+
+
+class ApplyClassifiersTestCase(TestCase):
+
+    def setUp(self) -> None:
+        document_bulk_load(DOCUMENTS_FILE, COLLECTION)
+        session = Session.get()
+        session.query(DocumentClassification).filter(
+            DocumentClassification.document_collection == COLLECTION).delete()
+        session.commit()
+
+    def get_classifications(self):
+        session = Session.get()
+        query = session.query(DocumentClassification.document_id, DocumentClassification.classification,
+                              DocumentClassification.explanation) \
+            .filter(DocumentClassification.document_collection == COLLECTION)
+        return {(r.document_id, r.classification, r.explanation) for r in query}
+
+    def test_apply_classifiers(self):
+        classifiers = [KeywordTestClassifier("Children", "children"), KeywordTestClassifier("Tablet", "tablets")]
+        default_bulk_size = apply_classifiers_module.BULK_INSERT_AFTER_K
+        # classifications are bulk inserted while the consumer runs and when it shuts down
+        apply_classifiers_module.BULK_INSERT_AFTER_K = 2
+        try:
+            apply_classifiers(classifiers, COLLECTION, input_file=DOCUMENTS_FILE, workers=2)
+        finally:
+            apply_classifiers_module.BULK_INSERT_AFTER_K = default_bulk_size
+
+        self.assertSetEqual({(91001, "Children", "children"), (91001, "Tablet", "tablets"),
+                             (91002, "Tablet", "tablets"),
+                             (91003, "Children", "children"),
+                             (91005, "Children", "children"), (91005, "Tablet", "tablets")},
+                            self.get_classifications())
+
+    def test_apply_classifiers_to_collection(self):
+        apply_classifiers([KeywordTestClassifier("Diabetes", "diabetes")], COLLECTION, workers=1)
+        self.assertSetEqual({(91004, "Diabetes", "diabetes")}, self.get_classifications())
@@ -0,0 +1,74 @@
+from unittest import TestCase
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from narrant.classification.featurestore import DocumentFeatureStore
+from narranttests.util import tmp_rel_path
+
+
+class FeatureStoreTestDocument:
+
+    def __init__(self, document_id: int, text: str):
+        self.id = document_id
+        self.text = text
+
+    def get_text_content(self, sections=False):
+        return self.text
+
+
+class DocumentFeatureStoreTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.texts = {1: "Aspirin reduces pain and fever",
+                      5: "Tablets of ibuprofen reduce pain",
+                      7: "Fever and cough in children",
+                      DocumentFeatureStore.CHUNK_SIZE + 1: "Novel tablet coating for aspirin"}
+        self.store_dir = tmp_rel_path("feature_store")
+        self.store = DocumentFeatureStore("FeatureStoreTest", store_dir=self.store_dir)
+        self.store.update([FeatureStoreTestDocument(d_id, t) for d_id, t in sorted(self.texts.items())])
+
+    def test_only_new_or_changed_documents_are_computed(self):
+        store = DocumentFeatureStore("FeatureStoreTest", store_dir=self.store_dir)
+        docs = [FeatureStoreTestDocument(d_id, t) for d_id, t in sorted(self.texts.items())]
+        self.assertEqual(0, store.update(docs))
+
+        docs = [FeatureStoreTestDocument(5, "Tablets of paracetamol"), FeatureStoreTestDocument(9, "Cough")]
+        self.assertEqual(2, store.update(docs))
+        self.assertIsNone(store.get_counts(5, text=self.texts[5]))
+        self.assertIsNotNone(store.get_counts(5, text="Tablets of paracetamol"))
+        self.assertSetEqual({2, 3}, store.missing_document_ids([1, 2, 3, 9]))
+
+    def test_get_counts(self):
+        counts = self.store.get_counts(1)
+        self.assertEqual(5, counts.sum())
+        self.assertEqual(1, counts[0, self.store.token2column["aspirin"]])
+        self.assertIsNone(self.store.get_counts(2))
+
+    def test_fit_tfidf_vectorizer_equals_text_vectorizer(self):
+        document_ids, counts = self.store.get_count_matrix(self.texts.keys())
+        self.assertListEqual(sorted(self.texts.keys()), document_ids)
+        vectorizer, x_data = self.store.fit_tfidf_vectorizer(counts)
+
+        texts = [self.texts[d_id] for d_id in document_ids]
+        text_vectorizer = TfidfVectorizer().fit(texts)
+        x_text = text_vectorizer.transform(texts)
+        self.assertEqual(len(text_vectorizer.vocabulary_), len(vectorizer.vocabulary_))
+        for term, column in vectorizer.vocabulary_.items():
+            self.assertTrue(np.allclose(x_data[:, column].toarray(),
+                                        x_text[:, text_vectorizer.vocabulary_[term]].toarray()))
+        self.assertTrue(np.allclose(vectorizer.transform(texts).toarray(), x_data.toarray()))
+        self.assertTrue(self.store.is_compatible(text_vectorizer))
+
+    def test_transform_counts_equals_text_vectorizer(self):
+        # repeated tokens make a difference for binary and sublinear tf
+        self.texts[11] = "Aspirin aspirin aspirin reduces pain pain"
+        self.store.update([FeatureStoreTestDocument(11, self.texts[11])])
+        document_ids, counts = self.store.get_count_matrix(self.texts.keys())
+        texts = [self.texts[d_id] for d_id in document_ids]
+        for params in [dict(), dict(binary=True), dict(sublinear_tf=True), dict(use_idf=False, norm=None)]:
+            vectorizer = TfidfVectorizer(**params).fit(texts)
+            self.assertTrue(self.store.is_compatible(vectorizer))
+            projection = self.store.build_projection(vectorizer.vocabulary_, len(vectorizer.vocabulary_))
+            x_data = DocumentFeatureStore.transform_counts(counts, projection, vectorizer)
+            self.assertTrue(np.allclose(vectorizer.transform(texts).toarray(), x_data.toarray()), params)
@@ -0,0 +1,69 @@
+import os
+from unittest import TestCase
+
+from kgextractiontoolbox.backend.database import Session
+from narrant.entity.entityresolver import GeneResolver
+from narrant.entity.genemaps import IntKeyedMap, IntKeyedIntMap, IntKeyedStringMap, load_int_keyed_map
+from narrant.entity.snapshot import store_resolver_data
+from narranttests.util import tmp_rel_path
+
+
+class GeneMapsTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.snapshot_dir = tmp_rel_path("resolver_snapshots")
+
+    def test_base_map_is_abstract(self):
+        self.assertRaises(TypeError, IntKeyedMap, dict(keys=[]))
+
+    def test_int_keyed_int_map(self):
+        int_map = IntKeyedIntMap.from_dict({"13649": 1956, 30970: 1576, "5": 7})
+        self.assertEqual(3, len(int_map))
+        self.assertEqual(1956, int_map[13649])
+        self.assertEqual(1956, int_map["13649"])
+        self.assertEqual(7, int_map[5])
+        self.assertIn(30970, int_map)
+        self.assertIn("30970", int_map)
+        self.assertNotIn(1, int_map)
+        self.assertNotIn("abc", int_map)
+        self.assertRaises(KeyError, int_map.__getitem__, 1)
+        self.assertRaises(KeyError, int_map.__getitem__, "abc")
+        self.assertEqual([5, 13649, 30970], list(int_map))
+
+    def test_int_keyed_string_map(self):
+        string_map = IntKeyedStringMap.from_dict({"1956": ["EGFR", "epidermal growth factor receptor"],
+                                                  1576: ("CYP3A4", "cytochrome P450 3A4"),
+                                                  42: ("", "äöü")})
+        self.assertEqual(("EGFR", "epidermal growth factor receptor"), string_map[1956])
+        self.assertEqual(("CYP3A4", "cytochrome P450 3A4"), string_map["1576"])
+        self.assertEqual(("", "äöü"), string_map[42])
+        self.assertNotIn(43, string_map)
+        self.assertEqual({42, 1576, 1956}, set(dict(string_map.items()).keys()))
+
+    def test_save_and_open(self):
+        path = os.path.join(self.snapshot_dir, "test.intmap")
+        IntKeyedStringMap.from_dict({1956: ["EGFR", "epidermal growth factor receptor"]}).save(path, "v1")
+        string_map = IntKeyedStringMap.open(path)
+        self.assertEqual("v1", string_map.version)
+        self.assertEqual(("EGFR", "epidermal growth factor receptor"), string_map["1956"])
+
+        path = os.path.join(self.snapshot_dir, "empty.intmap")
+        IntKeyedIntMap.from_dict({}).save(path, "v1")
+        self.assertEqual(0, len(IntKeyedIntMap.open(path)))
+
+    def test_load_int_keyed_map(self):
+        session = Session.get()
+        store_resolver_data(session, "Test Genes", {1956: ["EGFR", "epidermal growth factor receptor"]})
+        gene = GeneResolver()
+        gene.geneid2name = load_int_keyed_map(IntKeyedStringMap, "Test Genes", snapshot_dir=self.snapshot_dir)
+        self.assertEqual("epidermal growth factor receptor//EGFR", gene.gene_id_to_name("1956"))
+        self.assertEqual("egfr", gene.gene_id_to_symbol(1956))
+        self.assertRaises(KeyError, gene.gene_id_to_name, "1")
+        self.assertRaises(KeyError, gene.gene_id_to_name, "abc")
+
+        store_resolver_data(session, "Test Mapper", dict(human_gene_dict={"EGFR": 1956},
+                                                         gene_to_human_id_dict={13649: 1956}))
+        for _ in range(2):
+            int_map = load_int_keyed_map(IntKeyedIntMap, "Test Mapper", "gene_to_human_id_dict",
+                                         snapshot_dir=self.snapshot_dir)
+            self.assertEqual(1956, int_map["13649"])
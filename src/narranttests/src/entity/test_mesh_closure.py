@@ -0,0 +1,59 @@
+import json
+from unittest import TestCase
+
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import EntityResolverData
+from narrant.entity.meshclosure import compute_ancestor_closure, create_and_store_closure_table, query_ancestors, \
+    query_descendants, descendants_of
+from narrant.entity.meshontology import MeSHOntology
+
+
+class MeSHClosureTestCase(TestCase):
+
+    def setUp(self) -> None:
+        session = Session.get()
+        # fake ontology data
+        ontology_data = {
+            "descriptor2treeno": {
+                "D016503": ["E02.319.300"],
+                "D053769": ['D26.255.260.575', 'E02.319.300.380.575', 'J01.637.512.600.575'],
+                "D000001": ['E02.319.300.380'],
+                "D000002": ['E02.319']
+            },
+            "treeno2desc": {
+                "E02.319": ["D000002", "Drug Therapy"],
+                "E02.319.300": ["D016503", "Drug Delivery Systems"],
+                "E02.319.300.380": ["D000001", "Drug Carriers"],
+                "D26.255.260.575": ["D053769", "Nanocapsules"],
+                "E02.319.300.380.575": ["D053769", "Nanocapsules"],
+                "J01.637.512.600.575": ["D053769", "Nanocapsules"]
+            }
+        }
+        ontology_data = json.dumps(ontology_data)
+        EntityResolverData.overwrite_resolver_data(session, name=MeSHOntology.NAME, json_data=ontology_data)
+        self.ontology: MeSHOntology = MeSHOntology()
+
+    def test_compute_ancestor_closure(self):
+        closure = {(r["descriptor_id"], r["ancestor_id"]): r["depth"]
+                   for r in compute_ancestor_closure(self.ontology)}
+        self.assertEqual(0, closure[("MESH:D053769", "MESH:D053769")])
+        self.assertEqual(1, closure[("MESH:D053769", "MESH:D000001")])
+        self.assertEqual(2, closure[("MESH:D053769", "MESH:D016503")])
+        self.assertEqual(3, closure[("MESH:D053769", "MESH:D000002")])
+        self.assertEqual(2, closure[("MESH:D000001", "MESH:D000002")])
+        self.assertNotIn(("MESH:D000002", "MESH:D016503"), closure)
+        self.assertEqual(4 + 3 + 2 + 1, len(closure))
+
+    def test_query_closure_table(self):
+        create_and_store_closure_table(self.ontology)
+        session = Session.get()
+
+        self.assertSetEqual({("MESH:D000002", 0), ("MESH:D016503", 1), ("MESH:D000001", 2), ("MESH:D053769", 3)},
+                            set(query_descendants(session, "D000002")))
+        self.assertSetEqual({("MESH:D016503", 0), ("MESH:D000001", 1)},
+                            set(query_descendants(session, "MESH:D016503", max_depth=1)))
+        self.assertSetEqual({("MESH:D000001", 0), ("MESH:D016503", 1), ("MESH:D000002", 2)},
+                            set(query_ancestors(session, "D000001")))
+
+        descendants = {r[0] for r in session.execute(descendants_of(["D000001", "D016503"]))}
+        self.assertSetEqual({"MESH:D016503", "MESH:D000001", "MESH:D053769"}, descendants)
@@ -18,7 +18,13 @@ class MeSHOntologyTestCase(TestCase):
                 "D053769": ['D26.255.260.575', 'E02.319.300.380.575', 'J01.637.512.600.575'],
                 "D015195": ['E05.290.563.250']
             },
-            "treeno2desc": {}
+            "treeno2desc": {
+                "E02.319.300": ["D016503", "Drug Delivery Systems"],
+                "D26.255.260.575": ["D053769", "Nanocapsules"],
+                "E02.319.300.380.575": ["D053769", "Nanocapsules"],
+                "J01.637.512.600.575": ["D053769", "Nanocapsules"],
+                "E05.290.563.250": ["D015195", "Drug Design"]
+            }
         }
         ontology_data = json.dumps(ontology_data)
         EntityResolverData.overwrite_resolver_data(session, name=MeSHOntology.NAME, json_data=ontology_data)
@@ -89,3 +95,28 @@ class MeSHOntologyTestCase(TestCase):
         self.assertEqual(1, len(self.ontology.get_tree_numbers_with_entity_type_for_descriptor('D015195')))
         for tn in self.ontology.get_tree_numbers_with_entity_type_for_descriptor('D015195'):
             self.assertIn(tn, tree_numbers)
+
+    def test_find_descriptors_start_with_tree_no(self):
+        self.assertSetEqual({("D016503", "Drug Delivery Systems"), ("D053769", "Nanocapsules")},
+                            set(self.ontology.find_descriptors_start_with_tree_no("E02.319.300")))
+        self.assertSetEqual({("D053769", "Nanocapsules")},
+                            set(self.ontology.find_descriptors_start_with_tree_no("E02.319.300.380")))
+        self.assertEqual(3, len(self.ontology.find_descriptors_start_with_tree_no("E")))
+        self.assertEqual(1, len(self.ontology.find_descriptors_start_with_tree_no("J01")))
+        self.assertEqual(0, len(self.ontology.find_descriptors_start_with_tree_no("C01")))
+        self.assertEqual(0, len(self.ontology.find_descriptors_start_with_tree_no("Z")))
+
+    def test_retrieve_subdescriptors(self):
+        self.assertSetEqual({("D016503", "Drug Delivery Systems"), ("D053769", "Nanocapsules")},
+                            self.ontology.retrieve_subdescriptors("D016503"))
+        self.assertSetEqual({("D053769", "Nanocapsules")}, self.ontology.retrieve_subdescriptors("D053769"))
+
+    def test_get_entity_types_for_descriptors(self):
+        for d_id in ["D016503", "D053769", "D015195"]:
+            self.assertIn(METHOD, self.ontology.get_entity_types_for_descriptor(d_id))
+        self.assertIn(DOSAGE_FORM, self.ontology.get_entity_types_for_descriptor("D053769"))
+        self.assertRaises(KeyError, self.ontology.get_entity_types_for_descriptor, "D000000")
+
+        ent_types = self.ontology.get_entity_types_for_descriptors(["D016503", "D053769", "D000000"])
+        self.assertSetEqual({"D016503", "D053769"}, set(ent_types.keys()))
+        self.assertEqual(self.ontology.get_entity_types_for_descriptor("D053769"), ent_types["D053769"])
@@ -0,0 +1,92 @@
+import gzip
+from collections import defaultdict
+from unittest import TestCase
+
+from narrant.entity.ncbireader import build_gene_indexes, read_line_chunks, read_species_names, _init_worker, \
+    parse_gene_info_chunk
+from narranttests.util import tmp_rel_path
+
+GENE_INFO_LINES = [
+    "#tax_id\tGeneID\tSymbol\tLocusTag\tSynonyms\tdbXrefs\tchromosome\tmap_location\tdescription",
+    "7227\t30970\tCYP3A4\t-\t-\t-\t-\t-\tcytochrome fly",
+    "9606\t1576\tCYP3A4\t-\t-\t-\t7\t7q22.1\tcytochrome P450 family 3 subfamily A member 4",
+    "9606\t1956\tEGFR\t-\t-\t-\t7\t7p11.2\tepidermal growth factor receptor",
+    "9606\t9999\tEGFR\t-\t-\t-\t7\t7p11.2\tsecond EGFR",
+    "10090\t13649\tEGFR\t-\t-\t-\t11\t11\tepidermal growth factor receptor mouse",
+    "10090\t12345\tABC\t-\t-\t-\t11\t11\tonly mouse",
+]
+
+TAXONOMY_LINES = [
+    "1\t|\tall\t|\t\t|\tsynonym\t|",
+    "9606\t|\tHomo sapiens\t|\t\t|\tscientific name\t|",
+    "9606\t|\thuman\t|\t\t|\tgenbank common name\t|",
+    "10090\t|\tMus musculus\t|\t\t|\tscientific name\t|",
+    "10090\t|\t(house mouse)\t|\t\t|\tgenbank common name\t|",
+    "10090\t|\tmice\t|\t\t|\tcommon name\t|",
+]
+
+
+class GeneHolder:
+
+    def __init__(self):
+        self.geneid2name = {}
+        self.human_gene_dict = {}
+        self.gene_to_human_id_dict = {}
+
+
+class NCBIReaderTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.gene_file = tmp_rel_path("gene_info_test.gz")
+        with gzip.open(self.gene_file, 'wt') as f:
+            f.write('\n'.join(GENE_INFO_LINES) + '\n')
+        self.taxonomy_file = tmp_rel_path("taxonomy_test.gz")
+        with gzip.open(self.taxonomy_file, 'wt') as f:
+            f.write('\n'.join(TAXONOMY_LINES) + '\n')
+
+    def test_read_line_chunks(self):
+        chunks = list(read_line_chunks(self.gene_file, chunk_size=20))
+        self.assertTrue(len(chunks) > 1)
+        for chunk in chunks:
+            self.assertTrue(chunk.endswith('\n'))
+        self.assertEqual('\n'.join(GENE_INFO_LINES[1:]) + '\n', ''.join(chunks))
+
+    def test_build_gene_indexes(self):
+        for workers in [1, 2]:
+            holder = GeneHolder()
+            build_gene_indexes(self.gene_file, gene_resolver=holder, gene_mapper=holder, workers=workers,
+                               chunk_size=30)
+            self.assertEqual(6, len(holder.geneid2name))
+            self.assertEqual(("EGFR", "epidermal growth factor receptor"), holder.geneid2name[1956])
+            # the first human gene with a symbol is used
+            self.assertEqual({"CYP3A4": 1576, "EGFR": 1956}, holder.human_gene_dict)
+            # the fly gene occurs before the human gene
+            self.assertEqual({30970: 1576, 13649: 1956}, holder.gene_to_human_id_dict)
+
+    def test_non_human_genes_are_returned_compactly(self):
+        _init_worker(dict(collect_human_genes=True))
+        genes, human_genes, (symbols, gene_ids, positions) = parse_gene_info_chunk('\n'.join(GENE_INFO_LINES[1:]))
+        self.assertEqual([], genes)
+        self.assertEqual([("CYP3A4", 1576), ("EGFR", 1956), ("EGFR", 9999)], human_genes)
+        # each symbol of the chunk is sent once
+        self.assertEqual(["CYP3A4", "EGFR", "ABC"], symbols)
+        self.assertEqual([30970, 13649, 12345], list(gene_ids))
+        self.assertEqual([0, 1, 2], list(positions))
+
+    def test_build_gene_indexes_filtered(self):
+        holder = GeneHolder()
+        build_gene_indexes(self.gene_file, gene_resolver=holder, gene_ids={1956, 12345})
+        self.assertSetEqual({1956, 12345}, set(holder.geneid2name.keys()))
+        self.assertEqual({}, holder.gene_to_human_id_dict)
+
+    def test_read_species_names(self):
+        for workers in [1, 2]:
+            species = defaultdict(dict)
+            for species_id, shortcut, name in read_species_names(self.taxonomy_file, workers=workers,
+                                                                 chunk_size=30):
+                species[species_id][shortcut] = name
+            self.assertEqual({"9606": {"s": "Homo sapiens", "c": "human"},
+                              "10090": {"s": "Mus musculus", "c": "house mouse"}}, dict(species))
+
+        names = list(read_species_names(self.taxonomy_file, species_ids={10090}))
+        self.assertEqual(2, len(names))
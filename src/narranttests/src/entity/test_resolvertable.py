@@ -0,0 +1,115 @@
+from unittest import TestCase
+
+from kgextractiontoolbox.backend.database import Session
+from narrant.entity.entityresolver import EntityResolver, MeshResolver, GeneResolver, SpeciesResolver
+from narrant.entity.resolvertable import LRUCache, store_resolver_entries, lookup_resolver_entries, \
+    has_resolver_entries, update_resolver_entries
+from narrant.entity.snapshot import store_resolver_data, load_resolver_data
+from narrant.entitylinking.enttypes import GENE, SPECIES, DISEASE, CHEMICAL
+from narrant.mesh.diff import MeSHReleaseDiff
+from narranttests.util import tmp_rel_path
+
+
+class ResolverTableTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.snapshot_dir = tmp_rel_path("resolver_snapshots")
+
+    def test_store_and_lookup_entries(self):
+        session = Session.get()
+        store_resolver_entries(session, "Test", {1: ["a", "b"], "2": "c"})
+        self.assertTrue(has_resolver_entries(session, "Test"))
+        self.assertFalse(has_resolver_entries(session, "Test Unknown"))
+        self.assertEqual({"1": ["a", "b"], "2": "c"}, lookup_resolver_entries(session, "Test", [1, "2", "3"]))
+
+        # entries are replaced
+        store_resolver_entries(session, "Test", {"3": "d"})
+        self.assertEqual({"3": "d"}, lookup_resolver_entries(session, "Test", ["1", "2", "3"]))
+
+    def test_update_entries(self):
+        session = Session.get()
+        store_resolver_entries(session, "Test Update", {"1": "a", "2": "b", "3": "c"})
+        update_resolver_entries(session, "Test Update", {"2": "x", "4": "d"}, deletes=["3"])
+        self.assertEqual({"1": "a", "2": "x", "4": "d"},
+                         lookup_resolver_entries(session, "Test Update", ["1", "2", "3", "4"]))
+
+    def test_mesh_resolver_update_index(self):
+        session = Session.get()
+        store_resolver_data(session, MeshResolver.MESH_NAME, {"D000001": "Calcimycin", "D000002": "Temefos",
+                                                              "D000003": "Unchanged"}, keyed=True)
+        store_resolver_data(session, MeshResolver.MESH_SUPPLEMENT_NAME, {"C000002": "bevonium"}, keyed=True)
+        # a sentinel on an unaffected key shows that the other entries are not rewritten
+        update_resolver_entries(session, MeshResolver.MESH_NAME, {"D000003": "Sentinel"})
+
+        mesh_diff = MeSHReleaseDiff()
+        mesh_diff.added = {"D000004": "Abattoirs", "C000005": "added supplement"}
+        mesh_diff.deleted = {"D000002": "Temefos"}
+        mesh_diff.renamed = {"D000001": ("Calcimycin", "Calcimycin renamed")}
+        MeshResolver().update_index(mesh_diff, snapshot_dir=self.snapshot_dir)
+
+        self.assertEqual({"D000001": "Calcimycin renamed", "D000003": "Sentinel", "D000004": "Abattoirs"},
+                         lookup_resolver_entries(session, MeshResolver.MESH_NAME,
+                                                 ["D000001", "D000002", "D000003", "D000004"]))
+        self.assertEqual({"C000002": "bevonium", "C000005": "added supplement"},
+                         lookup_resolver_entries(session, MeshResolver.MESH_SUPPLEMENT_NAME,
+                                                 ["C000002", "C000005"]))
+        # the blobs contain the updated indexes
+        self.assertEqual({"D000001": "Calcimycin renamed", "D000003": "Unchanged", "D000004": "Abattoirs"},
+                         dict(load_resolver_data(MeshResolver.MESH_NAME, snapshot_dir=self.snapshot_dir).items()))
+        self.assertEqual({"C000002": "bevonium", "C000005": "added supplement"},
+                         dict(load_resolver_data(MeshResolver.MESH_SUPPLEMENT_NAME,
+                                                 snapshot_dir=self.snapshot_dir).items()))
+
+    def test_only_name_resolvers_are_keyed(self):
+        session = Session.get()
+        store_resolver_data(session, "Test Blob", {"a": 1})
+        self.assertFalse(has_resolver_entries(session, "Test Blob"))
+        store_resolver_data(session, "Test Keyed", {"a": 1, "b": [2]}, keyed=True)
+        self.assertTrue(has_resolver_entries(session, "Test Keyed"))
+        # both formats contain the same data
+        self.assertEqual({"a": 1, "b": [2]}, lookup_resolver_entries(session, "Test Keyed", ["a", "b"]))
+        self.assertEqual({"a": 1, "b": [2]},
+                         dict(load_resolver_data("Test Keyed", snapshot_dir=self.snapshot_dir).items()))
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        cache.put("c", 3)
+        # b was the least recently used entry
+        self.assertNotIn("b", cache)
+        self.assertIn("a", cache)
+        self.assertIn("c", cache)
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get("b"))
+
+    def test_get_names_for_ids(self):
+        session = Session.get()
+        store_resolver_data(session, MeshResolver.MESH_NAME, {"D000001": "Calcimycin"}, keyed=True)
+        store_resolver_data(session, MeshResolver.MESH_SUPPLEMENT_NAME, {"C000002": "bevonium"}, keyed=True)
+        store_resolver_data(session, GeneResolver.NAME, {1956: ["EGFR", "epidermal growth factor receptor"]}, keyed=True)
+        store_resolver_data(session, SpeciesResolver.NAME, {"9606": {"c": "human", "s": "Homo sapiens"}}, keyed=True)
+
+        resolver = EntityResolver()
+        resolver._keyed_resolvers.clear()
+        resolver._name_cache.clear()
+
+        names = resolver.get_names_for_ids([("MESH:D000001", DISEASE), ("MESH:C000002", CHEMICAL),
+                                            ("MESH:D999999", DISEASE), ("1956", GENE), ("abc", GENE),
+                                            ("9606", SPECIES)])
+        self.assertEqual({("MESH:D000001", DISEASE): "Calcimycin",
+                          ("MESH:C000002", CHEMICAL): "bevonium",
+                          ("1956", GENE): "epidermal growth factor receptor//EGFR",
+                          ("9606", SPECIES): "human//Homo sapiens"}, names)
+
+        # names are cached as long as the resolver data is not stored again
+        store_resolver_entries(session, MeshResolver.MESH_NAME, {"D000001": "Changed"})
+        self.assertEqual({("MESH:D000001", DISEASE): "Calcimycin"},
+                         resolver.get_names_for_ids([("MESH:D000001", DISEASE), ("MESH:D999999", DISEASE)]))
+
+        # a new version clears the cache (at the next version check)
+        store_resolver_data(session, MeshResolver.MESH_NAME, {"D000001": "Changed"}, keyed=True)
+        self.assertTrue(resolver.check_resolver_versions(force=True))
+        self.assertEqual({("MESH:D000001", DISEASE): "Changed"},
+                         resolver.get_names_for_ids([("MESH:D000001", DISEASE), ("MESH:D999999", DISEASE)]))
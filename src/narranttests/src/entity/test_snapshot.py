@@ -0,0 +1,106 @@
+import json
+import os
+import pickle
+from unittest import TestCase
+
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import EntityResolverData
+from narrant.entity.snapshot import SnapshotDict, store_resolver_data, load_resolver_data, get_snapshot_path
+from narranttests.util import tmp_rel_path
+
+
+class SnapshotTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.snapshot_dir = tmp_rel_path("resolver_snapshots")
+        self.data = {"D000001": "Calcimycin", "D000002": ["Temefos", 2], 3: {"c": "human"}, "Ä": None}
+
+    def test_write_and_read_snapshot(self):
+        path = os.path.join(self.snapshot_dir, "test.snapshot")
+        SnapshotDict.write(path, "v1", self.data)
+        snapshot = SnapshotDict(path)
+
+        self.assertEqual("v1", snapshot.version)
+        self.assertEqual(4, len(snapshot))
+        self.assertEqual("Calcimycin", snapshot["D000001"])
+        self.assertEqual(["Temefos", 2], snapshot["D000002"])
+        # keys are strings like in json
+        self.assertEqual({"c": "human"}, snapshot["3"])
+        self.assertNotIn(3, snapshot)
+        self.assertIn("Ä", snapshot)
+        self.assertIsNone(snapshot["Ä"])
+        self.assertNotIn("D000003", snapshot)
+        self.assertRaises(KeyError, snapshot.__getitem__, "D000003")
+        self.assertEqual("default", snapshot.get("D000003", "default"))
+        self.assertSetEqual({"D000001", "D000002", "3", "Ä"}, set(snapshot.keys()))
+        self.assertEqual(json.loads(json.dumps(self.data)), dict(snapshot.items()))
+
+        copy = pickle.loads(pickle.dumps(snapshot))
+        self.assertEqual("Calcimycin", copy["D000001"])
+        self.assertEqual(json.loads(json.dumps(self.data)), snapshot.to_dict())
+
+    def test_decoded_values_are_memoized(self):
+        path = os.path.join(self.snapshot_dir, "memo.snapshot")
+        SnapshotDict.write(path, "v1", self.data)
+        snapshot = SnapshotDict(path)
+        value = snapshot["D000002"]
+        self.assertIs(value, snapshot["D000002"])
+        self.assertIn("D000002", snapshot)
+        self.assertNotIn("D000003", snapshot)
+        self.assertNotIn(3, snapshot)
+
+    def test_write_empty_snapshot(self):
+        path = os.path.join(self.snapshot_dir, "empty.snapshot")
+        SnapshotDict.write(path, "v1", {})
+        snapshot = SnapshotDict(path)
+        self.assertEqual(0, len(snapshot))
+        self.assertNotIn("D000001", snapshot)
+
+    def test_load_resolver_data(self):
+        session = Session.get()
+        store_resolver_data(session, "Test Resolver", self.data)
+        path = get_snapshot_path("Test Resolver", snapshot_dir=self.snapshot_dir)
+        if os.path.isfile(path):
+            os.remove(path)
+
+        data = load_resolver_data("Test Resolver", snapshot_dir=self.snapshot_dir)
+        self.assertTrue(os.path.isfile(path))
+        self.assertEqual("Calcimycin", data["D000001"])
+
+        # the snapshot is used although the blob was changed without a new version
+        EntityResolverData.overwrite_resolver_data(session, name="Test Resolver", json_data=json.dumps({}))
+        self.assertEqual("Calcimycin", load_resolver_data("Test Resolver", snapshot_dir=self.snapshot_dir)["D000001"])
+
+        # a new version invalidates the snapshot
+        store_resolver_data(session, "Test Resolver", {"D000001": "Changed"})
+        self.assertEqual("Changed", load_resolver_data("Test Resolver", snapshot_dir=self.snapshot_dir)["D000001"])
+
+    def test_load_resolver_data_fields(self):
+        session = Session.get()
+        store_resolver_data(session, "Test Fields", dict(a={"x": 1}, b={"y": [2]}))
+        data = load_resolver_data("Test Fields", fields=["a", "b"], snapshot_dir=self.snapshot_dir)
+        self.assertEqual(1, data["a"]["x"])
+        self.assertEqual([2], data["b"]["y"])
+        data = load_resolver_data("Test Fields", fields=["a", "b"], snapshot_dir=self.snapshot_dir,
+                                  max_decoded_size=0)
+        self.assertIsInstance(data["a"], SnapshotDict)
+        self.assertEqual([2], data["b"]["y"])
+
+    def test_small_snapshots_are_decoded(self):
+        session = Session.get()
+        store_resolver_data(session, "Test Small", self.data)
+        load_resolver_data("Test Small", snapshot_dir=self.snapshot_dir)
+        data = load_resolver_data("Test Small", snapshot_dir=self.snapshot_dir)
+        self.assertIsInstance(data, dict)
+        self.assertEqual(json.loads(json.dumps(self.data)), data)
+
+        data = load_resolver_data("Test Small", snapshot_dir=self.snapshot_dir, max_decoded_size=3)
+        self.assertIsInstance(data, SnapshotDict)
+        self.assertEqual("Calcimycin", data["D000001"])
+
+    def test_load_resolver_data_without_version(self):
+        session = Session.get()
+        EntityResolverData.overwrite_resolver_data(session, name="Test Old", json_data=json.dumps(self.data))
+        data = load_resolver_data("Test Old", snapshot_dir=self.snapshot_dir)
+        self.assertEqual("Calcimycin", data["D000001"])
+        self.assertFalse(os.path.isfile(get_snapshot_path("Test Old", snapshot_dir=self.snapshot_dir)))
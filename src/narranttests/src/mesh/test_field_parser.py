@@ -0,0 +1,97 @@
+from unittest import TestCase
+
+from lxml import etree
+
+from narrant.mesh.benchmark_parsing import node_values, parse_records
+from narrant.mesh.data import Descriptor, MESH_QUERY_DESCRIPTOR_RECORD, iterate_descriptors
+from narrant.mesh.supplementary import SupplementaryRecord, iterate_supplementary_records
+from narranttests.util import resource_rel_path, tmp_rel_path
+
+SUPPLEMENTARY_RECORD = """
+<SupplementalRecord SCRClass="1">
+  <SupplementalRecordUI>C000002</SupplementalRecordUI>
+  <SupplementalRecordName><String>bevonium</String></SupplementalRecordName>
+  <DateCreated><Year>1971</Year><Month>01</Month><Day>01</Day></DateCreated>
+  <!-- a comment -->
+  <HeadingMappedToList>
+    <HeadingMappedTo>
+      <DescriptorReferredTo>
+        <DescriptorUI>*D001561</DescriptorUI>
+        <DescriptorName><String>Benzilates</String></DescriptorName>
+      </DescriptorReferredTo>
+    </HeadingMappedTo>
+  </HeadingMappedToList>
+  <ConceptList>
+    <Concept PreferredConceptYN="Y">
+      <ConceptUI>M0000002</ConceptUI>
+      <ConceptName><String>bevonium</String></ConceptName>
+      <TermList>
+        <Term ConceptPreferredTermYN="Y" RecordPreferredTermYN="Y">
+          <TermUI>T000003</TermUI>
+          <String>bevonium</String>
+        </Term>
+        <Term ConceptPreferredTermYN="N" RecordPreferredTermYN="N">
+          <TermUI>T000004</TermUI>
+          <String>bevonium methyl sulfate</String>
+        </Term>
+      </TermList>
+    </Concept>
+  </ConceptList>
+</SupplementalRecord>
+"""
+
+
+class FieldParserTestCase(TestCase):
+
+    def test_descriptors_equal_xpath_parsing(self):
+        records = etree.parse(resource_rel_path("mesh/desc_sample.xml")).xpath(MESH_QUERY_DESCRIPTOR_RECORD)
+        xpath_descs = parse_records(records, Descriptor, use_field_parser=False)
+        descs = parse_records(records, Descriptor, use_field_parser=True)
+        self.assertEqual([node_values(d) for d in xpath_descs], [node_values(d) for d in descs])
+        self.assertEqual("1", descs[0].descriptor_class)
+        self.assertEqual(1999, descs[0].date_created.year)
+        self.assertIsNone(descs[0].date_revised.tzinfo)
+        self.assertEqual("", descs[0].annotation)
+        self.assertEqual([], descs[0].pharmacological_action_list)
+
+    def test_supplementary_record(self):
+        record = etree.fromstring(SUPPLEMENTARY_RECORD)
+        xpath_record = parse_records([record], SupplementaryRecord, use_field_parser=False)[0]
+        supp_record = SupplementaryRecord.from_element(record)
+        self.assertEqual(node_values(xpath_record), node_values(supp_record))
+        self.assertEqual("bevonium", supp_record.name)
+        self.assertEqual(["*D001561"], [h.unique_id for h in supp_record.headings_mapped_to])
+        self.assertEqual(["bevonium", "bevonium methyl sulfate"], [t.string for t in supp_record.terms])
+        self.assertIsNone(supp_record.date_revised)
+
+    def test_missing_required_field(self):
+        record = etree.fromstring("<DescriptorRecord><DescriptorUI>D1</DescriptorUI>"
+                                  "<DateEstablished><Year>1966</Year><Month>01</Month><Day>01</Day>"
+                                  "</DateEstablished></DescriptorRecord>")
+        self.assertRaises(ValueError, Descriptor.from_element, record)
+        record = etree.fromstring("<DescriptorRecord><DescriptorUI>D1</DescriptorUI></DescriptorRecord>")
+        self.assertRaises(IndexError, Descriptor.from_element, record)
+
+    def test_field_selection(self):
+        descs = list(iterate_descriptors(resource_rel_path("mesh/desc_sample.xml"),
+                                         fields=["unique_id", "heading", "terms", "tree_numbers"]))
+        adenocarcinoma = descs[4]
+        self.assertEqual("D000230", adenocarcinoma.unique_id)
+        self.assertEqual("Adenocarcinoma", adenocarcinoma.heading)
+        self.assertEqual(["C04.557.470.035", "C04.557.470.200.025"], adenocarcinoma.tree_numbers)
+        self.assertEqual(["Adenocarcinoma", "Adenocarcinomas"], [t.string for t in adenocarcinoma.terms])
+        # fields which are not selected are not set
+        self.assertFalse(hasattr(adenocarcinoma, "history_note"))
+        self.assertFalse(hasattr(adenocarcinoma.terms[0], "term_ui"))
+        self.assertFalse(hasattr(adenocarcinoma, "__dict__"))
+        self.assertRaises(ValueError, lambda: list(iterate_descriptors(resource_rel_path("mesh/desc_sample.xml"),
+                                                                       fields=["unknown"])))
+
+    def test_supplementary_field_selection(self):
+        path = tmp_rel_path("supp_sample.xml")
+        with open(path, 'wt') as f:
+            f.write("<SupplementalRecordSet>" + SUPPLEMENTARY_RECORD + "</SupplementalRecordSet>")
+        record = list(iterate_supplementary_records(path, fields=["unique_id", "headings_mapped_to"]))[0]
+        self.assertEqual("C000002", record.unique_id)
+        self.assertEqual(["*D001561"], [h.unique_id for h in record.headings_mapped_to])
+        self.assertFalse(hasattr(record, "_name"))
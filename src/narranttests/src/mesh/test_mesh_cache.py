@@ -0,0 +1,68 @@
+import os
+import shutil
+from unittest import TestCase
+
+from narrant.mesh.cache import load_descriptors, get_cache_path, KIND_DESCRIPTORS
+from narrant.util.filecache import file_checksum
+from narranttests.util import resource_rel_path, tmp_rel_path
+
+MESH_SAMPLE_FILE = resource_rel_path("mesh/desc_sample.xml")
+
+
+class MeSHCacheTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.cache_dir = tmp_rel_path("mesh_cache")
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def test_load_descriptors(self):
+        descs = load_descriptors(MESH_SAMPLE_FILE, cache_dir=self.cache_dir)
+        cache_path = get_cache_path(MESH_SAMPLE_FILE, KIND_DESCRIPTORS, file_checksum(MESH_SAMPLE_FILE),
+                                    cache_dir=self.cache_dir)
+        self.assertTrue(os.path.isfile(cache_path))
+        self.assertEqual(7, len(descs))
+        adenocarcinoma = descs[4]
+        self.assertEqual("D000230", adenocarcinoma.unique_id)
+        self.assertEqual("Adenocarcinoma", adenocarcinoma.name)
+        self.assertEqual(("C04.557.470.035", "C04.557.470.200.025"), adenocarcinoma.tree_numbers)
+        self.assertEqual(("Adenocarcinoma", "Adenocarcinomas"), adenocarcinoma.terms)
+        self.assertEqual(("Q000097",), adenocarcinoma.qualifiers)
+
+        # the cache is used as long as the checksum matches
+        modified = os.path.getmtime(cache_path)
+        self.assertEqual(descs, load_descriptors(MESH_SAMPLE_FILE, cache_dir=self.cache_dir))
+        self.assertEqual(modified, os.path.getmtime(cache_path))
+
+    def test_rebuild_on_changed_file(self):
+        mesh_file = tmp_rel_path("desc_cache_test.xml")
+        shutil.copy(MESH_SAMPLE_FILE, mesh_file)
+        self.assertEqual(7, len(load_descriptors(mesh_file, cache_dir=self.cache_dir)))
+
+        with open(MESH_SAMPLE_FILE, 'rt') as f:
+            content = f.read()
+        with open(mesh_file, 'wt') as f:
+            f.write(content.replace("<String>Female</String>", "<String>Females (changed)</String>", 1))
+        descs = load_descriptors(mesh_file, cache_dir=self.cache_dir)
+        self.assertEqual("Females (changed)", descs[-1].heading)
+        # the cache of the old file version is removed
+        self.assertEqual(1, len([f for f in os.listdir(self.cache_dir) if f.startswith("desc_cache_test.xml")]))
+
+    def test_same_file_name_in_different_directories(self):
+        old_file = os.path.join(tmp_rel_path("mesh_cache_old"), "desc.xml")
+        new_file = os.path.join(tmp_rel_path("mesh_cache_new"), "desc.xml")
+        os.makedirs(os.path.dirname(old_file), exist_ok=True)
+        os.makedirs(os.path.dirname(new_file), exist_ok=True)
+        shutil.copy(MESH_SAMPLE_FILE, old_file)
+        with open(MESH_SAMPLE_FILE, 'rt') as f:
+            content = f.read()
+        with open(new_file, 'wt') as f:
+            f.write(content.replace("<String>Female</String>", "<String>Females (changed)</String>", 1))
+
+        load_descriptors(old_file, cache_dir=self.cache_dir)
+        load_descriptors(new_file, cache_dir=self.cache_dir)
+        # both releases keep their cache
+        for path in [old_file, new_file]:
+            self.assertTrue(os.path.isfile(get_cache_path(path, KIND_DESCRIPTORS, file_checksum(path),
+                                                          cache_dir=self.cache_dir)))
+        self.assertEqual("Female", load_descriptors(old_file, cache_dir=self.cache_dir)[-1].heading)
@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+from lxml import etree
+
+from narrant.mesh.data import MeSHDB, MESH_QUERY_DESCRIPTOR_RECORD
+from narranttests.util import resource_rel_path
+
+
+class MeSHDBIndexTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.db = MeSHDB()
+        self.db.load_xml(resource_rel_path("mesh/desc_sample.xml"), force_load=True)
+
+    def test_desc_by_id_and_tree_number(self):
+        desc = self.db.desc_by_id("D000230")
+        self.assertEqual("Adenocarcinoma", desc.heading)
+        self.assertIs(desc, self.db.desc_by_tree_number("C04.557.470.200.025"))
+        self.assertIs(desc, self.db.desc_by_tree_number("C04.557.470.035"))
+        self.assertEqual(["D000230", "D009369"], [d.unique_id for d in self.db.descs_by_ids(["D000230", "D009369"])])
+        self.assertRaises(ValueError, self.db.desc_by_id, "D999999")
+        self.assertRaises(ValueError, self.db.desc_by_tree_number, "C99")
+        self.assertEqual(7, len(self.db.get_all_descs()))
+
+    def test_xml_tree_is_not_kept(self):
+        self.assertFalse(hasattr(self.db, "tree"))
+
+    def test_parents(self):
+        desc = self.db.desc_by_id("D000230")
+        self.assertEqual(["D009375", "D002277"], [p.unique_id for p in desc.parents])
+        self.assertEqual([], self.db.desc_by_id("D009930").parents)
+
+    def test_descs_under_tree_number(self):
+        records = etree.parse(resource_rel_path("mesh/desc_sample.xml")).xpath(MESH_QUERY_DESCRIPTOR_RECORD)
+        for tree_number in ["C04", "C04.557", "C04.557.470", "C04.557.470.200", "D02", "C04.557.470.035"]:
+            ids = {r.findtext("DescriptorUI").strip() for r in records
+                   if any(tn.text.startswith(tree_number + ".") for tn in r.iterfind("TreeNumberList/TreeNumber"))}
+            self.assertEqual(sorted(ids), [d.unique_id for d in self.db.descs_under_tree_number(tree_number)])
+        self.assertEqual(["D000230", "D002277"],
+                         [d.unique_id for d in self.db.descs_under_tree_number("C04.557.470")])
+
+    def test_descs_by_term_and_name(self):
+        self.assertEqual(["D009369"], [d.unique_id for d in self.db.descs_by_term("Tumors")])
+        self.assertEqual([], self.db.descs_by_term("tumors"))
+        self.assertEqual(["D009369"], [d.unique_id for d in self.db.descs_by_term("tumors", ignore_case=True)])
+        self.assertEqual(["D002277"], [d.unique_id for d in self.db.descs_by_name("Carcinoma")])
+        self.assertEqual(["D002277"], [d.unique_id for d in self.db.descs_by_name("Carcinoma, Anaplastic")])
+        self.assertEqual([], self.db.descs_by_name("Carcinoma, Anaplastic", search_terms=False))
+        self.assertEqual(["D009369", "D009370", "D009375"],
+                         [d.unique_id for d in self.db.descs_by_name("Neoplasms", match_exact=False)])
@@ -0,0 +1,71 @@
+import os
+import shutil
+from unittest import TestCase
+
+from narrant.mesh.diff import MeSHReleaseDiff, diff_mesh_releases
+from narrant.vocabularies.generic_vocabulary import GenericVocabulary
+from narranttests.util import resource_rel_path, tmp_rel_path
+
+MESH_SAMPLE_FILE = resource_rel_path("mesh/desc_sample.xml")
+
+
+class MeSHReleaseDiffTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.cache_dir = tmp_rel_path("mesh_diff_cache")
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+        with open(MESH_SAMPLE_FILE, 'rt') as f:
+            content = f.read()
+        content = content.replace("<DescriptorName>\n      <String>Carcinoma</String>",
+                                  "<DescriptorName>\n      <String>Carcinoma, Epithelial</String>")
+        content = content.replace("<TreeNumber>C04.557.470.035</TreeNumber>",
+                                  "<TreeNumber>C04.557.470.036</TreeNumber>")
+        content = content.replace("<String>Carcinomas</String>", "<String>Epithelial Carcinomas</String>")
+        content = content.replace("<DescriptorUI>D005260</DescriptorUI>", "<DescriptorUI>D999999</DescriptorUI>")
+        self.new_file = tmp_rel_path("desc_diff_new.xml")
+        with open(self.new_file, 'wt') as f:
+            f.write(content)
+
+    def test_diff_mesh_releases(self):
+        mesh_diff = diff_mesh_releases(MESH_SAMPLE_FILE, self.new_file, cache_dir=self.cache_dir)
+        self.assertEqual({"D999999": "Female"}, mesh_diff.added)
+        self.assertEqual({"D005260": "Female"}, mesh_diff.deleted)
+        self.assertEqual({"D002277": ("Carcinoma", "Carcinoma, Epithelial")}, mesh_diff.renamed)
+        self.assertEqual({"D000230": (("C04.557.470.035", "C04.557.470.200.025"),
+                                      ("C04.557.470.036", "C04.557.470.200.025"))}, mesh_diff.tree_numbers_changed)
+        self.assertEqual(("Epithelial Carcinomas",), mesh_diff.terms_changed["D002277"][0])
+        self.assertIn("Carcinomas", mesh_diff.terms_changed["D002277"][1])
+        self.assertEqual({"D999999", "D005260", "D002277", "D000230"}, mesh_diff.affected_ids())
+
+        self.assertTrue(mesh_diff.affects_subtrees(["C04.557.470"]))
+        self.assertFalse(mesh_diff.affects_subtrees(["D02", "C04.557.470.100"]))
+
+    def test_unchanged_release(self):
+        mesh_diff = diff_mesh_releases(MESH_SAMPLE_FILE, MESH_SAMPLE_FILE, cache_dir=self.cache_dir)
+        self.assertTrue(mesh_diff.is_empty())
+
+    def test_save_and_load(self):
+        mesh_diff = diff_mesh_releases(MESH_SAMPLE_FILE, self.new_file, cache_dir=self.cache_dir)
+        path = tmp_rel_path("mesh_diff.json")
+        mesh_diff.save(path)
+        loaded = MeSHReleaseDiff.load(path)
+        self.assertEqual(mesh_diff.to_dict(), loaded.to_dict())
+        self.assertEqual(mesh_diff.renamed, loaded.renamed)
+        self.assertEqual(mesh_diff.tree_numbers_changed, loaded.tree_numbers_changed)
+
+    def test_affected_vocabulary_directories(self):
+        mesh_diff = diff_mesh_releases(MESH_SAMPLE_FILE, self.new_file, cache_dir=self.cache_dir)
+        vocab_dir = tmp_rel_path("mesh_diff_vocab")
+        os.makedirs(vocab_dir, exist_ok=True)
+        tree_file = os.path.join(vocab_dir, "mesh_tree_numbers.txt")
+        with open(tree_file, 'wt') as f:
+            f.write("D02\n")
+        self.assertFalse(GenericVocabulary.is_affected_by_mesh_diff(vocab_dir, mesh_diff))
+        with open(os.path.join(vocab_dir, "mesh_descriptors.txt"), 'wt') as f:
+            f.write("MESH:D005260\n")
+        self.assertTrue(GenericVocabulary.is_affected_by_mesh_diff(vocab_dir, mesh_diff))
+        os.remove(os.path.join(vocab_dir, "mesh_descriptors.txt"))
+        with open(tree_file, 'wt') as f:
+            f.write("C04\n")
+        self.assertTrue(GenericVocabulary.is_affected_by_mesh_diff(vocab_dir, mesh_diff))
@@ -0,0 +1,87 @@
+import random
+from collections import namedtuple
+from unittest import TestCase
+
+from narrant.mesh.data import MeSHDB, iterate_descriptors
+from narrant.mesh.hierarchy import MeSHHierarchy
+from narranttests.util import resource_rel_path
+
+Desc = namedtuple('Desc', ['unique_id', 'tree_numbers'])
+
+
+def common_prefix_lca(tn1, tn2):
+    common = []
+    for x, y in zip(tn1.split('.'), tn2.split('.')):
+        if x != y:
+            break
+        common.append(x)
+    return '.'.join(common) if common else None
+
+
+class MeSHHierarchyTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.mesh_file = resource_rel_path("mesh/desc_sample.xml")
+        self.hierarchy = MeSHHierarchy(iterate_descriptors(self.mesh_file, fields=["unique_id", "tree_numbers"]))
+
+    def test_adjacency(self):
+        self.assertEqual(["D009375", "D002277"], self.hierarchy.parents("D000230"))
+        self.assertEqual([], self.hierarchy.parents("D009369"))
+        self.assertEqual([], self.hierarchy.parents("D005260"))
+        self.assertEqual(["D000230", "D002277"], self.hierarchy.children("D009375"))
+        self.assertEqual(["C04.557.470.035", "C04.557.470.200"], self.hierarchy.child_tree_numbers("C04.557.470"))
+        self.assertEqual("C04.557", self.hierarchy.parent_tree_number("C04.557.470"))
+        self.assertIsNone(self.hierarchy.parent_tree_number("C04"))
+
+    def test_lineages(self):
+        self.assertEqual([("D009369", "D009370", "D009375", "D000230"),
+                          ("D009369", "D009370", "D009375", "D002277", "D000230")],
+                         self.hierarchy.lineages("D000230"))
+        self.assertEqual([("D009930",)], self.hierarchy.lineages("D009930"))
+        self.assertEqual([["D009369", "D009370", "D009375"], ["D009369", "D009370", "D009375", "D002277"]],
+                         self.hierarchy.common_lineages("D000230", "D002277"))
+
+    def test_missing_parent(self):
+        # the parent tree number A01.100 has no descriptor
+        hierarchy = MeSHHierarchy([Desc("D1", ["A01"]), Desc("D2", ["A01.100.200"]), Desc("D3", ["A01.100.200.300"])])
+        self.assertEqual([], hierarchy.parents("D1"))
+        with self.assertRaises(ValueError):
+            hierarchy.parents("D2")
+        with self.assertRaises(ValueError):
+            hierarchy.lineages("D2")
+        with self.assertRaises(ValueError):
+            hierarchy.lineages("D3")
+        self.assertEqual(["D3"], hierarchy.children("D2"))
+
+    def test_lowest_common_ancestor(self):
+        self.assertEqual("C04.557.470", self.hierarchy.lowest_common_ancestor_tree_number("C04.557.470.035",
+                                                                                            "C04.557.470.200"))
+        self.assertEqual("C04.557.470.200", self.hierarchy.lowest_common_ancestor_tree_number(
+            "C04.557.470.200.025", "C04.557.470.200"))
+        self.assertIsNone(self.hierarchy.lowest_common_ancestor_tree_number("C04", "D02"))
+        # Adenocarcinoma is located below Carcinoma
+        self.assertEqual("D002277", self.hierarchy.lowest_common_ancestor("D000230", "D002277"))
+        self.assertEqual("D009375", self.hierarchy.lowest_common_ancestor("D000230", "D009375"))
+        self.assertIsNone(self.hierarchy.lowest_common_ancestor("D000230", "D009930"))
+        self.assertIsNone(self.hierarchy.lowest_common_ancestor("D000230", "D005260"))
+
+    def test_lowest_common_ancestor_random_tree(self):
+        rnd = random.Random(42)
+        tree_numbers = ["A01", "A02", "B01"]
+        while len(tree_numbers) < 500:
+            tree_numbers.append(f'{rnd.choice(tree_numbers)}.{rnd.randint(100, 999)}')
+        tree_numbers = sorted(set(tree_numbers))
+        hierarchy = MeSHHierarchy([Desc(f'D{idx}', [tn]) for idx, tn in enumerate(tree_numbers)])
+        for _ in range(2000):
+            tn1, tn2 = rnd.choice(tree_numbers), rnd.choice(tree_numbers)
+            self.assertEqual(common_prefix_lca(tn1, tn2), hierarchy.lowest_common_ancestor_tree_number(tn1, tn2))
+
+    def test_meshdb_descriptors(self):
+        db = MeSHDB()
+        db.load_xml(self.mesh_file, force_load=True)
+        adenocarcinoma, carcinoma = db.desc_by_id("D000230"), db.desc_by_id("D002277")
+        self.assertEqual([db.desc_by_id("D009375"), carcinoma], adenocarcinoma.parents)
+        self.assertEqual(2, len(adenocarcinoma.lineages))
+        self.assertEqual(carcinoma, adenocarcinoma.lineages[1][-2])
+        self.assertEqual(carcinoma, adenocarcinoma.get_lowest_common_ancestor(carcinoma))
+        self.assertEqual(db.desc_by_id("D009369"), adenocarcinoma.get_common_lineage(carcinoma)[0][0])
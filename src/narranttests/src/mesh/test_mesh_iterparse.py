@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from narrant.mesh.data import MeSHDB, iterate_descriptors
+from narrant.vocabularies.mesh_vocabulary import MeSHVocabulary
+from narranttests.util import resource_rel_path, tmp_rel_path
+
+MESH_SAMPLE_FILE = resource_rel_path("mesh/desc_sample.xml")
+
+
+class MeSHIterparseTestCase(TestCase):
+
+    def test_iterate_descriptors(self):
+        descs = list(iterate_descriptors(MESH_SAMPLE_FILE))
+        self.assertEqual(["D009369", "D009370", "D009375", "D002277", "D000230", "D009930", "D005260"],
+                         [d.unique_id for d in descs])
+        adenocarcinoma = descs[4]
+        self.assertEqual("Adenocarcinoma", adenocarcinoma.heading)
+        self.assertEqual(["C04.557.470.035", "C04.557.470.200.025"], adenocarcinoma.tree_numbers)
+        self.assertEqual(["Adenocarcinoma", "Adenocarcinomas"], [t.string for t in adenocarcinoma.terms])
+        self.assertEqual([], descs[6].tree_numbers)
+        carcinoma = descs[3]
+        self.assertEqual(2, len(carcinoma.concept_list))
+        self.assertEqual("A malignant neoplasm made up of epithelial cells.", carcinoma.concept_list[0].scope_note)
+        self.assertEqual(["blood"], [q.name for q in carcinoma.allowable_qualifiers])
+
+    def test_iterate_descriptors_equals_tree(self):
+        db = MeSHDB()
+        db.load_xml(MESH_SAMPLE_FILE, force_load=True)
+        for streamed, loaded in zip(iterate_descriptors(MESH_SAMPLE_FILE), db.get_all_descs()):
+            for attr in streamed.attrs:
+                if attr in ("concept_list", "allowable_qualifiers_list"):
+                    continue
+                self.assertEqual(getattr(loaded, attr), getattr(streamed, attr))
+            self.assertEqual([t.string for t in loaded.terms], [t.string for t in streamed.terms])
+
+    def test_create_mesh_vocab(self):
+        vocab = MeSHVocabulary.create_mesh_vocab(["C04.557.470"], mesh_file=MESH_SAMPLE_FILE, expand_terms=False,
+                                                 cache_dir=tmp_rel_path("mesh_iterparse_cache"))
+        self.assertEqual({"MESH:D000230"}, vocab["adenocarcinomas"])
+        self.assertEqual({"MESH:D002277"}, vocab["carcinoma, anaplastic"])
+        self.assertEqual({"MESH:D009375"}, vocab["epithelial neoplasms"])
+        self.assertNotIn("neoplasms", vocab)
+        self.assertNotIn("female", vocab)
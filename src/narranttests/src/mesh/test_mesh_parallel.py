@@ -0,0 +1,93 @@
+from unittest import TestCase
+
+from narrant.mesh.cache import _convert_supplementary_record
+from narrant.mesh.data import iterate_descriptors
+from narrant.mesh.parallel import parse_descriptors_parallel, parse_records_parallel
+from narrant.mesh.supplementary import iterate_supplementary_records, parse_supplementary_records_parallel, \
+    MESH_SUPP_TAG_RECORD, SupplementaryRecord
+from narrant.util.xmlranges import compute_record_ranges, get_number_of_ranges, RANGES_PER_WORKER
+from narranttests.util import resource_rel_path, tmp_rel_path
+
+SUPPLEMENTARY_RECORD = """<SupplementalRecord SCRClass = "1">
+  <SupplementalRecordUI>C{idx:06d}</SupplementalRecordUI>
+  <SupplementalRecordName><String>record {idx} &amp; more</String></SupplementalRecordName>
+  <Note>drug carrier {idx}</Note>
+  <HeadingMappedToList>
+    <HeadingMappedTo>
+      <DescriptorReferredTo>
+        <DescriptorUI>*D{idx:06d}</DescriptorUI>
+        <DescriptorName><String>Heading {idx}</String></DescriptorName>
+      </DescriptorReferredTo>
+    </HeadingMappedTo>
+  </HeadingMappedToList>
+  <ConceptList>
+    <Concept PreferredConceptYN="Y">
+      <ConceptUI>M{idx:07d}</ConceptUI>
+      <ConceptName><String>record {idx}</String></ConceptName>
+      <TermList>
+        <Term ConceptPreferredTermYN="Y"><TermUI>T{idx:06d}</TermUI><String>record {idx}</String></Term>
+        <Term ConceptPreferredTermYN="N"><TermUI>T{idx:06d}1</TermUI><String>synonym {idx}</String></Term>
+      </TermList>
+    </Concept>
+  </ConceptList>
+</SupplementalRecord>
+"""
+
+
+class MeSHParallelTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.supp_file = tmp_rel_path("supp_parallel_test.xml")
+        with open(self.supp_file, 'wt') as f:
+            f.write('<?xml version="1.0"?>\n<!DOCTYPE SupplementalRecordSet SYSTEM "supp2022.dtd">\n')
+            f.write('<SupplementalRecordSet LanguageCode = "eng">\n')
+            for idx in range(100):
+                f.write(SUPPLEMENTARY_RECORD.format(idx=idx))
+            f.write('</SupplementalRecordSet>\n')
+
+    def test_compute_record_ranges(self):
+        ranges = compute_record_ranges(self.supp_file, MESH_SUPP_TAG_RECORD, 7)
+        self.assertEqual(7, len(ranges))
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+        with open(self.supp_file, 'rb') as f:
+            content = f.read()
+        for start, end in ranges:
+            self.assertTrue(content[start:].startswith(b'<SupplementalRecord '))
+            self.assertTrue(content[:end].rstrip().endswith(b'</SupplementalRecord>'))
+
+    def test_get_number_of_ranges(self):
+        mb = 1024 * 1024
+        # small files are not split
+        self.assertEqual(1, get_number_of_ranges(mb, 8, min_range_size=4 * mb, max_range_size=16 * mb))
+        self.assertEqual(8 * RANGES_PER_WORKER,
+                         get_number_of_ranges(1000 * mb, 8, min_range_size=4 * mb, max_range_size=64 * mb))
+        # the ranges are bounded by bytes, not by the number of workers
+        self.assertEqual(63, get_number_of_ranges(1000 * mb, 2, min_range_size=4 * mb, max_range_size=16 * mb))
+        self.assertEqual(5, get_number_of_ranges(80 * mb, 1, min_range_size=4 * mb, max_range_size=16 * mb))
+
+    def test_parse_supplementary_records_parallel(self):
+        expected = [_convert_supplementary_record(r) for r in iterate_supplementary_records(self.supp_file)]
+        self.assertEqual(100, len(expected))
+        self.assertEqual("record 5 & more", expected[5].name)
+        for workers in [1, 3]:
+            # small ranges so that the file is split
+            records = parse_records_parallel(self.supp_file, MESH_SUPP_TAG_RECORD, SupplementaryRecord,
+                                             workers=workers, convert_function=_convert_supplementary_record,
+                                             min_range_size=1000)
+            self.assertEqual(expected, records)
+        # the size of the ranges is bounded
+        records = parse_records_parallel(self.supp_file, MESH_SUPP_TAG_RECORD, SupplementaryRecord, workers=2,
+                                         convert_function=_convert_supplementary_record, max_range_size=5000)
+        self.assertEqual(expected, records)
+        records = parse_supplementary_records_parallel(self.supp_file, convert_function=_convert_supplementary_record)
+        self.assertEqual(expected, records)
+        records = parse_supplementary_records_parallel(self.supp_file, workers=2, fields=["unique_id", "name"])
+        self.assertEqual([r.unique_id for r in expected], [r.unique_id for r in records])
+        self.assertFalse(hasattr(records[0], "_note"))
+
+    def test_parse_descriptors_parallel(self):
+        mesh_file = resource_rel_path("mesh/desc_sample.xml")
+        descs = parse_descriptors_parallel(mesh_file, workers=2, fields=["unique_id", "tree_numbers"])
+        self.assertEqual([(d.unique_id, d.tree_numbers) for d in iterate_descriptors(mesh_file)],
+                         [(d.unique_id, d.tree_numbers) for d in descs])
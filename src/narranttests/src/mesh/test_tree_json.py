@@ -0,0 +1,53 @@
+import json
+from collections import namedtuple
+from unittest import TestCase
+
+from narrant.mesh.data import MeSHDB, iterate_descriptors
+from narrant.mesh.export.tree_json import export_tree_json
+from narranttests.util import resource_rel_path, tmp_rel_path
+
+Desc = namedtuple('Desc', ['unique_id', 'heading', 'tree_numbers'])
+
+DISEASE_JSON = '[{"name": "Neoplasms (MESH:D009369)", "children": [{"name": "Neoplasms by Histologic Type ' \
+               '(MESH:D009370)", "children": [{"name": "Neoplasms, Glandular and Epithelial (MESH:D009375)", ' \
+               '"children": [{"name": "Adenocarcinoma", "children": [{"name": "(MESH:D000230)"}]}, ' \
+               '{"name": "Carcinoma (MESH:D002277)", "children": [{"name": "Adenocarcinoma", ' \
+               '"children": [{"name": "(MESH:D000230)"}]}]}]}]}]}]'
+
+
+class TreeJsonTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.mesh_file = resource_rel_path("mesh/desc_sample.xml")
+
+    def test_extract_disease_json(self):
+        db = MeSHDB()
+        db.load_xml(self.mesh_file, force_load=True)
+        self.assertEqual(DISEASE_JSON, db.extract_disease_json())
+
+    def test_export_categories(self):
+        output_file = tmp_rel_path("mesh_tree_test.json")
+        export_tree_json(iterate_descriptors(self.mesh_file), ["C", "D"], output_file)
+        with open(output_file, 'rt') as f:
+            tree = json.load(f)
+        self.assertEqual(["Neoplasms (MESH:D009369)", "Organic Chemicals"], [node["name"] for node in tree])
+        self.assertEqual([{"name": "(MESH:D009930)"}], tree[1]["children"])
+
+        export_tree_json(iterate_descriptors(self.mesh_file), ["C04.557"], output_file)
+        with open(output_file, 'rt') as f:
+            self.assertEqual([], json.load(f))
+
+    def test_nested_subtrees_and_escaping(self):
+        descs = [Desc("D1", 'Root "A"', ["A01"]), Desc("D2", "Child 1", ["A01.100"]),
+                 Desc("D3", "Grandchild", ["A01.100.200"]), Desc("D4", "Child 2", ["A01.300"]),
+                 Desc("D5", "Other", ["A02"]), Desc("D6", "Other Child", ["A02.100"])]
+        output_file = tmp_rel_path("mesh_tree_test.json")
+        export_tree_json(descs, ["A"], output_file)
+        with open(output_file, 'rt') as f:
+            tree = json.load(f)
+        self.assertEqual([{"name": 'Root "A" (MESH:D1)', "children": [
+            {"name": "Child 1 (MESH:D2)", "children": [
+                {"name": "Grandchild", "children": [{"name": "(MESH:D3)"}]}]},
+            {"name": "Child 2", "children": [{"name": "(MESH:D4)"}]}]},
+            {"name": "Other (MESH:D5)", "children": [
+                {"name": "Other Child", "children": [{"name": "(MESH:D6)"}]}]}], tree)
@@ -0,0 +1,73 @@
+import json
+from unittest import TestCase
+
+from kgextractiontoolbox.backend.database import Session
+from kgextractiontoolbox.backend.models import EntityResolverData
+from narrant.build_all_indexes import IndexBuildPlanner, IndexBuildTask, FINGERPRINTS_NAME, file_fingerprint, \
+    ids_fingerprint, IndexBuildError
+from narranttests.util import tmp_rel_path
+
+BUILT = []
+
+
+def build_dummy(name):
+    BUILT.append(name)
+
+
+def build_failing():
+    raise ValueError("build failed")
+
+
+class IndexBuildPlannerTestCase(TestCase):
+
+    def setUp(self) -> None:
+        BUILT.clear()
+        EntityResolverData.overwrite_resolver_data(Session.get(), name=FINGERPRINTS_NAME, json_data=json.dumps({}))
+
+    def test_fingerprints(self):
+        path = tmp_rel_path("fingerprint_test.txt")
+        with open(path, 'wt') as f:
+            f.write("a")
+        fp = file_fingerprint(path)
+        self.assertEqual(fp, file_fingerprint(path))
+        with open(path, 'wt') as f:
+            f.write("ab")
+        self.assertNotEqual(fp, file_fingerprint(path))
+        self.assertEqual("missing", file_fingerprint(tmp_rel_path("fingerprint_missing.txt")))
+
+        self.assertEqual(ids_fingerprint({1, 2, 3}), ids_fingerprint({3, 2, 1}))
+        self.assertNotEqual(ids_fingerprint({1, 2, 3}), ids_fingerprint({1, 2}))
+        self.assertEqual("all", ids_fingerprint(None))
+
+    def test_skip_unchanged_indexes(self):
+        tasks = [IndexBuildTask("A", build_dummy, dict(file="a:1"), args=("A",)),
+                 IndexBuildTask("B", build_dummy, dict(file="b:1"), args=("B",))]
+        timings = IndexBuildPlanner(tasks).run()
+        self.assertEqual(["A", "B"], BUILT)
+        self.assertEqual("built", timings["A"][0])
+
+        BUILT.clear()
+        tasks[1].inputs = dict(file="b:2")
+        timings = IndexBuildPlanner(tasks).run()
+        self.assertEqual(["B"], BUILT)
+        self.assertEqual("skipped", timings["A"][0])
+        self.assertEqual("built", timings["B"][0])
+
+        BUILT.clear()
+        IndexBuildPlanner(tasks, rebuild=True).run()
+        self.assertEqual(["A", "B"], BUILT)
+
+    def test_failed_index_is_rebuilt(self):
+        tasks = [IndexBuildTask("A", build_failing, dict(file="a:1")),
+                 IndexBuildTask("B", build_dummy, dict(file="b:1"), args=("B",))]
+        planner = IndexBuildPlanner(tasks)
+        self.assertRaises(IndexBuildError, planner.run)
+        timings = planner.timings
+        self.assertEqual("failed", timings["A"][0])
+        self.assertEqual("built", timings["B"][0])
+        self.assertNotIn("A", IndexBuildPlanner.load_fingerprints())
+
+        tasks[0] = IndexBuildTask("A", build_dummy, dict(file="a:1"), args=("A",))
+        BUILT.clear()
+        IndexBuildPlanner(tasks).run()
+        self.assertEqual(["A"], BUILT)
@@ -0,0 +1,47 @@
+import os
+import shutil
+from unittest import TestCase
+
+from narrant.util.filecache import file_checksum, file_fingerprint, read_cache_file, write_cache_file
+from narranttests.util import tmp_rel_path
+
+
+class FileCacheTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.cache_dir = tmp_rel_path("filecache")
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def test_checksum_and_fingerprint(self):
+        path = tmp_rel_path("filecache_input.txt")
+        with open(path, 'wt') as f:
+            f.write("a")
+        checksum, fingerprint = file_checksum(path), file_fingerprint(path)
+        self.assertEqual("0cc175b9c0f1b6a831c399e269772661", checksum)
+        with open(path, 'wt') as f:
+            f.write("ab")
+        self.assertNotEqual(checksum, file_checksum(path))
+        self.assertNotEqual(fingerprint, file_fingerprint(path))
+        self.assertEqual("missing", file_fingerprint(tmp_rel_path("filecache_missing.txt")))
+
+    def test_write_and_read(self):
+        path = os.path.join(self.cache_dir, "test.1.cache")
+        self.assertIsNone(read_cache_file(path, 1))
+        write_cache_file(path, 1, dict(name="test"), {"a": [1, 2]})
+        self.assertEqual({"a": [1, 2]}, read_cache_file(path, 1))
+        # a cache of another format version is ignored
+        self.assertIsNone(read_cache_file(path, 2))
+
+        # outdated files are removed
+        new_path = os.path.join(self.cache_dir, "test.2.cache")
+        write_cache_file(new_path, 1, dict(name="test"), {"a": [3]},
+                         stale_pattern=os.path.join(self.cache_dir, "test.*.cache"))
+        self.assertEqual(["test.2.cache"], os.listdir(self.cache_dir))
+
+    def test_corrupt_file_is_ignored(self):
+        os.makedirs(self.cache_dir)
+        path = os.path.join(self.cache_dir, "corrupt.cache")
+        with open(path, 'wb') as f:
+            f.write(b"no pickle")
+        self.assertIsNone(read_cache_file(path, 1))
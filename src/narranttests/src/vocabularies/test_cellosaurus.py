@@ -0,0 +1,48 @@
+from unittest import TestCase, mock
+
+from lxml import etree
+
+from narrant.util.xmlranges import compute_record_ranges
+from narrant.vocabularies.cellosaurus import iterate_cell_lines, iterate_cell_lines_parallel, \
+    CELLOSAURUS_TAG_CELL_LINE, CELLOSAURUS_TAG_CELL_LINE_LIST
+from narranttests.util import resource_rel_path
+
+CELLOSAURUS_SAMPLE_FILE = resource_rel_path("vocabularies/cellosaurus_sample.xml")
+
+CELL_LINES = [("CVCL:0030", "HeLa", ["HELA", "Hela", "He La"]),
+              ("CVCL:0023", "A-549", ["A549", "NCI-A549"]),
+              ("CVCL:1234", "HB-8065", []),
+              ("CVCL:0045", "HEK293", ["HEK-293", "293 cells"])]
+
+
+class CellosaurusTestCase(TestCase):
+
+    def test_iterate_cell_lines(self):
+        self.assertEqual(CELL_LINES, list(iterate_cell_lines(CELLOSAURUS_SAMPLE_FILE)))
+
+    def test_iterate_cell_lines_frees_top_level_lists(self):
+        parsers = []
+        etree_iterparse = etree.iterparse
+
+        def iterparse(*args, **kwargs):
+            parsers.append(etree_iterparse(*args, **kwargs))
+            return parsers[-1]
+
+        with mock.patch("narrant.vocabularies.cellosaurus.etree.iterparse", side_effect=iterparse):
+            self.assertEqual(CELL_LINES, list(iterate_cell_lines(CELLOSAURUS_SAMPLE_FILE)))
+        # only the small header and copyright elements remain in the tree
+        self.assertEqual(["header", "copyright"], [child.tag for child in parsers[0].root])
+
+    def test_record_ranges_end_at_cell_line_list(self):
+        ranges = compute_record_ranges(CELLOSAURUS_SAMPLE_FILE, CELLOSAURUS_TAG_CELL_LINE, 3,
+                                       list_tag=CELLOSAURUS_TAG_CELL_LINE_LIST)
+        self.assertEqual(3, len(ranges))
+        with open(CELLOSAURUS_SAMPLE_FILE, 'rb') as f:
+            content = f.read()
+        self.assertTrue(content[ranges[0][0]:].startswith(b'<cell-line '))
+        self.assertTrue(content[ranges[-1][1]:].startswith(b'</cell-line-list>'))
+
+    def test_iterate_cell_lines_parallel(self):
+        self.assertEqual(CELL_LINES, list(iterate_cell_lines_parallel(CELLOSAURUS_SAMPLE_FILE, workers=1)))
+        self.assertEqual(CELL_LINES, list(iterate_cell_lines_parallel(CELLOSAURUS_SAMPLE_FILE, workers=2,
+                                                                      min_range_size=200)))
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from urllib.parse import urlparse, parse_qs
+
+from narrant.vocabularies.chembl_harvester import ChemblHarvester, ChemblHarvestError
+from narranttests.util import tmp_rel_path
+
+TOTAL_COUNT = 25
+
+
+class StubChemblHandler(BaseHTTPRequestHandler):
+    # offset -> number of failures before the page is served
+    failures = {}
+    requested_offsets = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        offset, limit = int(params["offset"][0]), int(params["limit"][0])
+        with self.lock:
+            self.requested_offsets.append(offset)
+            failures = self.failures.get(offset, 0)
+            if failures:
+                self.failures[offset] = failures - 1
+        if url.path != "/chembl/api/data/molecule" or params["format"] != ["json"]:
+            self.send_response(404)
+            self.end_headers()
+            return
+        if failures:
+            self.send_response(503)
+            self.end_headers()
+            return
+        molecules = [dict(molecule_chembl_id=f'CHEMBL{i}') for i in range(offset, min(offset + limit, TOTAL_COUNT))]
+        body = json.dumps(dict(page_meta=dict(total_count=TOTAL_COUNT, limit=limit, offset=offset),
+                               molecules=molecules)).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ChemblHarvesterTestCase(TestCase):
+
+    def setUp(self) -> None:
+        StubChemblHandler.failures = {}
+        StubChemblHandler.requested_offsets = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubChemblHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.harvest_dir = tmp_rel_path("chembl_harvest_test")
+        if os.path.isdir(self.harvest_dir):
+            shutil.rmtree(self.harvest_dir)
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _create_harvester(self, max_retries=2):
+        return ChemblHarvester(self.base_url, "/chembl/api/data/molecule", dict(format='json', limit=1000),
+                               "molecules", self.harvest_dir, workers=3, page_size=4, max_retries=max_retries,
+                               backoff=0)
+
+    def _harvested_ids(self):
+        ids = []
+        pages_dir = os.path.join(self.harvest_dir, "pages")
+        for file_name in os.listdir(pages_dir):
+            with open(os.path.join(pages_dir, file_name)) as f:
+                ids.extend(m["molecule_chembl_id"] for m in json.load(f))
+        return sorted(ids)
+
+    def test_harvest(self):
+        StubChemblHandler.failures = {8: 2}
+        self.assertEqual(TOTAL_COUNT, self._create_harvester().harvest())
+        self.assertEqual(sorted(f'CHEMBL{i}' for i in range(TOTAL_COUNT)), self._harvested_ids())
+        # 7 pages, the page at offset 8 is retried twice
+        self.assertEqual(9, len(StubChemblHandler.requested_offsets))
+
+    def test_resume_interrupted_harvest(self):
+        StubChemblHandler.failures = {12: 10, 20: 10}
+        with self.assertRaises(ChemblHarvestError):
+            self._create_harvester(max_retries=1).harvest()
+
+        StubChemblHandler.failures = {}
+        StubChemblHandler.requested_offsets = []
+        self.assertEqual(TOTAL_COUNT, self._create_harvester().harvest())
+        # only the missing pages are requested again
+        self.assertEqual([12, 20], sorted(StubChemblHandler.requested_offsets))
+        self.assertEqual(sorted(f'CHEMBL{i}' for i in range(TOTAL_COUNT)), self._harvested_ids())
+
+    def test_client_errors_are_not_retried(self):
+        harvester = ChemblHarvester(self.base_url, "/chembl/api/data/unknown", dict(format='json'), "molecules",
+                                    self.harvest_dir, workers=2, page_size=4, backoff=0)
+        with self.assertRaises(ChemblHarvestError):
+            harvester.harvest()
+        self.assertEqual(1, len(StubChemblHandler.requested_offsets))
@@ -0,0 +1,51 @@
+import os
+from unittest import TestCase
+
+from narrant.vocabularies.generic_vocabulary import GenericVocabulary
+from narrant.vocabularies.mesh_vocabulary import MeSHVocabulary
+from narranttests.util import resource_rel_path, tmp_rel_path
+
+MESH_SAMPLE_FILE = resource_rel_path("mesh/desc_sample.xml")
+
+
+class MeSHVocabularyTestCase(TestCase):
+
+    def test_prefix_index(self):
+        prefix_index = MeSHVocabulary.build_subtree_prefix_index({"a": ["C04.557"], "b": ["C04", "D02"]})
+        self.assertEqual({"a", "b"}, MeSHVocabulary.get_matching_vocabularies(["C04.557.470"], prefix_index))
+        self.assertEqual({"b"}, MeSHVocabulary.get_matching_vocabularies(["D02", "C04.100"], prefix_index))
+        self.assertEqual(set(), MeSHVocabulary.get_matching_vocabularies(["C05", "C"], prefix_index))
+
+    def setUp(self) -> None:
+        self.cache_dir = tmp_rel_path("mesh_vocabulary_cache")
+
+    def test_shared_pass_equals_single_vocabularies(self):
+        subtrees_by_vocab = {"a": ["C04.557.470"], "b": ["C04", "D02"], "c": ["C04.557.470.200"], "d": ["G01"]}
+        for expand_terms in [False, True]:
+            vocabs = MeSHVocabulary.create_mesh_vocabs(subtrees_by_vocab, mesh_file=MESH_SAMPLE_FILE,
+                                                       expand_terms=expand_terms, cache_dir=self.cache_dir)
+            for name, subtrees in subtrees_by_vocab.items():
+                single = MeSHVocabulary.create_mesh_vocab(subtrees, mesh_file=MESH_SAMPLE_FILE,
+                                                          expand_terms=expand_terms, cache_dir=self.cache_dir)
+                self.assertEqual(dict(single), dict(vocabs[name]))
+
+        self.assertEqual({"MESH:D002277", "MESH:D000230"}, vocabs["c"]["carcinoma"] | vocabs["c"]["adenocarcinoma"])
+        self.assertEqual({"MESH:D009930"}, vocabs["b"]["organic chemicals"])
+        self.assertEqual(0, len(vocabs["d"]))
+
+    def test_preload_vocabularies(self):
+        vocab_dir = tmp_rel_path("mesh_vocab_preload")
+        os.makedirs(vocab_dir, exist_ok=True)
+        with open(os.path.join(vocab_dir, "mesh_tree_numbers.txt"), 'wt') as f:
+            f.write("C04.557.470\n")
+        GenericVocabulary.preload_mesh_vocabularies([vocab_dir], expand_terms=False, mesh_file=MESH_SAMPLE_FILE,
+                                                    cache_dir=self.cache_dir)
+        vocab = GenericVocabulary.create_vocabulary_from_directory(vocab_dir, expand_terms=False)
+        self.assertEqual({"MESH:D000230"}, vocab["adenocarcinomas"])
+        self.assertNotIn("neoplasms", vocab)
+        # the preloaded vocabulary is kept for other vocabularies of the same directory
+        vocab["adenocarcinomas"].add("MESH:D000001")
+        vocab = GenericVocabulary.create_vocabulary_from_directory(vocab_dir, expand_terms=False)
+        self.assertEqual({"MESH:D000230"}, vocab["adenocarcinomas"])
+        GenericVocabulary.clear_preloaded_mesh_vocabularies()
+        self.assertNotIn((os.path.abspath(vocab_dir), False), GenericVocabulary._preloaded_mesh_vocabularies)
@@ -0,0 +1,58 @@
+import os
+import shutil
+from unittest import TestCase
+
+from narrant.vocabularies.vocabulary_cache import load_cached_vocabulary
+from narranttests.util import tmp_rel_path
+
+
+class VocabularyCacheTestCase(TestCase):
+
+    def setUp(self) -> None:
+        self.cache_dir = tmp_rel_path("vocabulary_cache")
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+        self.input_file = tmp_rel_path("vocabulary_cache_input.txt")
+        self._write_input("aspirin\nibuprofen\n")
+        self.builds = 0
+
+    def _write_input(self, content):
+        with open(self.input_file, 'wt') as f:
+            f.write(content)
+
+    def _build(self, suffix=""):
+        self.builds += 1
+        with open(self.input_file, 'rt') as f:
+            return {line.strip() + suffix: {line.strip().upper()} for line in f}
+
+    def _load(self, params=None, suffix="", version=1):
+        return load_cached_vocabulary("test_vocab", params or dict(expand_terms=False), [self.input_file],
+                                      lambda: self._build(suffix), version=version, cache_dir=self.cache_dir)
+
+    def test_loaded_from_cache(self):
+        vocab = self._load()
+        self.assertEqual({"aspirin": {"ASPIRIN"}, "ibuprofen": {"IBUPROFEN"}}, vocab)
+        # modifying a returned vocabulary does not change the cache
+        vocab["aspirin"].add("X")
+        self.assertEqual({"aspirin": {"ASPIRIN"}, "ibuprofen": {"IBUPROFEN"}}, self._load())
+        self.assertEqual(1, self.builds)
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))
+
+    def test_rebuild_on_changed_input_or_params(self):
+        self._load()
+        self._load(params=dict(expand_terms=True), suffix="s")
+        self.assertEqual(2, self.builds)
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
+
+        self._write_input("aspirin\n")
+        self.assertEqual({"aspirin": {"ASPIRIN"}}, self._load())
+        self.assertEqual(3, self.builds)
+        # the entry of the old input file is replaced
+        self.assertEqual(2, len(os.listdir(self.cache_dir)))
+
+    def test_rebuild_on_changed_version(self):
+        self._load()
+        self.assertEqual({"aspirins": {"ASPIRIN"}, "ibuprofens": {"IBUPROFEN"}}, self._load(suffix="s", version=2))
+        self.assertEqual(2, self.builds)
+        # the entry of the old builder version is replaced
+        self.assertEqual(1, len(os.listdir(self.cache_dir)))